@@ -1,7 +1,9 @@
 from .auth import get_current_user_id, get_current_user, get_optional_user_id
+from .database import get_request_db
 
 __all__ = [
     "get_current_user_id",
     "get_current_user",
-    "get_optional_user_id"
-]
\ No newline at end of file
+    "get_optional_user_id",
+    "get_request_db"
+]
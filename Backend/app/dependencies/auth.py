@@ -1,11 +1,86 @@
+"""
+Shared auth dependencies
+
+Every router resolves the caller through these (routers don't declare their own bearer
+scheme): handlers take `user_id: str = Depends(get_current_user_id)`, or list it in the
+route's `dependencies=[...]` when they only need the request authenticated. JWT
+verification is cached here:
+- Verified claims are kept in a bounded LRU keyed by the token's sha256, until the
+  token's `exp` (AUTH_TOKEN_CACHE_MAX_ENTRIES). A cached token skips signature checks.
+- get_current_user also caches the user document for a few seconds
+  (AUTH_USER_CACHE_TTL_SECONDS, 0 disables). Call invalidate_cached_user after writes
+  to the user document.
+"""
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.services.cache import CacheBackend, InProcessLRUCache, build_cache_backend
 from app.utils.security import decode_access_token
 from config.database import get_database
 from bson import ObjectId
-from typing import Optional
+from typing import Any, Dict, Optional
+import hashlib
+import os
+import time
 
 security = HTTPBearer()
+# Same scheme, but a missing header resolves to None instead of a 403
+optional_security = HTTPBearer(auto_error=False)
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", 10))
+
+# sha256(token) → verified claims. Tokens are immutable, so this stays per-worker.
+token_claims_cache = InProcessLRUCache(max_entries=int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", 10000)))
+# user_id → user document; invalidations reach other workers when a bus is configured
+user_doc_cache: CacheBackend = build_cache_backend(
+    "users",
+    max_entries=int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", 10000)),
+    default_ttl_seconds=USER_CACHE_TTL_SECONDS,
+)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_token_cached(token: str) -> Optional[Dict[str, Any]]:
+    """decode_access_token, memoized until the token expires. None if invalid/expired."""
+    key = _token_key(token)
+    claims = token_claims_cache.get(key)
+    if claims is not None:
+        if claims.get("exp", 0) > time.time():
+            return claims
+        token_claims_cache.delete(key)
+        return None
+
+    claims = decode_access_token(token)
+    if claims is not None and "exp" in claims:
+        remaining = claims["exp"] - time.time()
+        if remaining > 0:
+            token_claims_cache.set(key, claims, ttl_seconds=remaining)
+    return claims
+
+
+async def load_user(db, user_id: str) -> Optional[Dict[str, Any]]:
+    """User document by id, served from the short-TTL cache when possible."""
+    if USER_CACHE_TTL_SECONDS > 0:
+        user = user_doc_cache.get(user_id)
+        if user is not None:
+            return user
+
+    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    if user is not None and USER_CACHE_TTL_SECONDS > 0:
+        user_doc_cache.set(user_id, user)
+    return user
+
+
+def invalidate_cached_user(user_id: str) -> None:
+    """Drop a user document from the cache (call after updating it)."""
+    user_doc_cache.invalidate(str(user_id))
+
+
+def auth_cache_stats() -> Dict[str, Any]:
+    return {"tokens": token_claims_cache.stats(), "users": user_doc_cache.stats()}
 
 
 async def get_current_user_id(
@@ -15,8 +90,7 @@ async def get_current_user_id(
     Dependency to get current authenticated user's ID from JWT token
     Raises 401 if token is invalid
     """
-    token = credentials.credentials
-    payload = decode_access_token(token)
+    payload = decode_token_cached(credentials.credentials)
 
     if payload is None:
         raise HTTPException(
@@ -37,54 +111,31 @@ async def get_current_user_id(
 
 
 async def get_current_user(
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ) -> dict:
     """
     Dependency to get full current user object from database
     Raises 401 if token invalid, 404 if user not found
     """
-    print(f"🔐 get_current_user called")
-    token = credentials.credentials
-    print(f"   Token: {token[:20]}...")
-    payload = decode_access_token(token)
-
-    if payload is None:
-        print("   ❌ Token decode failed")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    user_id = payload.get("sub")
-    print(f"   User ID from token: {user_id}")
-
-    db = get_database()
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await load_user(get_database(), user_id)
 
     if user is None:
-        print(f"   ❌ User not found in DB")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
 
-    print(f"   ✅ User found: {user.get('username')}")
-    print(f"   is_active: {user.get('is_active', 'NOT SET')}")
-    
     if not user.get("is_active", True):
-        print(f"   ❌ User is not active! Returning 403")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is inactive"
         )
 
-    print(f"   ✅ Auth successful for: {user.get('username')}")
     return user
 
 
 async def get_optional_user_id(
-        credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
 ) -> Optional[str]:
     """
     Optional authentication - returns user_id if authenticated, None otherwise
@@ -93,10 +144,9 @@ async def get_optional_user_id(
     if credentials is None:
         return None
 
-    token = credentials.credentials
-    payload = decode_access_token(token)
+    payload = decode_token_cached(credentials.credentials)
 
     if payload is None:
         return None
 
-    return payload.get("sub")
\ No newline at end of file
+    return payload.get("sub")
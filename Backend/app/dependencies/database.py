@@ -0,0 +1,27 @@
+"""
+Request-scoped database dependency
+
+    db = Depends(get_request_db)
+
+gives the route an IdentityMapDatabase over get_database(): repeated find_one-by-_id
+calls within the request are served from memory (see app/services/identity_map.py).
+"""
+
+from fastapi import Depends
+from app.services.identity_map import IdentityMapDatabase
+from config.database import get_database
+import os
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+
+async def get_request_db(db=Depends(get_database)):
+    """Yield an identity-mapped view of the database for one request"""
+    request_db = IdentityMapDatabase(db)
+    try:
+        yield request_db
+    finally:
+        if not DEMO_MODE and request_db.saved_round_trips:
+            print(f"🗂️ Identity map saved {request_db.saved_round_trips} round trip(s)")
+        request_db.close()
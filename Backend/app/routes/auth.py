@@ -1,16 +1,15 @@
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.models.user import UserCreate, UserLogin, UserResponse, User
-from app.utils.security import hash_password, verify_password, create_access_token, decode_access_token
+from app.utils.security import hash_password_async, verify_password_async, create_access_token
+from app.dependencies.auth import get_current_user_id, load_user
 from config.database import get_database
 from datetime import datetime
 from pydantic import BaseModel
 import httpx
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
-security = HTTPBearer()
 
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -38,7 +37,7 @@ async def signup(
 
     # Create new user with profile fields as empty/incomplete
     user_dict = user.model_dump()
-    user_dict["password"] = hash_password(user_dict["password"])
+    user_dict["password"] = await hash_password_async(user_dict["password"])
     user_dict["created_at"] = datetime.utcnow()
     user_dict["updated_at"] = datetime.utcnow()
     user_dict["notification_preferences"] = {}
@@ -90,7 +89,7 @@ async def login(
     print(f"✅ User found: {user.get('username')}")
     print(f"🔐 Verifying password...")
     
-    password_valid = verify_password(credentials.password, user["password"])
+    password_valid = await verify_password_async(credentials.password, user["password"])
     print(f"🔐 Password valid: {password_valid}")
     
     if not password_valid:
@@ -124,21 +123,11 @@ async def login(
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get current authenticated user's profile"""
-    token = credentials.credentials
-    payload = decode_access_token(token)
-
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
-    user_id = payload.get("sub")
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await load_user(db, user_id)
 
     if user is None:
         raise HTTPException(
@@ -266,7 +255,7 @@ async def google_login(
             new_user = {
                 "username": username,
                 "email": email,
-                "password": hash_password(auth_data.token[:20]),  # Dummy password
+                "password": await hash_password_async(auth_data.token[:20]),  # Dummy password
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow(),
                 "notification_preferences": {},
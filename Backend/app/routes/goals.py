@@ -1,11 +1,10 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id
 from app.models.goals import (
     UserGoal,
     SetGoalRequest,
@@ -16,27 +15,10 @@ from app.models.goals import (
     TimeUnit
 )
 from config.database import get_database
+from app.services.dashboard_service import DashboardService
+from app.services.checkin_counters import CheckinCounterService
 
 router = APIRouter(prefix="/goals", tags=["Goals"])
-security = HTTPBearer()
-
-
-# ============================================================================
-# AUTHENTICATION
-# ============================================================================
-
-async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Extract user ID from JWT token"""
-    token = credentials.credentials
-    payload = decode_access_token(token)
-
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
-    return payload.get("sub")
 
 
 # ============================================================================
@@ -142,7 +124,7 @@ async def create_frequency_goal(
         habit_id: str,
         target_user_id: str,
         goal_data: SetGoalRequest,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -160,8 +142,6 @@ async def create_frequency_goal(
 
     Returns the created goal with progress tracking fields.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Verify habit access
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
@@ -234,6 +214,11 @@ async def create_frequency_goal(
         updated_at=start_date
     )
 
+    # Start the counters from any check-ins the user already has on this habit
+    user_goal = user_goal.model_copy(update=await CheckinCounterService.initial_goal_counters(
+        db, habit_id, target_user_id, user_goal.model_dump()
+    ))
+
     # Update habit with new goal
     await db.habits.update_one(
         {"_id": ObjectId(habit_id)},
@@ -244,6 +229,7 @@ async def create_frequency_goal(
             }
         }
     )
+    await DashboardService.mark_stale(db, [target_user_id])
 
     # Fetch updated habit
     updated_habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
@@ -270,7 +256,7 @@ async def update_frequency_goal(
         habit_id: str,
         target_user_id: str,
         update_data: UpdateGoalRequest,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -282,8 +268,6 @@ async def update_frequency_goal(
 
     Note: Cannot change frequency_count, duration_count, or units after creation.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Verify habit access
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
@@ -352,11 +336,9 @@ async def create_user_goal_completion(
         habit_id: str,
         target_user_id: str,
         goal_data: SetGoalRequest,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    current_user_id = await get_current_user_id(credentials)
-
     request = SetGoalRequest(
         goal_type=GoalType.COMPLETION,
         goal_name=goal_data.goal_name,
@@ -371,7 +353,7 @@ async def create_user_goal_completion(
         habit_id=habit_id,
         target_user_id=target_user_id,
         goal_data=request,
-        credentials=credentials,
+        current_user_id=current_user_id,
         db=db
     )
 
@@ -391,7 +373,7 @@ async def create_user_goal(
         habit_id: str,
         target_user_id: str,
         goal_data: SetGoalRequest,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -403,8 +385,6 @@ async def create_user_goal(
 
     Returns the created goal with progress tracking fields.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Verify habit access
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
@@ -454,6 +434,11 @@ async def create_user_goal(
         updated_at=datetime.utcnow()
     )
 
+    # Start the counters from any check-ins the user already has on this habit
+    user_goal = user_goal.model_copy(update=await CheckinCounterService.initial_goal_counters(
+        db, habit_id, target_user_id, user_goal.model_dump()
+    ))
+
     # Update habit with new goal
     await db.habits.update_one(
         {"_id": ObjectId(habit_id)},
@@ -464,6 +449,7 @@ async def create_user_goal(
             }
         }
     )
+    await DashboardService.mark_stale(db, [target_user_id])
 
     # Fetch updated habit
     updated_habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
@@ -489,7 +475,7 @@ async def create_user_goal(
 async def get_user_goal(
         habit_id: str,
         target_user_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -500,8 +486,6 @@ async def get_user_goal(
 
     Returns the goal with current progress and status.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Verify habit access
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
@@ -533,7 +517,7 @@ async def get_user_goal(
 )
 async def get_habit_goals(
         habit_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -543,8 +527,6 @@ async def get_habit_goals(
 
     Returns a list of all goals for the habit.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Verify habit access
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
@@ -578,7 +560,7 @@ async def get_habit_goals(
 )
 async def get_my_goals(
         active_only: bool = True,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -588,8 +570,6 @@ async def get_my_goals(
 
     Returns a list of all goals for the current user and their partners.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Find all partnerships the user is in
     partnerships = await db.partnerships.find({
         "$or": [
@@ -664,11 +644,9 @@ async def update_user_goal_completion(
         habit_id: str,
         target_user_id: str,
         update_data: UpdateGoalRequest,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    current_user_id = await get_current_user_id(credentials)
-
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
     goals = habit.get("goals", {})
@@ -688,7 +666,7 @@ async def update_user_goal_completion(
         habit_id=habit_id,
         target_user_id=target_user_id,
         update_data=update_data,
-        credentials=credentials,
+        current_user_id=current_user_id,
         db=db
     )
 
@@ -707,7 +685,7 @@ async def update_user_goal(
         habit_id: str,
         target_user_id: str,
         update_data: UpdateGoalRequest,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -719,8 +697,6 @@ async def update_user_goal(
 
     Note: Progress fields (goal_progress, count_checkins, etc.) are calculated automatically.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Verify habit access
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
@@ -779,7 +755,7 @@ async def update_user_goal(
 async def delete_user_goal(
         habit_id: str,
         target_user_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -790,8 +766,6 @@ async def delete_user_goal(
 
     Note: This permanently removes the goal. Consider using status updates instead for historical tracking.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Verify habit access
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
@@ -818,6 +792,7 @@ async def delete_user_goal(
             "$set": {"updated_at": datetime.utcnow()}
         }
     )
+    await DashboardService.mark_stale(db, [target_user_id])
 
     return None
 
@@ -836,7 +811,7 @@ async def update_goal_status(
         habit_id: str,
         target_user_id: str,
         new_status: GoalStatus,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        current_user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
@@ -848,8 +823,6 @@ async def update_goal_status(
 
     Returns the updated goal.
     """
-    current_user_id = await get_current_user_id(credentials)
-
     # Verify habit access
     habit = await verify_habit_access(db, habit_id, current_user_id)
 
@@ -878,6 +851,7 @@ async def update_goal_status(
             }
         }
     )
+    await DashboardService.mark_stale(db, [target_user_id])
 
     # Fetch updated habit
     updated_habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
@@ -1,21 +1,27 @@
 
 from fastapi import APIRouter, HTTPException, status, Depends, Query
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.models.habit_log import (
     HabitLogCreate,
     HabitLogResponse,
     TodayLogStatus,
     PartnershipTodayStatus
 )
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id
 from app.services.streak_service import StreakCalculationService
+from app.services.partnership_service import PartnershipService
+from app.services.dashboard_service import DashboardService
+from app.services.checkin_counters import CheckinCounterService
 from app.models.goals import GoalStatus
 from config.database import get_database
+from app.dependencies.database import get_request_db
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime, date, timedelta
 from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.services.notification_service import notification_service
+from app.services.job_queue import job_queue
+import asyncio
 import os
 
 # Demo mode - disable verbose logging for faster performance
@@ -90,34 +96,27 @@ async def check_goal_milestones(
             break  # Only send one notif for each check-in
 
 router = APIRouter(tags=["Habit Logging"])
-security = HTTPBearer()
-
-
-async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
-
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
-    return payload.get("sub")
 
 
 @router.post("/habits/{habit_id}/log", response_model=HabitLogResponse, status_code=status.HTTP_201_CREATED)
 async def log_habit_completion(
         habit_id: str,
         log_data: HabitLogCreate,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
-        db: AsyncIOMotorDatabase = Depends(get_database)
+        user_id: str = Depends(get_current_user_id),
+        db: AsyncIOMotorDatabase = Depends(get_request_db)
 ):
-    """Log daily habit completion"""
-    user_id = await get_current_user_id(credentials)
+    """
+    Log daily habit completion.
 
-    # Verify habit exists and user has access
-    habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
+    Runs as a check-in pipeline: independent reads are issued together, documents
+    already loaded are reused downstream, and the log itself is a single upsert.
+    """
+    # Stage 1: everything that only depends on the path/token, fetched concurrently
+    habit, streak_doc, current_user = await asyncio.gather(
+        db.habits.find_one({"_id": ObjectId(habit_id)}),
+        db.streaks.find_one({"habit_id": ObjectId(habit_id)}),
+        db.users.find_one({"_id": ObjectId(user_id)}, {"username": 1}),
+    )
 
     if not habit:
         raise HTTPException(
@@ -130,7 +129,7 @@ async def log_habit_completion(
     if isinstance(partnership_id, str):
         partnership_id = ObjectId(partnership_id)
 
-    # Verify user is part of partnership
+    # Stage 2: verify user is part of partnership (this doc is reused for the rest of the request)
     partnership = await db.partnerships.find_one({
         "_id": partnership_id,
         "$or": [
@@ -148,100 +147,66 @@ async def log_habit_completion(
     # Get today's date as datetime (MongoDB compatible)
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
 
-    # Check if already logged today
-    existing_log = await db.habit_logs.find_one({
-        "habit_id": habit_id,
-        "user_id": user_id,
-        "log_date": today
-    })
-
-    if existing_log:
-        # Update existing log
-        update_data = {
-            "completed": log_data.completed,
-            "timestamp": datetime.utcnow()
-        }
-        # Include value if provided (for completion goals)
-        if log_data.value is not None:
-            update_data["value"] = log_data.value
-        
-        await db.habit_logs.update_one(
-            {"_id": existing_log["_id"]},
-            {"$set": update_data}
-        )
-        log_id = existing_log["_id"]
+    # Stage 3: create or update today's log in one round trip
+    update_data = {
+        "completed": log_data.completed,
+        "timestamp": datetime.utcnow()
+    }
+    # Include value if provided (for completion goals)
+    if log_data.value is not None:
+        update_data["value"] = log_data.value
+
+    new_log_id = ObjectId()
+    previous_log = await db.habit_logs.find_one_and_update(
+        {"habit_id": habit_id, "user_id": user_id, "log_date": today},
+        {"$set": update_data, "$setOnInsert": {"_id": new_log_id}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous_log:
+        log = {**previous_log, **update_data}
     else:
-        # Create new log
-        log_entry = {
-            "habit_id": habit_id,
-            "user_id": user_id,
-            "completed": log_data.completed,
-            "log_date": today,
-            "timestamp": datetime.utcnow()
-        }
-        # Include value if provided (for completion goals)
-        if log_data.value is not None:
-            log_entry["value"] = log_data.value
+        log = {"_id": new_log_id, "habit_id": habit_id, "user_id": user_id, "log_date": today, **update_data}
+
+    # Keep the partnership's and user's check-in counts current when the day flips either way
+    count_delta, value_delta = CheckinCounterService.log_delta(previous_log, log)
+    if count_delta:
+        await asyncio.gather(
+            PartnershipService.record_checkin(db, str(partnership_id), habit_id, count_delta),
+            CheckinCounterService.record_user_checkin(db, user_id, count_delta),
+        )
 
-        result = await db.habit_logs.insert_one(log_entry)
-        log_id = result.inserted_id
+    # Stage 4: who has completed today? At most two logs for (habit_id, log_date)
+    completed_today = await db.habit_logs.find(
+        {"habit_id": habit_id, "log_date": today, "completed": True},
+        {"user_id": 1}
+    ).to_list(2)
+    completed_users = {str(entry["user_id"]) for entry in completed_today}
+    both_completed_today = (
+        str(partnership["user_id_1"]) in completed_users and
+        str(partnership["user_id_2"]) in completed_users
+    )
 
     # Check if both partners completed - update Partnership-level points (legacy)
-    await update_partnership_streak(db, habit_id, partnership_id, today)
-
-    # Recompute streak from logs and upsert into streaks (persistent cache)
-    recomputed = await StreakCalculationService.recompute_streak_from_logs(
-        db, habit_id, str(partnership_id)
-    )
-    await StreakCalculationService.upsert_streaks(
-        db, habit_id, str(partnership_id), recomputed
+    if both_completed_today:
+        await update_partnership_streak(db, habit_id, partnership, today)
+
+    # Incremental streak update from the streaks doc loaded in stage 1, written only if the
+    # doc hasn't moved since (falls back to a full recompute from logs only when it can't be
+    # applied); also invalidates the mem cache
+    streak_data = await StreakCalculationService.update_streak_on_checkin(
+        db, habit_id, str(partnership_id), today.date(), both_completed_today, streak_doc
     )
-    # Invalidate in-memory cache for this habit so next read is fresh
-    StreakCalculationService.invalidate_mem_cache(habit_id)
 
-    # Partner notification will be sent below after we have all the info
-
-    # Update goal progress for this user if they have a goal on this habit
+    # Update goal progress for this user if they have a goal on this habit: the
+    # counters move by this log's change (see CheckinCounterService), so no log counting
     previous_goal_progress = None
-    if log_data.completed and habit.get("goals") and user_id in habit["goals"]:
-        goal_data = habit["goals"][user_id]
+    goal_data = (habit.get("goals") or {}).get(user_id)
+    if goal_data and (log_data.completed or count_delta or value_delta):
         goal_type = goal_data.get("goal_type")
-        
-        # Store previous goal_progress for milestone calculation
-        previous_goal_progress = goal_data.get("goal_progress", 0) or 0
-        
-        updates = {
-            f"goals.{user_id}.checked_in": True,
-            f"goals.{user_id}.updated_at": datetime.utcnow(),
-        }
+        increments = CheckinCounterService.goal_increments(user_id, goal_data, count_delta, value_delta)
 
-        if goal_type == "completion" and goal_data.get("target_value") is not None:
-            # For completion goals with target_value, accumulate values from logs
-            # Sum all values from completed logs for this user
-            logs = await db.habit_logs.find(
-                {"habit_id": habit_id, "user_id": user_id, "completed": True},
-                {"value": 1}
-            ).to_list(length=None)
-            
-            accumulated_value = sum(log.get("value", 0) or 0 for log in logs)
-            total_checkins_for_user = len(logs)
-            
-            updates[f"goals.{user_id}.count_checkins"] = total_checkins_for_user
-            updates[f"goals.{user_id}.goal_progress"] = accumulated_value
-            
-            # Check if goal is completed (accumulated value >= target)
-            if accumulated_value >= goal_data.get("target_value", 0):
-                updates[f"goals.{user_id}.goal_status"] = GoalStatus.COMPLETED.value
-        else:
-            # For frequency goals or legacy completion goals, count check-ins
-            total_checkins_for_user = await db.habit_logs.count_documents({
-                "habit_id": habit_id,
-                "user_id": user_id,
-                "completed": True
-            })
-            
-            updates[f"goals.{user_id}.count_checkins"] = total_checkins_for_user
-            updates[f"goals.{user_id}.goal_progress"] = total_checkins_for_user
+        updates = {f"goals.{user_id}.updated_at": datetime.utcnow()}
 
         # Compute total required for frequency/completion goals and persist it
         freq_count = goal_data.get("frequency_count")
@@ -255,64 +220,69 @@ async def log_habit_completion(
         # For completion goals with target_value, total_required stays None
         # because they use goal_progress vs target_value instead
 
-        if total_required is not None:
-            updates[f"goals.{user_id}.total_checkins_required"] = total_required
+        if log_data.completed:
+            updates[f"goals.{user_id}.checked_in"] = True
+            if total_required is not None:
+                updates[f"goals.{user_id}.total_checkins_required"] = total_required
 
-        # Check completion status
-        if goal_type == "completion" and goal_data.get("target_value") is not None:
-            # For completion goals with target_value, completion is already checked above (line 227)
-            pass
-        elif total_required is not None and total_required > 0 and total_checkins_for_user >= total_required:
-            # For frequency goals or legacy completion goals
-            updates[f"goals.{user_id}.goal_status"] = GoalStatus.COMPLETED.value
-
-        await db.habits.update_one(
+        goal_update = {"$set": updates}
+        if increments:
+            goal_update["$inc"] = increments
+
+        # Update and get the refreshed habit snapshot for milestone checks in one round trip
+        habit = await db.habits.find_one_and_update(
             {"_id": ObjectId(habit_id)},
-            {"$set": updates}
-        )
-        # Refresh habit snapshot for downstream milestone checks
-        habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
+            goal_update,
+            return_document=ReturnDocument.AFTER
+        ) or habit
+        goal_data = habit.get("goals", {}).get(user_id, goal_data)
+        goal_progress = goal_data.get("goal_progress", 0) or 0
+        previous_goal_progress = goal_progress - increments.get(f"goals.{user_id}.goal_progress", 0)
 
-    # Get the log
-    log = await db.habit_logs.find_one({"_id": log_id})
+        # Check completion status
+        if CheckinCounterService.tracks_value(goal_data):
+            # Completion goals with target_value: accumulated value >= target
+            reached = goal_progress >= goal_data.get("target_value", 0)
+        else:
+            # Frequency goals or legacy completion goals
+            reached = bool(total_required) and goal_data.get("count_checkins", 0) >= total_required
+        if log_data.completed and reached and goal_data.get("goal_status") != GoalStatus.COMPLETED.value:
+            await db.habits.update_one(
+                {"_id": ObjectId(habit_id)},
+                {"$set": {f"goals.{user_id}.goal_status": GoalStatus.COMPLETED.value}}
+            )
+            goal_data["goal_status"] = GoalStatus.COMPLETED.value
 
-    # Get current streak value from persistent cache
-    current_streak_doc = await db.streaks.find_one({"habit_id": ObjectId(habit_id)})
-    current_streak_val = 0 if not current_streak_doc else current_streak_doc.get("current_streak", 0)
+    current_streak_val = streak_data.get("current_streak", 0)
 
-    # Send notif to partner when user checks in
-    if log_data.completed and partnership_id:
-        try:
-            # get partner's info
-            partnership = await db.partnerships.find_one({"_id": partnership_id})
-            if partnership:
-                # find who the partner is
-                partner_id = None
-                if str(partnership["user_id_1"]) == user_id:
-                    partner_id = str(partnership["user_id_2"])
-                else:
-                    partner_id = str(partnership["user_id_1"])
-                
-                # Get current user's info for notification
-                current_user = await db.users.find_one({"_id": ObjectId(user_id)})
-                current_username = current_user.get("username", "Your partner") if current_user else "Your partner"
-                
-                # send notif to partner using service
-                await notification_service.send_partner_checkin_notification(
-                    user_id=partner_id,
-                    partner_user_id=user_id,
-                    partner_username=current_username,
-                    habit_id=habit_id,
-                    habit_name=habit.get("habit_name", "your habit"),
-                    partnership_id=str(partnership_id)
-                )
-        except Exception as e:
-            # Don't fail the check-in if notification fails
-            if not DEMO_MODE:
-                print(f"Warning: Failed to send partner notification: {e}")
-    # Check for goal milestones and send notif if reached
+    # Both partners' home screens show this check-in
+    await DashboardService.mark_partnership_stale(db, partnership)
+
+    # Side effects (partner notification, milestone check) run on the background job
+    # queue so the response doesn't wait on preference lookups, inserts and WebSocket sends
     if log_data.completed and partnership_id:
-        await check_goal_milestones(
+        # find who the partner is (partnership doc from stage 2)
+        if str(partnership["user_id_1"]) == user_id:
+            partner_id = str(partnership["user_id_2"])
+        else:
+            partner_id = str(partnership["user_id_1"])
+
+        current_username = current_user.get("username", "Your partner") if current_user else "Your partner"
+
+        # send notif to partner using service
+        await job_queue.enqueue(
+            notification_service.send_partner_checkin_notification,
+            job_name="partner_checkin_notification",
+            user_id=partner_id,
+            partner_user_id=user_id,
+            partner_username=current_username,
+            habit_id=habit_id,
+            habit_name=habit.get("habit_name", "your habit"),
+            partnership_id=str(partnership_id)
+        )
+        # Check for goal milestones and send notif if reached
+        await job_queue.enqueue(
+            check_goal_milestones,
             db=db,
             habit_id=habit_id,
             user_id=user_id,
@@ -333,54 +303,44 @@ async def log_habit_completion(
     )
 
 
-async def update_partnership_streak(db, habit_id: str, partnership_id: ObjectId, check_date: datetime):
-    """Update partnership streak if both partners completed"""
+async def update_partnership_streak(db, habit_id: str, partnership: dict, check_date: datetime):
+    """
+    Update the legacy partnership-level streak/points once both partners completed.
 
-    # Get both partner IDs
-    partnership = await db.partnerships.find_one({"_id": partnership_id})
+    Callers pass the partnership document they already loaded and only call this
+    when both partners have a completed log for `check_date`.
+    """
     user1_id = str(partnership["user_id_1"])
     user2_id = str(partnership["user_id_2"])
+    current_streak = partnership.get("current_streak", 0)
 
-    # Check if both completed today
-    logs_today = await db.habit_logs.find({
+    # Check if yesterday was also completed (for streak continuation)
+    yesterday = check_date - timedelta(days=1)
+    logs_yesterday = await db.habit_logs.find({
         "habit_id": habit_id,
-        "log_date": check_date,
+        "log_date": yesterday,
         "completed": True
     }).to_list(2)
 
-    logged_users = {log["user_id"] for log in logs_today}
-
-    if user1_id in logged_users and user2_id in logged_users:
-        # Both completed! Update streak
-        current_streak = partnership.get("current_streak", 0)
+    logged_yesterday = {log["user_id"] for log in logs_yesterday}
 
-        # Check if yesterday was also completed (for streak continuation)
-        yesterday = check_date - timedelta(days=1)
-        logs_yesterday = await db.habit_logs.find({
-            "habit_id": habit_id,
-            "log_date": yesterday,
-            "completed": True
-        }).to_list(2)
-
-        logged_yesterday = {log["user_id"] for log in logs_yesterday}
-
-        if user1_id in logged_yesterday and user2_id in logged_yesterday:
-            # Streak continues
-            new_streak = current_streak + 1
-        else:
-            # New streak starts
-            new_streak = 1
-
-        await db.partnerships.update_one(
-            {"_id": partnership_id},
-            {
-                "$set": {
-                    "current_streak": new_streak,
-                    "updated_at": datetime.utcnow()
-                },
-                "$inc": {"total_points": 10}
-            }
-        )
+    if user1_id in logged_yesterday and user2_id in logged_yesterday:
+        # Streak continues
+        new_streak = current_streak + 1
+    else:
+        # New streak starts
+        new_streak = 1
+
+    await db.partnerships.update_one(
+        {"_id": partnership["_id"]},
+        {
+            "$set": {
+                "current_streak": new_streak,
+                "updated_at": datetime.utcnow()
+            },
+            "$inc": {"total_points": 10}
+        }
+    )
 
 
 @router.get("/habits/{habit_id}/logs", response_model=List[HabitLogResponse])
@@ -389,12 +349,10 @@ async def get_habit_logs(
         start_date: Optional[str] = Query(None),
         end_date: Optional[str] = Query(None),
         user_id_filter: Optional[str] = Query(None, alias="user_id"),
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get habit log history with optional filters"""
-    user_id = await get_current_user_id(credentials)
-
     # Verify habit exists and user has access
     habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
 
@@ -476,12 +434,10 @@ async def get_habit_logs(
 @router.get("/habits/{habit_id}/logs/today", response_model=TodayLogStatus)
 async def get_today_log_status(
         habit_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get today's log status for both partners"""
-    user_id = await get_current_user_id(credentials)
-
     # Verify habit exists and user has access
     habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
 
@@ -552,12 +508,10 @@ async def get_today_log_status(
 @router.get("/partnerships/{partnership_id}/logs/today", response_model=PartnershipTodayStatus)
 async def get_partnership_today_status(
         partnership_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all habits' completion status for today"""
-    user_id = await get_current_user_id(credentials)
-
     # Verify partnership and access
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(partnership_id),
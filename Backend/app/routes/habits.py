@@ -1,5 +1,4 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.models.habit import (
     HabitCreate,
     HabitUpdate,
@@ -9,7 +8,9 @@ from app.models.habit import (
     ConvertDraftRequest
 )
 from app.utils.preset_habits import get_preset_habits
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id
+from app.services.dashboard_service import DashboardService
+from app.services.notification_service import notification_service
 from config.database import get_database
 from bson import ObjectId
 from datetime import datetime
@@ -19,20 +20,6 @@ from app.routes.auth import get_current_user
 from app.models.user import UserResponse
 
 router = APIRouter(prefix="/habits", tags=["Habits"])
-security = HTTPBearer()
-
-
-async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = decode_access_token(token)
-
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
-    return payload.get("sub")
 
 
 def format_habit_response(habit: dict) -> HabitResponse:
@@ -68,14 +55,13 @@ async def get_habit_library():
 @router.post("", response_model=HabitResponse, status_code=status.HTTP_201_CREATED)
 async def create_habit(
         habit: HabitCreate,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """
     Create new habit for partnership.
     Habits become ACTIVE immediately (no partner approval flow).
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     # Validate partnership_id is provided
     if not habit.partnership_id:
@@ -121,14 +107,13 @@ async def create_habit(
 
     result = await db.habits.insert_one(habit_data)
     created_habit = await db.habits.find_one({"_id": result.inserted_id})
+    await DashboardService.mark_partnership_stale(db, partnership)
 
     return format_habit_response(created_habit)
 
 
-@router.get("/pending-approval", response_model=List[HabitResponse])
-async def get_pending_habits(
-        credentials: HTTPAuthorizationCredentials = Depends(security)
-):
+@router.get("/pending-approval", response_model=List[HabitResponse], dependencies=[Depends(get_current_user_id)])
+async def get_pending_habits():
     """
     Pending approval flow removed.
     This endpoint now returns an empty list for backward compatibility.
@@ -138,12 +123,10 @@ async def get_pending_habits(
 
 @router.get("", response_model=List[HabitResponse])
 async def get_habits(
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        user_id: str = Depends(get_current_user_id),
         db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all ACTIVE habits for user's partnerships"""
-    user_id = await get_current_user_id(credentials)
-
     # Find user's partnerships
     partnerships = await db.partnerships.find({
         "$or": [
@@ -262,6 +245,9 @@ async def update_habit_draft(
     )
 
     updated_draft = await db.habits.find_one({"_id": ObjectId(draft_id)})
+    # Habits from an ended partnership go back to drafts and keep their notifications
+    if update_dict.get("habit_name", existing_draft["habit_name"]) != existing_draft["habit_name"]:
+        await notification_service.queue_habit_snapshot_refresh(db, draft_id)
     return format_habit_response(updated_draft)
 
 
@@ -296,11 +282,10 @@ async def delete_habit_draft(
 @router.get("/{habit_id}", response_model=HabitResponse)
 async def get_habit(
         habit_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """Get specific habit details"""
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     # Validate that habit_id is a valid ObjectId format
     # This prevents errors when routes like "/drafts" are accidentally matched
@@ -340,14 +325,13 @@ async def get_habit(
 async def update_habit(
         habit_id: str,
         habit_update: HabitUpdate,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """
     Update a habit directly (no approval needed)
     Works for both DRAFT and ACTIVE habits
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     if not ObjectId.is_valid(habit_id):
         raise HTTPException(
@@ -364,6 +348,7 @@ async def update_habit(
         )
 
     # For DRAFT habits, verify user is the creator
+    partnership = None
     if habit["status"] == HabitStatus.DRAFT.value:
         if habit["created_by"] != user_id:
             raise HTTPException(
@@ -396,17 +381,20 @@ async def update_habit(
     )
 
     updated_habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
+    await DashboardService.mark_partnership_stale(db, partnership)
+    # The name is part of the snapshot in notifications about this habit
+    if update_dict.get("habit_name", habit["habit_name"]) != habit["habit_name"]:
+        await notification_service.queue_habit_snapshot_refresh(db, habit_id)
     return format_habit_response(updated_habit)
 
 
 @router.delete("/{habit_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_habit(
         habit_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """Delete a habit"""
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     # Validate that habit_id is a valid ObjectId format
     if not ObjectId.is_valid(habit_id):
@@ -424,6 +412,7 @@ async def delete_habit(
         )
 
     # For DRAFT habits, verify user is the creator
+    partnership = None
     if habit.get("status") == HabitStatus.DRAFT.value:
         if habit.get("created_by") != user_id:
             raise HTTPException(
@@ -463,14 +452,14 @@ async def delete_habit(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Habit not found or already deleted"
         )
+    await DashboardService.mark_partnership_stale(db, partnership)
 
     return None
 
 
-@router.post("/{habit_id}/approve")
+@router.post("/{habit_id}/approve", dependencies=[Depends(get_current_user_id)])
 async def approve_habit(
-        habit_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        habit_id: str
 ):
     """
     Deprecated: approval flow removed. Habits are active immediately.
@@ -481,10 +470,9 @@ async def approve_habit(
     )
 
 
-@router.post("/{habit_id}/reject")
+@router.post("/{habit_id}/reject", dependencies=[Depends(get_current_user_id)])
 async def reject_habit(
-        habit_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        habit_id: str
 ):
     """
     Deprecated: approval flow removed. Habits are active immediately.
@@ -499,14 +487,13 @@ async def reject_habit(
 async def add_partner_to_habit(
         habit_id: str,
         partner_data: dict,  # Contains partner_id
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """
     Add a partner to an existing habit
     Creates a partnership-habit link
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     if not ObjectId.is_valid(habit_id):
         raise HTTPException(
@@ -565,6 +552,7 @@ async def add_partner_to_habit(
             }
         }
     )
+    await DashboardService.mark_partnership_stale(db, partnership)
     
     return {
         "success": True,
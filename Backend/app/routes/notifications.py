@@ -1,38 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from config.database import get_database
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id
+from app.dependencies.database import get_request_db
 from app.models.notification import (
     Notification,
     NotificationCreate,
     NotificationResponse,
     NotificationType
 )
-from app.services.notification_service import notification_service
+from app.services.notification_service import NotificationService, notification_service
+from app.services.reminder_service import ReminderService
 import os
 
 # Demo mode - disable verbose logging for faster performance
 DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
 
-router = APIRouter(prefix="/notifications", tags=["notifications"])
-security = HTTPBearer()
-
-
-async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
-    """Extract user ID from JWT token"""
-    token = credentials.credentials
-    payload = decode_access_token(token)
-
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
+NOTIFICATION_PAGE_SIZE = 50
+NOTIFICATION_PAGE_MAX = 100
+# "Not archived" as point values rather than {"$ne": True}: the two points can each be
+# read from the (user_id, is_read, archived, created_at, _id) index in sort order and
+# merged, where $ne's ranges would need a blocking sort of every unread row
+NOT_ARCHIVED = {"$in": [False, None]}
 
-    return payload.get("sub")
+router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 
 def calculate_time_ago(created_at: datetime) -> str:
@@ -60,7 +53,7 @@ def calculate_time_ago(created_at: datetime) -> str:
 
 @router.get("/test-fetch")
 async def test_fetch_notifications(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """TEST endpoint - fetch notifications with detailed logging"""
@@ -68,22 +61,6 @@ async def test_fetch_notifications(
         print("\n" + "="*60)
         print("TEST NOTIFICATIONS ENDPOINT CALLED")
         print("="*60)
-    
-    token = credentials.credentials
-    if not DEMO_MODE:
-        print(f"Token received: {token[:30]}...")
-    
-    payload = decode_access_token(token)
-    if not DEMO_MODE:
-        print(f"Token payload: {payload}")
-    
-    if not payload:
-        if not DEMO_MODE:
-            print("ERROR: Token decode failed!")
-        return {"error": "Invalid token"}
-    
-    user_id = payload.get("sub")
-    if not DEMO_MODE:
         print(f"User ID: {user_id}")
     
     # Find notifications
@@ -98,13 +75,11 @@ async def test_fetch_notifications(
 
 @router.post("/test-push")
 async def test_push_notification(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """TEST endpoint - send a test push notification to the current user"""
     try:
-        user_id = await get_current_user_id(credentials)
-        
         # Send a test notification using the notification service
         await notification_service.send_notification(
             user_id=user_id,
@@ -128,15 +103,46 @@ async def test_push_notification(
         )
 
 
+def encode_cursor(notif_doc: dict) -> str:
+    """Keyset cursor for the page after `notif_doc`: its (created_at, _id)"""
+    return f"{notif_doc['created_at'].isoformat()}_{notif_doc['_id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """(created_at, _id) from a cursor; ValueError if it's malformed"""
+    created_at, _, notif_id = cursor.rpartition("_")
+    if not ObjectId.is_valid(notif_id):
+        raise ValueError("invalid notification id")
+    return datetime.fromisoformat(created_at), ObjectId(notif_id)
+
+
 @router.get("/", response_model=List[NotificationResponse])
 async def get_notifications(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database),
-    include_read: bool = Query(False, description="Include read notifications")
+    include_read: bool = Query(False, description="Include read notifications"),
+    before: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    limit: int = Query(NOTIFICATION_PAGE_SIZE, ge=1, le=NOTIFICATION_PAGE_MAX, description="Page size")
 ):
-    """Get all notifications for the current user"""
+    """
+    Get notifications for the current user, newest first.
+
+    Paged by (created_at, _id): when there are more, the response's X-Next-Cursor
+    header is the `before` value for the next page. Partner and habit display fields
+    come from each notification's stored snapshot (see NotificationService).
+    """
+    cursor_key = None
+    if before:
+        try:
+            cursor_key = decode_cursor(before)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+
     try:
-        user_id = await get_current_user_id(credentials)
         if not DEMO_MODE:
             print(f"📬 FETCHING NOTIFICATIONS for user ID: {user_id}")
         
@@ -149,15 +155,38 @@ async def get_notifications(
         # If include_read is True, show only archived notifications
         if not include_read:
             query["is_read"] = False
-            query["archived"] = {"$ne": True}
+            query["archived"] = NOT_ARCHIVED
         else:
             # When include_read is True (showArchived=true), filter for archived notifications only
             query["archived"] = True
-        
-        notifications_cursor = db.notifications.find(query).sort("created_at", -1).limit(50)
+
+        # Keyset pagination: strictly older than the cursor, _id breaking created_at ties
+        if cursor_key:
+            created_before, id_before = cursor_key
+            query["$or"] = [
+                {"created_at": {"$lt": created_before}},
+                {"created_at": created_before, "_id": {"$lt": id_before}},
+            ]
+        
+        # One extra to know whether there's a next page
+        notif_docs = await db.notifications.find(query).sort(
+            [("created_at", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        if len(notif_docs) > limit:
+            notif_docs = notif_docs[:limit]
+            if isinstance(notif_docs[-1].get("created_at"), datetime):
+                response.headers["X-Next-Cursor"] = encode_cursor(notif_docs[-1])
+
+        # Display fields come from the snapshot stored with each notification; only rows
+        # written before snapshots existed (not yet backfilled) are looked up
+        legacy_docs = [doc for doc in notif_docs if "snapshot" not in doc]
+        if legacy_docs:
+            users_by_id, habit_names = await NotificationService.related_lookups(db, legacy_docs)
+            for doc in legacy_docs:
+                doc["snapshot"] = NotificationService.build_snapshot(doc, users_by_id, habit_names)
         
         notifications = []
-        async for notif_doc in notifications_cursor:
+        for notif_doc in notif_docs:
             try:
                 title = notif_doc.get('title', 'Notification')
                 if not DEMO_MODE:
@@ -195,32 +224,8 @@ async def get_notifications(
                     "created_at": created_at
                 }
                 
-                # If there's a related user, get their info
-                if notif_doc.get("related_user_id"):
-                    try:
-                        partner = await db.users.find_one({"_id": ObjectId(notif_doc["related_user_id"])})
-                        if partner:
-                            notif_data["partner_username"] = partner.get("username")
-                            notif_data["partner_avatar"] = partner.get("profile_photo_url") or partner.get("profile_picture")
-                    except Exception as e:
-                        if not DEMO_MODE:
-                            print(f"⚠️ Error fetching partner for notification: {e}")
-                        # Continue without partner info if ObjectId conversion fails
-                
-                # If there's a related habit, get habit name
-                if notif_doc.get("related_id") and notif_doc.get("type") in [
-                    NotificationType.HABIT_REMINDER,
-                    NotificationType.MISSED_HABIT,
-                    NotificationType.PROGRESS_MILESTONE
-                ]:
-                    try:
-                        habit = await db.habits.find_one({"_id": ObjectId(notif_doc["related_id"])})
-                        if habit:
-                            notif_data["habit_name"] = habit.get("habit_name")
-                    except Exception as e:
-                        if not DEMO_MODE:
-                            print(f"⚠️ Error fetching habit for notification: {e}")
-                        # Continue without habit name if ObjectId conversion fails
+                # Partner name/avatar and habit name, as of the last snapshot refresh
+                notif_data.update(notif_doc.get("snapshot") or {})
                 
                 notifications.append(NotificationResponse(**notif_data))
             except Exception as e:
@@ -240,10 +245,9 @@ async def get_notifications(
         )
 
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_current_user_id)])
 async def create_notification(
     notification: NotificationCreate,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
     db=Depends(get_database)
 ):
     """Create a new notification"""
@@ -269,13 +273,11 @@ async def create_notification(
 @router.put("/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Mark a notification as read (archives it instead of deleting)"""
     try:
-        user_id = await get_current_user_id(credentials)
-        
         result = await db.notifications.update_one(
             {
                 "_id": ObjectId(notification_id),
@@ -312,13 +314,11 @@ async def mark_notification_read(
 @router.put("/{notification_id}/action")
 async def mark_notification_action_taken(
     notification_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Mark a notification as action taken"""
     try:
-        user_id = await get_current_user_id(credentials)
-        
         result = await db.notifications.update_one(
             {
                 "_id": ObjectId(notification_id),
@@ -348,13 +348,11 @@ async def mark_notification_action_taken(
 
 @router.put("/archive-all")
 async def archive_all_notifications(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Archive all unread notifications for the current user"""
     try:
-        user_id = await get_current_user_id(credentials)
-        
         result = await db.notifications.update_many(
             {
                 "user_id": ObjectId(user_id),
@@ -384,13 +382,11 @@ async def archive_all_notifications(
 @router.put("/{notification_id}/archive")
 async def archive_notification(
     notification_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Archive a notification (without marking as read)"""
     try:
-        user_id = await get_current_user_id(credentials)
-        
         result = await db.notifications.update_one(
             {
                 "_id": ObjectId(notification_id),
@@ -425,13 +421,11 @@ async def archive_notification(
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Delete a notification"""
     try:
-        user_id = await get_current_user_id(credentials)
-        
         result = await db.notifications.delete_one(
             {
                 "_id": ObjectId(notification_id),
@@ -460,13 +454,11 @@ async def delete_notification(
 async def send_partner_nudge(
     partner_id: str,
     habit_id: str = Query(..., description="Habit ID to nudge about"),
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db=Depends(get_database)
+    user_id: str = Depends(get_current_user_id),
+    db=Depends(get_request_db)
 ):
     """Send a nudge notification to a partner (rate limited to once per day per habit)"""
     try:
-        user_id = await get_current_user_id(credentials)
-        
         # Verify partnership exists
         habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
         if not habit:
@@ -530,7 +522,8 @@ async def send_partner_nudge(
             sender_user_id=user_id,
             sender_username=username,
             habit_id=habit_id,
-            habit_name=habit_name
+            habit_name=habit_name,
+            db=db
         )
         
         return {
@@ -551,17 +544,15 @@ async def send_partner_nudge(
 
 @router.get("/unread/count")
 async def get_unread_count(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Get count of unread notifications"""
     try:
-        user_id = await get_current_user_id(credentials)
-        
         count = await db.notifications.count_documents({
             "user_id": ObjectId(user_id),
             "is_read": False,
-            "archived": {"$ne": True}
+            "archived": NOT_ARCHIVED
         })
         
         return {"unread_count": count}
@@ -600,62 +591,16 @@ async def send_checkin_reminders(
         )
     
     try:
-        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Get all active habits
-        active_habits = await db.habits.find({
-            "status": "active"
-        }).to_list(1000)
-        
-        reminders_sent = 0
-        
-        for habit in active_habits:
-            partnership_id = habit.get("partnership_id")
-            if not partnership_id:
-                continue
-            
-            # Convert to ObjectId if string
-            if isinstance(partnership_id, str):
-                partnership_id = ObjectId(partnership_id)
-            
-            # Get partnership
-            partnership = await db.partnerships.find_one({"_id": partnership_id})
-            if not partnership:
-                continue
-            
-            user1_id = str(partnership["user_id_1"])
-            user2_id = str(partnership["user_id_2"])
-            habit_id = str(habit["_id"])
-            habit_name = habit.get("habit_name", "your habit")
-            
-            # Check if users have checked in today
-            for user_id in [user1_id, user2_id]:
-                # Check if user has already checked in today
-                # Convert habit_id and user_id to ObjectId for proper database query
-                today_log = await db.habit_logs.find_one({
-                    "habit_id": ObjectId(habit_id),
-                    "user_id": ObjectId(user_id),
-                    "log_date": today,
-                    "completed": True
-                })
-                
-                # Only send reminder if user hasn't checked in yet today
-                if not today_log:
-                    try:
-                        await notification_service.send_habit_reminder_notification(
-                            user_id=user_id,
-                            habit_id=habit_id,
-                            habit_name=habit_name
-                        )
-                        reminders_sent += 1
-                    except Exception as e:
-                        if not DEMO_MODE:
-                            print(f"Warning: Failed to send reminder to user {user_id} for habit {habit_id}: {e}")
+        # One aggregation for every (user, habit) pair missing today's check-in,
+        # streamed in batches into bulk notification creation
+        summary = await ReminderService.send_checkin_reminders(db)
+        reminders_sent = summary["inserted"]
         
         return {
             "success": True,
             "message": f"Sent {reminders_sent} checkin reminder notifications",
-            "reminders_sent": reminders_sent
+            "reminders_sent": reminders_sent,
+            "stats": summary
         }
         
     except Exception as e:
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.services.notification_service import notification_service
+from app.services.streak_service import StreakCalculationService
+from app.services.partnership_service import PartnershipService
+from app.services.dashboard_service import DashboardService
 from app.models.partnership_model import (
     PartnershipCreate,
     PartnershipStatus,
@@ -15,37 +17,25 @@ from app.models.partnership_model import (
     PartnerRequestDB,
 )
 
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id
+from app.dependencies.database import get_request_db
 from config.database import get_database
 from bson import ObjectId
 from datetime import datetime
 from typing import List, Optional
+import asyncio
 import os
 
 # Demo mode - disable verbose logging for faster performance
 DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
 
 router = APIRouter(prefix="/partnerships", tags=["Partnerships"])
-security = HTTPBearer()
 
 
-async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Extract user ID from JWT token"""
-    token = credentials.credentials
-    payload = decode_access_token(token)
-
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-
-    return payload.get("sub")
-
 #Retrieve user's current partnership details
 @router.get("/current", response_model=PartnershipDetailResponse)
 async def get_current_partnership(
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """
     GET: Retrieve user's current partnership details
@@ -60,7 +50,6 @@ async def get_current_partnership(
         Current active partnership with habits and statistics
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     # Find active partnership
     partnership = await db.partnerships.find_one({
@@ -94,14 +83,21 @@ async def get_current_partnership(
     # Calculate partnership age
     partnership_age_days = (datetime.utcnow() - partnership["created_at"]).days
 
+    # Streaks for every habit in one batched lookup (habit.current_streak is deprecated)
+    habit_ids = [str(h["_id"]) for h in habits]
+    streaks = await StreakCalculationService.get_streaks_cached_many(
+        db, habit_ids, {habit_id: str(partnership["_id"]) for habit_id in habit_ids}
+    )
+
     # Get current streak from habits (minimum of both partners' streaks)
     current_streak = 0
     longest_streak = 0
     if habits:
         # For now, use the first habit's streak
         # TODO: Implement proper streak calculation across both partners
-        current_streak = habits[0].get("current_streak", 0)
-        longest_streak = habits[0].get("longest_streak", 0)
+        first_streak = streaks.get(habit_ids[0], {})
+        current_streak = first_streak.get("current_streak", 0)
+        longest_streak = first_streak.get("longest_streak", 0)
 
     return PartnershipDetailResponse(
         id=str(partnership["_id"]),
@@ -121,7 +117,7 @@ async def get_current_partnership(
                 name=h["habit_name"],
                 type=h.get("habit_type"),
                 frequency=h.get("frequency"),
-                current_streak=h.get("current_streak", 0)
+                current_streak=streaks.get(str(h["_id"]), {}).get("current_streak", 0)
             )
             for h in habits
         ]
@@ -131,7 +127,8 @@ async def get_current_partnership(
 @router.post("/invites", response_model=PartnerRequestResponse, status_code=status.HTTP_201_CREATED)
 async def send_partnership_invite(
     partnership: PartnershipCreate,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    sender_id: str = Depends(get_current_user_id),
+    db=Depends(get_request_db),
 ):
     """
     POST: Send a partnership invite instead of instantly creating a partnership.
@@ -142,9 +139,6 @@ async def send_partnership_invite(
     - Ensures there is no existing pending request between the two users
     - Creates a `partner_requests` document with status `pending`
     """
-    db = get_database()
-    sender_id = await get_current_user_id(credentials)
-
     # Find the partner by username
     partner = await db.users.find_one({"username": partnership.partner_username})
     if not partner:
@@ -219,7 +213,8 @@ async def send_partnership_invite(
             sender_id=sender_id,
             sender_username=sender["username"],
             request_id=str(result.inserted_id),
-            message=partnership.message
+            message=partnership.message,
+            db=db
         )
     except Exception as e:
         if not DEMO_MODE:
@@ -237,7 +232,7 @@ async def send_partnership_invite(
 
 @router.get("/invites", response_model=List[PartnerRequestResponse])
 async def list_partnership_invites(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
 ):
     """
     GET: View partnership invites for the current user.
@@ -245,19 +240,16 @@ async def list_partnership_invites(
     Returns all **incoming** pending partner requests where the current user is the receiver.
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     invites = await db.partner_requests.find(
         {"receiver_id": ObjectId(user_id), "status": "pending"}
     ).sort("sent_at", -1).to_list(100)
 
-    sender_ids = list({inv["sender_id"] for inv in invites})
-    users = await db.users.find({"_id": {"$in": sender_ids}}).to_list(len(sender_ids))
-    user_map = {u["_id"]: u for u in users}
+    user_map = await PartnershipService.users_by_id(db, [inv["sender_id"] for inv in invites])
 
     results: List[PartnerRequestResponse] = []
     for inv in invites:
-        sender = user_map.get(inv["sender_id"])
+        sender = user_map.get(str(inv["sender_id"]))
         if not sender:
             # If sender was deleted, skip this invite
             continue
@@ -278,13 +270,12 @@ async def list_partnership_invites(
 @router.post("/invites/{request_id}/accept-v2")
 async def accept_partnership_invite_v2(
     request_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
 ):
     """DEBUGGING VERSION - Accept a partnership invite"""
     if not DEMO_MODE:
         print(f"\n🆕 ACCEPT V2 CALLED - Request ID: {request_id}")
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     if not DEMO_MODE:
         print(f"   User ID: {user_id}")
     
@@ -314,7 +305,7 @@ async def accept_partnership_invite_v2(
 @router.post("/invites/{request_id}/accept")
 async def accept_partnership_invite(
     request_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
 ):
     """
     POST: Accept a partnership invite.
@@ -327,7 +318,6 @@ async def accept_partnership_invite(
     if not DEMO_MODE:
         print(f"\n🤝 ACCEPT PARTNERSHIP REQUEST: {request_id}")
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     if not DEMO_MODE:
         print(f"   User ID: {user_id}")
 
@@ -410,6 +400,7 @@ async def accept_partnership_invite(
             }
         },
     )
+    await DashboardService.mark_partnership_stale(db, partnership_doc)
 
     return {
         "success": True,
@@ -421,7 +412,7 @@ async def accept_partnership_invite(
 @router.post("/invites/{request_id}/reject")
 async def reject_partnership_invite(
     request_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
 ):
     """
     POST: Reject a partnership invite.
@@ -430,7 +421,6 @@ async def reject_partnership_invite(
     - Marks the invite as `rejected`
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     if not ObjectId.is_valid(request_id):
         raise HTTPException(
@@ -477,7 +467,7 @@ async def reject_partnership_invite(
 async def update_partnership_status(
         partnership_id: str,
         new_status: str = Query(..., description="New status: active, paused, broken"),
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """
     PUT: Update partnership status (activate, pause, end)
@@ -494,13 +484,12 @@ async def update_partnership_status(
     Args:
         partnership_id: ID of the partnership
         new_status: New status (active, paused, broken)
-        credentials: JWT Bearer token
+        user_id: ID of the authenticated user
         
     Returns:
         Success message with updated partnership info
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     # Validate ObjectId format
     if not ObjectId.is_valid(partnership_id):
@@ -548,45 +537,23 @@ async def update_partnership_status(
         )
 
     # Handle status-specific logic
-    update_data = {"status": new_status}
-
-    if new_status == "paused":
-        update_data["paused_at"] = datetime.utcnow()
-    elif new_status == "active" and current_status == "paused":
-        update_data["resumed_at"] = datetime.utcnow()
-    elif new_status == "broken":
-        # When ending partnership, save streak to history
-        habits = await db.habits.find({
-            "partnership_id": str(partnership["_id"]),
-            "status": "active"
-        }).to_list(100)
-
-        for habit in habits:
-            # Create streak history record
-            if habit.get("current_streak", 0) > 0:
-                await db.streak_history.insert_one({
-                    "partnership_id": partnership["_id"],
-                    "habit_id": habit["_id"],
-                    "streak_start_date": habit.get("created_at", partnership["created_at"]),
-                    "streak_end_date": datetime.utcnow(),
-                    "streak_length_days": habit.get("current_streak", 0),
-                    "ended_reason": "partnership_ended",
-                    "created_at": datetime.utcnow()
-                })
-
-            # Mark habit as inactive
-            await db.habits.update_one(
-                {"_id": habit["_id"]},
-                {"$set": {"is_active": False, "status": "draft"}}
-            )
-
-        update_data["ended_at"] = datetime.utcnow()
-
-    # Update partnership status
-    await db.partnerships.update_one(
-        {"_id": ObjectId(partnership_id)},
-        {"$set": update_data}
-    )
+    if new_status == "broken":
+        # Saves live streaks to history, deactivates the habits and marks the partnership broken
+        await PartnershipService.end_partnership(db, partnership)
+    else:
+        update_data = {"status": new_status}
+
+        if new_status == "paused":
+            update_data["paused_at"] = datetime.utcnow()
+        elif new_status == "active" and current_status == "paused":
+            update_data["resumed_at"] = datetime.utcnow()
+
+        # Update partnership status
+        await db.partnerships.update_one(
+            {"_id": ObjectId(partnership_id)},
+            {"$set": update_data}
+        )
+    await DashboardService.mark_partnership_stale(db, partnership)
 
     return {
         "success": True,
@@ -599,7 +566,7 @@ async def update_partnership_status(
 @router.get("/{partnership_id}/stats", response_model=PartnershipStatsResponse)
 async def get_partnership_stats(
         partnership_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """
     GET: Retrieve partnership statistics
@@ -612,13 +579,12 @@ async def get_partnership_stats(
     
     Args:
         partnership_id: ID of the partnership
-        credentials: JWT Bearer token
+        user_id: ID of the authenticated user
         
     Returns:
         Detailed partnership statistics
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     # Validate ObjectId format
     if not ObjectId.is_valid(partnership_id):
@@ -646,17 +612,26 @@ async def get_partnership_stats(
     habits = await db.habits.find({
         "partnership_id": str(partnership["_id"])
     }).to_list(100)
+    habit_ids = [str(habit["_id"]) for habit in habits]
+
+    # Check-ins from the partnership's stats doc (kept current by check-ins), milestones
+    # and streak history in one round trip each, concurrently
+    stats, milestone_counts, streak_history = await asyncio.gather(
+        PartnershipService.get_stats(db, partnership_id, habit_ids),
+        PartnershipService.milestone_counts(db, habit_ids),
+        db.streak_history.find({
+            # Written with both string and ObjectId ids over time
+            "partnership_id": {"$in": [partnership["_id"], str(partnership["_id"])]}
+        }).to_list(100),
+    )
+    checkin_counts = stats.get("checkins_by_habit", {})
 
     # Calculate statistics
     total_checkins = 0
     habits_data = []
     
     for habit in habits:
-        # Count check-ins for this habit
-        checkin_count = await db.habit_logs.count_documents({
-            "habit_id": habit["_id"],
-            "completed": True
-        })
+        checkin_count = checkin_counts.get(str(habit["_id"]), 0)
         total_checkins += checkin_count
 
         habits_data.append(HabitStatsDetail(
@@ -667,22 +642,10 @@ async def get_partnership_stats(
             is_active=habit.get("is_active", False)
         ))
 
-    # Get streak history
-    streak_history = await db.streak_history.find({
-        "partnership_id": partnership["_id"]
-    }).to_list(100)
-
     # Calculate partnership age
     partnership_age_days = (datetime.utcnow() - partnership["created_at"]).days
 
-    # Get milestones achieved
-    milestones_achieved = 0
-    for habit in habits:
-        milestone_count = await db.milestones.count_documents({
-            "habit_id": habit["_id"],
-            "is_achieved": True
-        })
-        milestones_achieved += milestone_count
+    milestones_achieved = sum(milestone_counts.get(habit_id, 0) for habit_id in habit_ids)
 
     return PartnershipStatsResponse(
         partnership_id=str(partnership["_id"]),
@@ -707,7 +670,7 @@ async def get_partnership_stats(
 #Retrieve partnership history
 @router.get("/history", response_model=List[PartnershipHistoryItem])
 async def get_partnership_history(
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """
     GET: Retrieve partnership history
@@ -723,7 +686,6 @@ async def get_partnership_history(
         List of all partnerships sorted by creation date (newest first)
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     # Get all partnerships
     partnerships = await db.partnerships.find({
@@ -733,35 +695,24 @@ async def get_partnership_history(
         ]
     }).sort("created_at", -1).to_list(100)
 
+    # Partners and habit counts for every partnership in one round trip each
     result = []
-    for partnership in partnerships:
-        # Get partner info
-        partner_id = (
-            partnership["user_id_2"] 
-            if partnership["user_id_1"] == ObjectId(user_id) 
-            else partnership["user_id_1"]
-        )
-        partner = await db.users.find_one({"_id": partner_id})
-
-        if partner:
-            # Get habits count
-            habits_count = await db.habits.count_documents({
-                "partnership_id": partnership["_id"]
-            })
-
-            # Calculate duration
-            end_date = partnership.get("ended_at", datetime.utcnow())
-            duration_days = (end_date - partnership["created_at"]).days
-
-            result.append(PartnershipHistoryItem(
-                id=str(partnership["_id"]),
-                partner_username=partner["username"],
-                status=partnership["status"],
-                created_at=partnership["created_at"],
-                ended_at=partnership.get("ended_at"),
-                duration_days=duration_days,
-                habits_count=habits_count
-            ))
+    for partnership, partner, habits_count in await PartnershipService.resolve_partners(
+        db, partnerships, user_id
+    ):
+        # Calculate duration
+        end_date = partnership.get("ended_at", datetime.utcnow())
+        duration_days = (end_date - partnership["created_at"]).days
+
+        result.append(PartnershipHistoryItem(
+            id=str(partnership["_id"]),
+            partner_username=partner["username"],
+            status=partnership["status"],
+            created_at=partnership["created_at"],
+            ended_at=partnership.get("ended_at"),
+            duration_days=duration_days,
+            habits_count=habits_count
+        ))
 
     return result
 
@@ -769,7 +720,7 @@ async def get_partnership_history(
 @router.delete("/{partnership_id}")
 async def end_partnership(
         partnership_id: str,
-        credentials: HTTPAuthorizationCredentials = Depends(security)
+        user_id: str = Depends(get_current_user_id)
 ):
     """
     DELETE: End partnership (soft delete by changing status)
@@ -784,13 +735,12 @@ async def end_partnership(
     
     Args:
         partnership_id: ID of the partnership to end
-        credentials: JWT Bearer token
+        user_id: ID of the authenticated user
         
     Returns:
         Success message with partnership summary (duration, saved streaks, habits deactivated)
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
 
     # Validate ObjectId format
     if not ObjectId.is_valid(partnership_id):
@@ -820,47 +770,9 @@ async def end_partnership(
             detail="Partnership is already ended"
         )
 
-    # Get habits to save streak history
-    habits = await db.habits.find({
-        "partnership_id": str(partnership["_id"]),
-        "status": "active"
-    }).to_list(100)
-
-    saved_streaks = []
-    for habit in habits:
-        # Save current streak to history
-        if habit.get("current_streak", 0) > 0:
-            streak_record = {
-                "partnership_id": partnership["_id"],
-                "habit_id": habit["_id"],
-                "streak_start_date": habit.get("created_at", partnership["created_at"]),
-                "streak_end_date": datetime.utcnow(),
-                "streak_length_days": habit.get("current_streak", 0),
-                "ended_reason": "partnership_ended",
-                "created_at": datetime.utcnow()
-            }
-            await db.streak_history.insert_one(streak_record)
-            saved_streaks.append({
-                "habit_name": habit["habit_name"],
-                "streak_length": habit.get("current_streak", 0)
-            })
-
-        # Mark habit as inactive
-        await db.habits.update_one(
-            {"_id": habit["_id"]},
-            {"$set": {"is_active": False, "status": "draft"}}
-        )
-
-    # Update partnership status to broken
-    await db.partnerships.update_one(
-        {"_id": ObjectId(partnership_id)},
-        {
-            "$set": {
-                "status": PartnershipStatus.BROKEN.value,
-                "ended_at": datetime.utcnow()
-            }
-        }
-    )
+    # Save streaks to history, deactivate habits and mark the partnership broken
+    ended = await PartnershipService.end_partnership(db, partnership)
+    await DashboardService.mark_partnership_stale(db, partnership)
 
     # Calculate partnership duration
     duration_days = (datetime.utcnow() - partnership["created_at"]).days
@@ -871,14 +783,14 @@ async def end_partnership(
         "summary": {
             "partnership_id": partnership_id,
             "duration_days": duration_days,
-            "saved_streaks": saved_streaks,
-            "habits_deactivated": len(habits)
+            "saved_streaks": ended["saved_streaks"],
+            "habits_deactivated": ended["habits_deactivated"]
         }
     }
 
 @router.get("/requests/pending", response_model=List[dict])
 async def get_pending_requests(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     GET: Get all pending partnership requests for the current user
@@ -886,7 +798,6 @@ async def get_pending_requests(
     Returns list of users who have sent partnership requests
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     # Find all pending requests where current user is the recipient
     requests = await db.partnership_requests.find({
@@ -894,10 +805,12 @@ async def get_pending_requests(
         "status": "pending"
     }).to_list(100)
     
+    # Get sender info for every request in one query
+    senders = await PartnershipService.users_by_id(db, [req["sender_id"] for req in requests])
+
     result = []
     for req in requests:
-        # Get sender info
-        sender = await db.users.find_one({"_id": req["sender_id"]})
+        sender = senders.get(str(req["sender_id"]))
         if sender:
             result.append({
                 "request_id": str(req["_id"]),
@@ -914,14 +827,12 @@ async def get_pending_requests(
 @router.post("/requests/send")
 async def send_partnership_request(
     partner_username: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id),
+    db=Depends(get_request_db)
 ):
     """
     POST: Send a partnership request to another user
     """
-    db = get_database()
-    user_id = await get_current_user_id(credentials)
-    
     # Find the recipient
     recipient = await db.users.find_one({"username": partner_username})
     if not recipient:
@@ -989,7 +900,8 @@ async def send_partnership_request(
             sender_id=user_id,
             sender_username=sender["username"] if sender else "Someone",
             request_id=str(result.inserted_id),
-            message=None
+            message=None,
+            db=db
         )
     except Exception as e:
         if not DEMO_MODE:
@@ -1004,7 +916,7 @@ async def send_partnership_request(
 @router.post("/requests/{request_id}/accept")
 async def accept_partnership_request(
     request_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     POST: Accept a partnership request
@@ -1012,7 +924,6 @@ async def accept_partnership_request(
     if not DEMO_MODE:
         print(f"\n🤝 ACCEPT PARTNERSHIP REQUEST: {request_id}")
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     if not DEMO_MODE:
         print(f"   Current user ID: {user_id}")
     
@@ -1092,6 +1003,7 @@ async def accept_partnership_request(
     )
     if not DEMO_MODE:
         print(f"   ✅ Request status updated to accepted")
+    await DashboardService.mark_partnership_stale(db, partnership_data)
     
     # Get sender info
     sender = await db.users.find_one({"_id": sender_id})
@@ -1107,13 +1019,12 @@ async def accept_partnership_request(
 @router.post("/requests/{request_id}/decline")
 async def decline_partnership_request(
     request_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     POST: Decline a partnership request
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     if not ObjectId.is_valid(request_id):
         raise HTTPException(
@@ -1147,13 +1058,12 @@ async def decline_partnership_request(
 
 @router.get("/all", response_model=List[dict])
 async def get_all_partnerships(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     GET: Get all active partnerships for current user
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     partnerships = await db.partnerships.find({
         "$or": [
@@ -1163,31 +1073,19 @@ async def get_all_partnerships(
         "status": "active"
     }).to_list(100)
     
+    # Partners and shared (active) habit counts in one round trip each
     result = []
-    for partnership in partnerships:
-        # Get partner info
-        partner_id = (
-            partnership["user_id_2"] 
-            if partnership["user_id_1"] == ObjectId(user_id) 
-            else partnership["user_id_1"]
-        )
-        partner = await db.users.find_one({"_id": partner_id})
-        
-        # Count shared habits
-        habits_count = await db.habits.count_documents({
+    for partnership, partner, habits_count in await PartnershipService.resolve_partners(
+        db, partnerships, user_id, habit_status="active"
+    ):
+        result.append({
             "partnership_id": str(partnership["_id"]),
-            "status": "active"
+            "partner_id": str(partner["_id"]),
+            "username": partner["username"],
+            "display_name": partner.get("display_name") or partner.get("username", ""),
+            "profile_picture": partner.get("profile_photo_url") or partner.get("profile_picture"),
+            "shared_habits": habits_count,
+            "created_at": partnership["created_at"]
         })
-        
-        if partner:
-            result.append({
-                "partnership_id": str(partnership["_id"]),
-                "partner_id": str(partner["_id"]),
-                "username": partner["username"],
-                "display_name": partner.get("display_name") or partner.get("username", ""),
-                "profile_picture": partner.get("profile_photo_url") or partner.get("profile_picture"),
-                "shared_habits": habits_count,
-                "created_at": partnership["created_at"]
-            })
     
     return result
\ No newline at end of file
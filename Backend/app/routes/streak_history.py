@@ -1,12 +1,11 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.models.streak_history import (
     StreakHistoryCreate, 
     StreakHistoryUpdate, 
     StreakHistoryResponse,
     StreakHistoryLeaderboard
 )
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id
 from config.database import get_database
 from bson import ObjectId
 from datetime import datetime
@@ -14,37 +13,17 @@ from typing import List
 
 # Create the router
 router = APIRouter(prefix="/streak-history", tags=["Streak History"])
-security = HTTPBearer()
 
 @router.get("/habit/{habit_id}", response_model=List[StreakHistoryResponse])
 async def get_habit_streak_history(
     habit_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get streak history for a specific habit"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Verify user has access to this habit
+    # 2. Verify user has access to this habit
     habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
     if not habit:
         raise HTTPException(
@@ -67,12 +46,12 @@ async def get_habit_streak_history(
             detail="Access denied to this habit"
         )
     
-    # 6. Get streak history for this habit
+    # 3. Get streak history for this habit
     streaks = await db.streak_history.find({
         "habit_id": habit_id
     }).sort("streak_start_date", -1).to_list(length=None)
     
-    # 7. Convert to response format
+    # 4. Convert to response format
     return [
         StreakHistoryResponse(
             id=str(streak["_id"]),
@@ -91,32 +70,13 @@ async def get_habit_streak_history(
 @router.get("/partnership/{partnership_id}", response_model=List[StreakHistoryResponse])
 async def get_partnership_streak_history(
     partnership_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get streak history for a specific partnership"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Verify user has access to this partnership
+    # 2. Verify user has access to this partnership
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(partnership_id),
         "$or": [
@@ -131,12 +91,12 @@ async def get_partnership_streak_history(
             detail="Partnership not found or access denied"
         )
     
-    # 6. Get streak history for this partnership
+    # 3. Get streak history for this partnership
     streaks = await db.streak_history.find({
         "partnership_id": partnership_id
     }).sort("streak_start_date", -1).to_list(length=None)
     
-    # 7. Convert to response format
+    # 4. Convert to response format
     return [
         StreakHistoryResponse(
             id=str(streak["_id"]),
@@ -155,32 +115,13 @@ async def get_partnership_streak_history(
 @router.post("/", response_model=StreakHistoryResponse)
 async def create_streak_history(
     streak_data: StreakHistoryCreate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Create new streak history record (system-generated)"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Verify user has access to this partnership and habit
+    # 2. Verify user has access to this partnership and habit
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(streak_data.partnership_id),
         "$or": [
@@ -202,7 +143,7 @@ async def create_streak_history(
             detail="Habit not found"
         )
     
-    # 6. Create the streak history record
+    # 3. Create the streak history record
     streak_doc = {
         "partnership_id": streak_data.partnership_id,
         "habit_id": streak_data.habit_id,
@@ -216,7 +157,7 @@ async def create_streak_history(
     
     result = await db.streak_history.insert_one(streak_doc)
     
-    # 7. Get the created record
+    # 4. Get the created record
     created_streak = await db.streak_history.find_one({"_id": result.inserted_id})
     
     return StreakHistoryResponse(
@@ -235,32 +176,13 @@ async def create_streak_history(
 async def update_streak_history(
     streak_id: str,
     update_data: StreakHistoryUpdate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Update streak end date and reason when streak breaks"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Find the streak record
+    # 2. Find the streak record
     streak = await db.streak_history.find_one({"_id": ObjectId(streak_id)})
     if not streak:
         raise HTTPException(
@@ -268,7 +190,7 @@ async def update_streak_history(
             detail="Streak record not found"
         )
     
-    # 6. Verify user has access to this streak
+    # 3. Verify user has access to this streak
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(streak["partnership_id"]),
         "$or": [
@@ -283,20 +205,20 @@ async def update_streak_history(
             detail="Access denied to this streak"
         )
     
-    # 7. Prepare update data
+    # 4. Prepare update data
     update_doc = {"updated_at": datetime.utcnow()}
     if update_data.streak_end_date is not None:
         update_doc["streak_end_date"] = update_data.streak_end_date
     if update_data.ended_reason is not None:
         update_doc["ended_reason"] = update_data.ended_reason
     
-    # 8. Update the streak record
+    # 5. Update the streak record
     await db.streak_history.update_one(
         {"_id": ObjectId(streak_id)},
         {"$set": update_doc}
     )
     
-    # 9. Get the updated record
+    # 6. Get the updated record
     updated_streak = await db.streak_history.find_one({"_id": ObjectId(streak_id)})
     
     return StreakHistoryResponse(
@@ -314,24 +236,13 @@ async def update_streak_history(
 @router.get("/leaderboard", response_model=List[StreakHistoryLeaderboard])
 async def get_streak_leaderboard(
     limit: int = 10,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get longest streaks across all users (leaderboard)"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 4. Get top streaks with user and habit information
+    # 2. Get top streaks with user and habit information
     pipeline = [
         {
             "$lookup": {
@@ -369,14 +280,14 @@ async def get_streak_leaderboard(
             "$addFields": {
                 "user_id": {
                     "$cond": {
-                        "if": {"$eq": ["$partnership.user1_id", ObjectId(payload.get("sub"))]},
+                        "if": {"$eq": ["$partnership.user1_id", ObjectId(user_id)]},
                         "then": "$partnership.user1_id",
                         "else": "$partnership.user2_id"
                     }
                 },
                 "partner_id": {
                     "$cond": {
-                        "if": {"$eq": ["$partnership.user1_id", ObjectId(payload.get("sub"))]},
+                        "if": {"$eq": ["$partnership.user1_id", ObjectId(user_id)]},
                         "then": "$partnership.user2_id",
                         "else": "$partnership.user1_id"
                     }
@@ -407,7 +318,7 @@ async def get_streak_leaderboard(
     
     streaks = await db.streak_history.aggregate(pipeline).to_list(length=limit)
     
-    # 5. Convert to response format
+    # 3. Convert to response format
     return [
         StreakHistoryLeaderboard(
             id=str(streak["_id"]),
@@ -8,8 +8,7 @@ Provides endpoints for:
 """
 
 from fastapi import APIRouter, HTTPException, status, Depends, Query
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id
 from config.database import get_database
 from app.services.streak_service import StreakCalculationService
 from bson import ObjectId
@@ -17,27 +16,12 @@ from datetime import datetime, date, timedelta
 from typing import List, Optional
 
 router = APIRouter(prefix="/streaks", tags=["Streaks"])
-security = HTTPBearer()
-
-
-async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Extract user ID from JWT token"""
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
-    
-    return payload.get("sub")
 
 
 @router.get("/habit/{habit_id}", response_model=dict)
 async def get_habit_streak(
     habit_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Get current streak for a habit.
@@ -50,7 +34,6 @@ async def get_habit_streak(
     - is_on_track: Whether both partners completed today
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     # Verify habit exists
     habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
@@ -64,8 +47,8 @@ async def get_habit_streak(
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(habit["partnership_id"]),
         "$or": [
-            {"user_id_1": user_id},
-            {"user_id_2": user_id}
+            {"user_id_1": ObjectId(user_id)},
+            {"user_id_2": ObjectId(user_id)}
         ]
     })
     
@@ -103,7 +86,7 @@ async def get_habit_streak(
 @router.get("/partnership/{partnership_id}", response_model=list)
 async def get_partnership_streaks(
     partnership_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Get all active habit streaks for a partnership.
@@ -111,14 +94,13 @@ async def get_partnership_streaks(
     Returns list of streaks for each active habit with both partners' completion status.
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     # Verify partnership exists and user has access
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(partnership_id),
         "$or": [
-            {"user_id_1": user_id},
-            {"user_id_2": user_id}
+            {"user_id_1": ObjectId(user_id)},
+            {"user_id_2": ObjectId(user_id)}
         ]
     })
     
@@ -134,25 +116,27 @@ async def get_partnership_streaks(
         "status": "active"
     }).to_list(length=None)
     
+    # Resolve every habit's streak in one batched lookup
+    habit_ids = [str(habit["_id"]) for habit in habits]
+    cached = await StreakCalculationService.get_streaks_cached_many(
+        db, habit_ids, {habit_id: partnership_id for habit_id in habit_ids}
+    )
+    
     streaks_list = []
     
     for habit in habits:
-        streak_data = await StreakCalculationService.calculate_streak_for_habit(
-            db,
-            str(habit["_id"]),
-            partnership_id
-        )
-        
-        if "error" not in streak_data:
-            streaks_list.append({
-                "habit_id": str(habit["_id"]),
-                "habit_name": habit["habit_name"],
-                "current_streak": streak_data["current_streak"],
-                "longest_streak": streak_data["longest_streak"],
-                "streak_start_date": streak_data["streak_start_date"],
-                "last_completed_date": streak_data["last_completed_date"],
-                "is_on_track": streak_data["is_on_track"]
-            })
+        if str(habit["_id"]) not in cached:
+            continue
+        streak_data = StreakCalculationService.to_legacy_streak_fields(cached[str(habit["_id"])])
+        streaks_list.append({
+            "habit_id": str(habit["_id"]),
+            "habit_name": habit["habit_name"],
+            "current_streak": streak_data["current_streak"],
+            "longest_streak": streak_data["longest_streak"],
+            "streak_start_date": streak_data["streak_start_date"],
+            "last_completed_date": streak_data["last_completed_date"],
+            "is_on_track": streak_data["is_on_track"]
+        })
     
     return streaks_list
 
@@ -160,14 +144,13 @@ async def get_partnership_streaks(
 @router.post("/habit/{habit_id}/recalculate", response_model=dict)
 async def recalculate_and_update_habit_streak(
     habit_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Force recalculation of streak for a habit and update the persistent cache
     in the `streaks` collection (not the `habits` document).
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     # Verify habit exists
     habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
@@ -181,8 +164,8 @@ async def recalculate_and_update_habit_streak(
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(habit["partnership_id"]),
         "$or": [
-            {"user_id_1": user_id},
-            {"user_id_2": user_id}
+            {"user_id_1": ObjectId(user_id)},
+            {"user_id_2": ObjectId(user_id)}
         ]
     })
     
@@ -216,7 +199,7 @@ async def recalculate_and_update_habit_streak(
 async def check_streak_miss(
     habit_id: str,
     check_date: Optional[str] = Query(None, description="Date to check (YYYY-MM-DD), defaults to today"),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Check if a user missed completing a habit on a specific day.
@@ -227,7 +210,6 @@ async def check_streak_miss(
     - reset_date: Date when the miss occurred
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     # Verify habit exists
     habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
@@ -241,8 +223,8 @@ async def check_streak_miss(
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(habit["partnership_id"]),
         "$or": [
-            {"user_id_1": user_id},
-            {"user_id_2": user_id}
+            {"user_id_1": ObjectId(user_id)},
+            {"user_id_2": ObjectId(user_id)}
         ]
     })
     
@@ -285,7 +267,7 @@ async def check_streak_miss(
 async def get_streak_history(
     habit_id: str,
     limit: int = Query(30, ge=1, le=365, description="Number of days to include in history"),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Get detailed streak history for a habit.
@@ -296,7 +278,6 @@ async def get_streak_history(
     - both_completed: Whether both completed (counts toward streak)
     """
     db = get_database()
-    user_id = await get_current_user_id(credentials)
     
     # Verify habit exists
     habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
@@ -310,8 +291,8 @@ async def get_streak_history(
     partnership = await db.partnerships.find_one({
         "_id": ObjectId(habit["partnership_id"]),
         "$or": [
-            {"user_id_1": user_id},
-            {"user_id_2": user_id}
+            {"user_id_1": ObjectId(user_id)},
+            {"user_id_2": ObjectId(user_id)}
         ]
     })
     
@@ -321,28 +302,28 @@ async def get_streak_history(
             detail="Access denied"
         )
     
-    user1_id = partnership["user_id_1"]
-    user2_id = partnership["user_id_2"]
+    user1_id = str(partnership["user_id_1"])
+    user2_id = str(partnership["user_id_2"])
     
-    # Get logs for the last N days
-    start_date = date.today() - timedelta(days=limit)
+    # Get logs for the last N days (log_date is stored as a midnight datetime)
+    start_date = datetime.combine(date.today() - timedelta(days=limit), datetime.min.time())
     
-    logs = await db.habit_logs.find({
-        "habit_id": habit_id,
-        "date": {"$gte": start_date}
-    }).sort("date", -1).to_list(length=None)
+    logs = await db.habit_logs.find(
+        {"habit_id": habit_id, "log_date": {"$gte": start_date}},
+        {"user_id": 1, "log_date": 1, "completed": 1}
+    ).to_list(length=None)
     
     # Group by date
     logs_by_date = {}
     for log in logs:
-        date_key = log["date"]
+        date_key = log["log_date"].date()
         if date_key not in logs_by_date:
             logs_by_date[date_key] = {
                 user1_id: False,
                 user2_id: False
             }
         if log["completed"]:
-            logs_by_date[date_key][log["user_id"]] = True
+            logs_by_date[date_key][str(log["user_id"])] = True
     
     # Build history
     history = []
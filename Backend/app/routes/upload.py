@@ -1,14 +1,12 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import Request
 import boto3
 from botocore.exceptions import ClientError
 import uuid
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id
 import os
 
 router = APIRouter(prefix="/upload", tags=["Upload"])
-security = HTTPBearer()
 
 #S3 Configuration constants
 S3_BUCKET = "pact-profile-pictures"
@@ -45,23 +43,12 @@ s3_client = get_s3_client()
 @router.post("/profile-picture")
 async def upload_profile_picture(
         request: Request,
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        user_id: str = Depends(get_current_user_id),
         file: UploadFile = File(None)  # Make optional to handle manual parsing
 ):
     """
     Upload a profile picture to S3 and return the URL
     """
-    # Verify JWT token
-    token = credentials.credentials
-    payload = decode_access_token(token)
-
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
     # Parse form data manually to handle React Native FormData format
     # FastAPI might not parse it correctly, so we handle it manually
     if not file or not file.filename:
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.models.user import UserResponse, ProfileSetupRequest
-from app.utils.security import decode_access_token
+from app.dependencies.auth import get_current_user_id, invalidate_cached_user
+from app.services.notification_service import notification_service
+from app.services.dashboard_service import DashboardService
 from config.database import get_database
 from bson import ObjectId
 from pydantic import BaseModel
@@ -9,6 +10,7 @@ from typing import Optional
 from datetime import datetime
 from typing import List, Optional
 from fastapi import Query
+import pytz
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 class MessageResponse(BaseModel):
@@ -16,19 +18,19 @@ class MessageResponse(BaseModel):
 
 # Create the router
 router = APIRouter(prefix="/users", tags=["Users"])
-security = HTTPBearer()
 
 
 class UserUpdate(BaseModel):
     """Schema for updating user profile after initial setup"""
     display_name: Optional[str] = None
     profile_photo_url: Optional[str] = None
+    timezone: Optional[str] = None  # IANA name, e.g. "America/New_York" (reminder scheduling)
 
 
 @router.post("/me/profile-setup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def setup_user_profile(
     profile_data: ProfileSetupRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Complete initial profile setup after signup.
@@ -36,28 +38,10 @@ async def setup_user_profile(
     Sets display_name, profile_photo_url, and marks profile as completed.
     This should be called once after user signs up.
     """
-    # 1. Get the JWT token and decode
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 2. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 4. Find the user
+    # 2. Find the user
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(
@@ -65,14 +49,14 @@ async def setup_user_profile(
             detail="User not found"
         )
     
-    # 5. Check if profile already completed (optional - can allow re-setup)
+    # 3. Check if profile already completed (optional - can allow re-setup)
     if user.get("profile_completed", False):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Profile already completed. Use PUT /users/me to update."
         )
     
-    # 6. Update user with profile data
+    # 4. Update user with profile data
     update_data = {
         "display_name": profile_data.display_name,
         "profile_photo_url": profile_data.profile_photo_url,
@@ -84,11 +68,17 @@ async def setup_user_profile(
         {"_id": ObjectId(user_id)},
         {"$set": update_data}
     )
-    
-    # 7. Get updated user
+    invalidate_cached_user(user_id)
+    # Names show on this user's and their partners' home screens
+    await DashboardService.mark_user_and_partners_stale(db, user_id)
+    # The avatar is part of the snapshot in notifications about this user
+    if profile_data.profile_photo_url != user.get("profile_photo_url"):
+        await notification_service.queue_user_snapshot_refresh(db, user_id)
+    
+    # 5. Get updated user
     updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
     
-    # 8. Return complete profile
+    # 6. Return complete profile
     return UserResponse(
         id=str(updated_user["_id"]),
         username=updated_user["username"],
@@ -103,36 +93,17 @@ async def setup_user_profile(
 @router.put("/me", response_model=UserResponse)
 async def update_user_profile(
     user_update: UserUpdate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Update user profile (for changes after initial setup).
     
-    Can update display_name and/or profile_photo_url.
+    Can update display_name, profile_photo_url and/or timezone.
     """
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Find the user
+    # 2. Find the user
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(
@@ -140,26 +111,39 @@ async def update_user_profile(
             detail="User not found"
         )
     
-    # 6. Prepare update data (only include fields that are provided)
+    # 3. Prepare update data (only include fields that are provided)
     update_data = {}
     if user_update.display_name is not None:
         update_data["display_name"] = user_update.display_name
     if user_update.profile_photo_url is not None:
         update_data["profile_photo_url"] = user_update.profile_photo_url
+    if user_update.timezone is not None:
+        if user_update.timezone not in pytz.all_timezones_set:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unknown timezone"
+            )
+        update_data["timezone"] = user_update.timezone
     
     # Add updated timestamp
     update_data["updated_at"] = datetime.utcnow()
     
-    # 7. Update the user in database
+    # 4. Update the user in database
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
         {"$set": update_data}
     )
-    
-    # 8. Get updated user
+    invalidate_cached_user(user_id)
+    # Names show on this user's and their partners' home screens
+    await DashboardService.mark_user_and_partners_stale(db, user_id)
+    # The avatar is part of the snapshot in notifications about this user
+    if "profile_photo_url" in update_data and update_data["profile_photo_url"] != user.get("profile_photo_url"):
+        await notification_service.queue_user_snapshot_refresh(db, user_id)
+    
+    # 5. Get updated user
     updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
     
-    # 9. Return the updated user
+    # 6. Return the updated user
     return UserResponse(
         id=str(updated_user["_id"]),
         username=updated_user["username"],
@@ -174,32 +158,13 @@ async def update_user_profile(
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_profile(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get current user profile with all fields"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Find the user
+    # 2. Find the user
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(
@@ -207,7 +172,7 @@ async def get_current_user_profile(
             detail="User not found"
         )
     
-    # 6. Return the complete user profile
+    # 3. Return the complete user profile
     return UserResponse(
         id=str(user["_id"]),
         username=user["username"],
@@ -222,30 +187,13 @@ async def get_current_user_profile(
 async def search_users(
     query: str = Query(..., min_length=1, max_length=50, description="Username search query"),
     limit: int = Query(10, ge=1, le=50, description="Maximum number of results"),
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user_id: str = Depends(get_current_user_id),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """
     Search for users by username to find potential partners
     """
-    # 1. Get current user ID from token
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    current_user_id = payload.get("sub")
-    if not current_user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 2. Search for users matching the query
+    # 1. Search for users matching the query
     # Case-insensitive partial match on username or display_name
     search_results = await db.users.find({
         "$or": [
@@ -258,7 +206,7 @@ async def search_users(
         "profile_completed": True 
     }).limit(limit).to_list(length=limit)
     
-    # 3. Convert to response format
+    # 2. Convert to response format
     return [
         UserResponse(
             id=str(user["_id"]),
@@ -274,32 +222,13 @@ async def search_users(
 
 @router.delete("/me", response_model=MessageResponse)
 async def delete_user_account(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Delete current user account"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Find the user
+    # 2. Find the user
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(
@@ -307,43 +236,25 @@ async def delete_user_account(
             detail="User not found"
         )
     
-    # 6. Soft delete - mark as inactive instead of actually deleting
+    # 3. Soft delete - mark as inactive instead of actually deleting
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
         {"$set": {"is_active": False, "deleted_at": datetime.utcnow()}}
     )
+    invalidate_cached_user(user_id)
     
     return MessageResponse(message="User account deleted successfully")
 
 
 @router.get("/me/partnerships")
 async def get_user_partnerships(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get user's partnership status"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Find user's partnerships
+    # 2. Find user's partnerships
     partnerships = await db.partnerships.find({
         "$or": [
             {"user1_id": ObjectId(user_id)},
@@ -352,7 +263,7 @@ async def get_user_partnerships(
         "status": "active"
     }).to_list(length=None)
     
-    # 6. Return partnerships
+    # 3. Return partnerships
     return {
         "partnerships": [
             {
@@ -368,32 +279,13 @@ async def get_user_partnerships(
 
 @router.get("/me/notifications")
 async def get_notification_preferences(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get user's notification preferences"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Find the user
+    # 2. Find the user
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(
@@ -401,7 +293,7 @@ async def get_notification_preferences(
             detail="User not found"
         )
     
-    # 6. Return notification preferences
+    # 3. Return notification preferences
     return {
         "notification_preferences": user.get("notification_preferences", {}),
         "email_notifications": user.get("email_notifications", True),
@@ -418,32 +310,13 @@ class NotificationPreferencesUpdate(BaseModel):
 @router.put("/me/notifications", response_model=MessageResponse)
 async def update_notification_preferences(
     preferences: NotificationPreferencesUpdate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Update user's notification preferences"""
-    # 1. Get the JWT token
-    token = credentials.credentials
-    
-    # 2. Decode the token to get user info
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 3. Get user ID from token
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    # 4. Connect to database
+    # 1. Connect to database
     db = get_database()
     
-    # 5. Find the user
+    # 2. Find the user
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(
@@ -451,7 +324,7 @@ async def update_notification_preferences(
             detail="User not found"
         )
     
-    # 6. Prepare update data
+    # 3. Prepare update data
     update_data = {}
     if preferences.email_notifications is not None:
         update_data["email_notifications"] = preferences.email_notifications
@@ -463,10 +336,12 @@ async def update_notification_preferences(
     # Add updated timestamp
     update_data["updated_at"] = datetime.utcnow()
     
-    # 7. Update the user
+    # 4. Update the user
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
         {"$set": update_data}
     )
+    invalidate_cached_user(user_id)
+    notification_service.invalidate_user_preferences(user_id)
     
     return MessageResponse(message="Notification preferences updated successfully")
\ No newline at end of file
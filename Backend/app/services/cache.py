@@ -0,0 +1,372 @@
+"""
+Cache Backends
+
+Pluggable in-memory caches for per-worker hot data (e.g. streaks):
+- InProcessLRUCache: LRU bounded by entry count, with optional per-entry TTL (expired
+  entries are purged lazily) and hit/miss/eviction counters, local to this worker
+- BroadcastInvalidationCache: the same local LRU, but invalidations are broadcast
+  to every other worker over an InvalidationBus, so a write on one worker drops
+  the stale entry everywhere within milliseconds
+
+Buses:
+- UnixSocketInvalidationBus: datagram sockets in a shared directory (workers on one host)
+- MongoChangeStreamInvalidationBus: inserts into a collection and tails it with a
+  change stream (workers on any host; needs a replica set, e.g. Atlas)
+
+Pick one with CACHE_INVALIDATION_BACKEND=local|socket|mongo (default: local).
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+_MISSING = object()
+
+
+class CacheBackend(ABC):
+    """
+    Interface for the per-worker caches. Subclasses must implement get/set/delete/clear
+    and __len__ (a missing one fails at construction).
+
+    Also supports the small dict-style surface (`cache[key]`, `key in cache`, `pop`)
+    that callers and tests already use.
+    """
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Drop the key from this worker's cache only"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for sizing the cache in production"""
+        return {}
+
+    def invalidate(self, key: str) -> None:
+        """Drop the key everywhere the backend can reach (this worker by default)"""
+        self.delete(key)
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    async def start(self) -> None:
+        """Hook for backends that need the event loop / database (called from lifespan)"""
+
+    async def stop(self) -> None:
+        """Counterpart of start()"""
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        value = self.get(key, _MISSING)
+        self.delete(key)
+        return default if value is _MISSING else value
+
+
+class InProcessLRUCache(CacheBackend):
+    """
+    Least-recently-used cache bounded to `max_entries`, local to this process.
+
+    Entries may carry a TTL (`ttl_seconds` on set, else `default_ttl_seconds`). Expired
+    entries are dropped when they're read, and each write also sweeps a few expired
+    entries off the cold end so dead entries don't sit on memory until evicted.
+    """
+
+    # Expired entries removed from the LRU end per write
+    PURGE_BATCH = 16
+
+    def __init__(self, max_entries: int = 10000, default_ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.default_ttl_seconds = default_ttl_seconds
+        # key → (value, expires_at on the monotonic clock or None)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._counters["misses"] += 1
+            return default
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+            return default
+        self._entries.move_to_end(key)
+        self._counters["hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        self._purge_expired()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        # Membership checks shouldn't skew the hit/miss counters
+        entry = self._entries.get(key)
+        return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else None,
+        }
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        # Only look at the coldest PURGE_BATCH entries, so a write stays O(1)
+        expired = [
+            key for key, (_, expires_at) in islice(self._entries.items(), self.PURGE_BATCH)
+            if expires_at is not None and expires_at <= now
+        ]
+        for key in expired:
+            del self._entries[key]
+        self._counters["expirations"] += len(expired)
+
+
+class InvalidationBus(ABC):
+    """
+    Delivers (namespace, key) invalidations to every other worker. Subclasses must
+    implement publish (a missing one fails at construction).
+    """
+
+    def __init__(self):
+        # Unique per process so a worker can ignore its own broadcasts
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._on_message: Optional[Callable[[str, str], None]] = None
+
+    async def start(self, on_message: Callable[[str, str], None]) -> None:
+        self._on_message = on_message
+
+    async def stop(self) -> None:
+        self._on_message = None
+
+    @abstractmethod
+    def publish(self, namespace: str, key: str) -> None:
+        ...
+
+    def _deliver(self, payload: Dict) -> None:
+        if payload.get("origin") == self.origin or self._on_message is None:
+            return
+        self._on_message(payload.get("namespace"), payload.get("key"))
+
+
+class UnixSocketInvalidationBus(InvalidationBus):
+    """
+    Local stand-in for a pub/sub channel: each worker binds a datagram socket in
+    `socket_dir` and publishing sends to every socket found there.
+    """
+
+    def __init__(self, socket_dir: str):
+        super().__init__()
+        self.socket_dir = Path(socket_dir)
+        self._sock: Optional[socket.socket] = None
+        self._path: Optional[Path] = None
+
+    async def start(self, on_message: Callable[[str, str], None]) -> None:
+        await super().start(on_message)
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        self._path = self.socket_dir / f"{self.origin}.sock"
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(str(self._path))
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._read)
+
+    async def stop(self) -> None:
+        if self._sock is not None:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+        if self._path is not None:
+            self._path.unlink(missing_ok=True)
+            self._path = None
+        await super().stop()
+
+    def publish(self, namespace: str, key: str) -> None:
+        if self._sock is None:
+            return
+        payload = json.dumps({"origin": self.origin, "namespace": namespace, "key": key}).encode()
+        for peer in self.socket_dir.glob("*.sock"):
+            if peer == self._path:
+                continue
+            try:
+                self._sock.sendto(payload, str(peer))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker went away without cleaning up its socket
+                peer.unlink(missing_ok=True)
+            except BlockingIOError:
+                # Peer's receive buffer is full; it'll fall back to the TTL
+                pass
+
+    def _read(self) -> None:
+        while True:
+            try:
+                data = self._sock.recv(4096)
+            except (BlockingIOError, OSError):
+                return
+            try:
+                self._deliver(json.loads(data))
+            except ValueError:
+                continue
+
+
+class MongoChangeStreamInvalidationBus(InvalidationBus):
+    """
+    Publishes invalidations as inserts into `collection_name` and listens with a
+    change stream. Old rows are expired by the TTL index on created_at.
+    """
+
+    def __init__(self, get_db: Callable, collection_name: str = "cache_invalidations"):
+        super().__init__()
+        self._get_db = get_db
+        self.collection_name = collection_name
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, on_message: Callable[[str, str], None]) -> None:
+        await super().start(on_message)
+        self._listener = asyncio.create_task(self._listen(), name="cache-invalidation-listener")
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await super().stop()
+
+    def publish(self, namespace: str, key: str) -> None:
+        db = self._get_db()
+        if db is None:
+            return
+        doc = {"origin": self.origin, "namespace": namespace, "key": key, "created_at": datetime.utcnow()}
+        try:
+            asyncio.get_running_loop().create_task(db[self.collection_name].insert_one(doc))
+        except RuntimeError:
+            # No running loop (sync context) - nothing to broadcast from
+            pass
+
+    async def _listen(self) -> None:
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with self._get_db()[self.collection_name].watch(pipeline) as stream:
+                    async for change in stream:
+                        self._deliver(change.get("fullDocument", {}))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not DEMO_MODE:
+                    print(f"⚠️ Cache invalidation stream error, retrying: {e}")
+                await asyncio.sleep(1)
+
+
+class BroadcastInvalidationCache(CacheBackend):
+    """Local LRU whose invalidations are broadcast to the other workers via `bus`"""
+
+    def __init__(self, namespace: str, local: CacheBackend, bus: InvalidationBus):
+        self.namespace = namespace
+        self.local = local
+        self.bus = bus
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.local.get(key, default)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        self.local.set(key, value, ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+
+    def invalidate(self, key: str) -> None:
+        self.local.delete(key)
+        self.bus.publish(self.namespace, key)
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.local
+
+    def stats(self) -> Dict[str, Any]:
+        return self.local.stats()
+
+    async def start(self) -> None:
+        await self.bus.start(self._on_invalidation)
+
+    async def stop(self) -> None:
+        await self.bus.stop()
+
+    def _on_invalidation(self, namespace: str, key: str) -> None:
+        if namespace == self.namespace:
+            self.local.delete(key)
+
+
+def build_cache_backend(
+    namespace: str,
+    max_entries: int = 10000,
+    default_ttl_seconds: Optional[float] = None
+) -> CacheBackend:
+    """Create the cache backend selected by CACHE_INVALIDATION_BACKEND"""
+    kind = os.getenv("CACHE_INVALIDATION_BACKEND", "local").lower()
+    local = InProcessLRUCache(max_entries=max_entries, default_ttl_seconds=default_ttl_seconds)
+
+    if kind == "socket":
+        socket_dir = os.getenv("CACHE_SOCKET_DIR", "/tmp/pact-cache-bus")
+        return BroadcastInvalidationCache(namespace, local, UnixSocketInvalidationBus(socket_dir))
+    if kind == "mongo":
+        from config.database import get_database
+        return BroadcastInvalidationCache(namespace, local, MongoChangeStreamInvalidationBus(get_database))
+    return local
@@ -0,0 +1,203 @@
+"""
+Check-in Counters
+
+Running check-in counts, kept with `$inc` so neither a check-in nor the dashboard has
+to count habit_logs:
+- users.total_checkins: the user's completed logs across all habits (dashboard total)
+- habits.goals.{user_id}.count_checkins: the user's completed logs for that habit
+- habits.goals.{user_id}.goal_progress: their summed `value` for completion goals with
+  a target_value, otherwise the same as count_checkins
+
+POST /habits/{habit_id}/log applies the difference between the day's log before and
+after the write, so checking in, un-checking and changing a completed day's value all
+move the counters. New goals are seeded from the logs that already exist.
+
+reconcile_all re-derives every counter from habit_logs (scripts/reconcile_checkin_counters.py,
+nightly via cron) to repair drift, e.g. after logs are seeded, imported or deleted directly
+in Mongo. Users created before the counter existed have no total_checkins field and are
+never `$inc`ed; the dashboard counts and seeds the field on their first build.
+"""
+
+from bson import ObjectId
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import os
+
+from pymongo import UpdateOne
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+USER_CHECKINS_FIELD = "total_checkins"
+
+
+def _id_variants(ids: Iterable[Any]) -> List[Any]:
+    """habit_logs store ids as strings (older logs as ObjectIds)"""
+    variants: List[Any] = []
+    for value in ids:
+        variants.append(str(value))
+        if ObjectId.is_valid(str(value)):
+            variants.append(ObjectId(str(value)))
+    return variants
+
+
+def _contribution(log: Optional[Dict]) -> Tuple[int, float]:
+    """What one log adds to the counters: (check-ins, value)"""
+    if not log or not log.get("completed"):
+        return 0, 0
+    return 1, log.get("value") or 0
+
+
+class CheckinCounterService:
+    """Maintains and reconciles the user and goal check-in counters"""
+
+    RECONCILE_BATCH_SIZE = int(os.getenv("CHECKIN_RECONCILE_BATCH_SIZE", 500))
+
+    @staticmethod
+    def log_delta(before: Optional[Dict], after: Optional[Dict]) -> Tuple[int, float]:
+        """(check-in delta, value delta) for a log going from `before` to `after`"""
+        count_before, value_before = _contribution(before)
+        count_after, value_after = _contribution(after)
+        return count_after - count_before, value_after - value_before
+
+    @staticmethod
+    def tracks_value(goal: Dict) -> bool:
+        """Completion goals with a target_value measure progress in summed log values"""
+        return goal.get("goal_type") == "completion" and goal.get("target_value") is not None
+
+    @staticmethod
+    def goal_counters(goal: Dict, checkins: int, value: float) -> Dict[str, float]:
+        """count_checkins / goal_progress for `goal` given the user's logs on its habit"""
+        return {
+            "count_checkins": checkins,
+            "goal_progress": value if CheckinCounterService.tracks_value(goal) else checkins,
+        }
+
+    @staticmethod
+    def goal_increments(user_id: str, goal: Dict, count_delta: int, value_delta: float) -> Dict[str, float]:
+        """The `$inc` for a habit doc when `user_id`'s log on it changes"""
+        increments = {
+            f"goals.{user_id}.{field}": delta
+            for field, delta in CheckinCounterService.goal_counters(goal, count_delta, value_delta).items()
+        }
+        return {field: delta for field, delta in increments.items() if delta}
+
+    @staticmethod
+    async def record_user_checkin(db, user_id: str, delta: int) -> None:
+        """`$inc` the user's total (skipped until the field has been seeded)"""
+        if delta:
+            await db.users.update_one(
+                {"_id": ObjectId(user_id), USER_CHECKINS_FIELD: {"$exists": True}},
+                {"$inc": {USER_CHECKINS_FIELD: delta}}
+            )
+
+    @staticmethod
+    async def seed_user_total(db, user_id: str) -> int:
+        """Count the user's completed logs once and store it as their running total"""
+        total = await db.habit_logs.count_documents({
+            "user_id": {"$in": _id_variants([user_id])},
+            "completed": True
+        })
+        await db.users.update_one(
+            {"_id": ObjectId(user_id), USER_CHECKINS_FIELD: {"$exists": False}},
+            {"$set": {USER_CHECKINS_FIELD: total}}
+        )
+        return total
+
+    # ===== Deriving from logs =====
+
+    @staticmethod
+    async def goal_totals(
+        db,
+        habit_ids: Iterable[Any],
+        user_ids: Optional[Iterable[Any]] = None
+    ) -> Dict[Tuple[str, str], Tuple[int, float]]:
+        """(habit_id, user_id) → (completed logs, summed value), one aggregation"""
+        ids = [str(hid) for hid in habit_ids]
+        if not ids:
+            return {}
+        match: Dict[str, Any] = {"habit_id": {"$in": _id_variants(ids)}, "completed": True}
+        if user_ids is not None:
+            match["user_id"] = {"$in": _id_variants(user_ids)}
+        rows = await db.habit_logs.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"habit_id": {"$toString": "$habit_id"}, "user_id": {"$toString": "$user_id"}},
+                "count": {"$sum": 1},
+                "value": {"$sum": {"$ifNull": ["$value", 0]}},
+            }},
+        ]).to_list(length=None)
+        return {(row["_id"]["habit_id"], row["_id"]["user_id"]): (row["count"], row["value"]) for row in rows}
+
+    @staticmethod
+    async def initial_goal_counters(db, habit_id: str, user_id: str, goal: Dict) -> Dict[str, float]:
+        """Counters for a goal created on a habit the user may already have logs for"""
+        totals = await CheckinCounterService.goal_totals(db, [habit_id], [user_id])
+        checkins, value = totals.get((habit_id, user_id), (0, 0))
+        return CheckinCounterService.goal_counters(goal, checkins, value)
+
+    # ===== Reconciliation =====
+
+    @staticmethod
+    async def reconcile_all(db, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Re-derive every user and goal counter from habit_logs; returns counts"""
+        batch_size = batch_size or CheckinCounterService.RECONCILE_BATCH_SIZE
+        counts = {"users": 0, "users_fixed": 0, "goals": 0, "goals_fixed": 0}
+
+        batch: List[Dict] = []
+        async for user in db.users.find({}, {USER_CHECKINS_FIELD: 1}):
+            batch.append(user)
+            if len(batch) >= batch_size:
+                await CheckinCounterService._reconcile_users(db, batch, counts)
+                batch = []
+        if batch:
+            await CheckinCounterService._reconcile_users(db, batch, counts)
+
+        batch = []
+        async for habit in db.habits.find({"goals": {"$exists": True, "$ne": {}}}, {"goals": 1}):
+            batch.append(habit)
+            if len(batch) >= batch_size:
+                await CheckinCounterService._reconcile_goals(db, batch, counts)
+                batch = []
+        if batch:
+            await CheckinCounterService._reconcile_goals(db, batch, counts)
+
+        if not DEMO_MODE:
+            print(f"🔢 Reconciled check-in counters: {counts}")
+        return counts
+
+    @staticmethod
+    async def _reconcile_users(db, users: List[Dict], counts: Dict[str, int]) -> None:
+        rows = await db.habit_logs.aggregate([
+            {"$match": {"user_id": {"$in": _id_variants(u["_id"] for u in users)}, "completed": True}},
+            {"$group": {"_id": {"$toString": "$user_id"}, "count": {"$sum": 1}}},
+        ]).to_list(length=None)
+        totals = {row["_id"]: row["count"] for row in rows}
+
+        ops = []
+        for user in users:
+            total = totals.get(str(user["_id"]), 0)
+            if user.get(USER_CHECKINS_FIELD) != total:
+                ops.append(UpdateOne({"_id": user["_id"]}, {"$set": {USER_CHECKINS_FIELD: total}}))
+        if ops:
+            await db.users.bulk_write(ops, ordered=False)
+        counts["users"] += len(users)
+        counts["users_fixed"] += len(ops)
+
+    @staticmethod
+    async def _reconcile_goals(db, habits: List[Dict], counts: Dict[str, int]) -> None:
+        totals = await CheckinCounterService.goal_totals(db, [h["_id"] for h in habits])
+
+        ops = []
+        for habit in habits:
+            fixes = {}
+            for user_id, goal in (habit.get("goals") or {}).items():
+                counts["goals"] += 1
+                checkins, value = totals.get((str(habit["_id"]), user_id), (0, 0))
+                expected = CheckinCounterService.goal_counters(goal, checkins, value)
+                if any(goal.get(field) != target for field, target in expected.items()):
+                    fixes.update({f"goals.{user_id}.{field}": target for field, target in expected.items()})
+                    counts["goals_fixed"] += 1
+            if fixes:
+                ops.append(UpdateOne({"_id": habit["_id"]}, {"$set": fixes}))
+        if ops:
+            await db.habits.bulk_write(ops, ordered=False)
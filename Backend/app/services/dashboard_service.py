@@ -0,0 +1,417 @@
+"""
+Dashboard Service
+
+GET /dashboard/home is served from a materialized `dashboard_views` document per user
+(_id = user ObjectId), so a load is one read by _id:
+- build_view runs the dashboard queries and returns the response data
+- Writes that change what a dashboard shows (check-ins, goal changes, habit and
+  partnership changes, profile changes) call mark_stale for the affected users. That
+  flags their views stale right away, so the next read never serves the old data, and
+  queues a rebuild on the background job queue
+- A view is also rebuilt on read if it's stale, from an older VIEW_VERSION or built on
+  an earlier UTC day (today's check-in flags reset at midnight)
+- Each mark_stale bumps the view's `generation`; a rebuild only stores its result if the
+  generation didn't move while it was building, so a slow rebuild can't overwrite a
+  newer change with older data. A user's first build inserts a stale placeholder
+  before building, so this holds before a view exists too
+- scripts/rebuild_dashboard_views.py rebuilds every view to repair drift
+- build_view runs its queries concurrently and can record each one's duration; the
+  route sends them as a Server-Timing header
+"""
+
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+import asyncio
+import os
+import time
+
+from pymongo.errors import DuplicateKeyError
+
+from app.models.dashboard import (
+    DashboardHomeResponse,
+    StreakItemResponse,
+    TodayGoalItemResponse,
+    PartnerActivityItemResponse,
+    PartnershipSummaryResponse,
+    UserSummaryResponse,
+    ActivitySummaryResponse
+)
+from app.services.checkin_counters import CheckinCounterService, USER_CHECKINS_FIELD
+from app.services.job_queue import job_queue
+from app.services.streak_service import StreakCalculationService
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+VIEW_COLLECTION = "dashboard_views"
+
+
+def calculate_hours_ago(timestamp: datetime, now: Optional[datetime] = None) -> int:
+    """Calculate hours ago from timestamp"""
+    delta = (now or datetime.utcnow()) - timestamp
+    return int(delta.total_seconds() / 3600)
+
+
+def _user_id_variants(user_id: str) -> List[Any]:
+    """habit_logs store user_id as a string (older logs as an ObjectId)"""
+    return [user_id, ObjectId(user_id)]
+
+
+async def _timed(timings: Optional[Dict[str, float]], name: str, awaitable):
+    """Await `awaitable`, recording how long it took (ms) under `name`"""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        if timings is not None:
+            timings[name] = (time.perf_counter() - started) * 1000
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Format timings (ms) as a Server-Timing header value"""
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+
+class DashboardService:
+    """Builds, stores and serves the per-user dashboard read model"""
+
+    # Bump when the stored view shape changes so old views are rebuilt on read
+    VIEW_VERSION = 1
+    PARTNER_ACTIVITY_HOURS = 48
+
+    # Users with a rebuild already queued in this worker (coalesces bursts of writes)
+    _pending: Set[str] = set()
+
+    @staticmethod
+    def _today() -> datetime:
+        return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    async def build_view(db, user_id: str, timings: Optional[Dict[str, float]] = None) -> Optional[Dict]:
+        """
+        Run the dashboard queries for `user_id`.
+
+        Returns the view data (DashboardHomeResponse fields, with partner activity
+        timestamps instead of hours_ago), {"not_found": detail} if the user has no
+        active partnership or the partner is gone, or None if the user doesn't exist.
+
+        Queries run as a dependency graph rather than one after another, so a build
+        takes about as long as its longest chain:
+
+            user ── total check-ins (only if the counter isn't seeded yet)
+            partnerships ─┬─ partner
+                          ├─ habits ─┬─ today's logs
+                          │          └─ streaks
+                          ├─ partner logs ── partner habit names
+                          ├─ total habits
+                          └─ goals
+
+        One partnerships query gives the current partnership, total_partners and the
+        ids for the counts. Each query's duration (ms) is recorded in `timings`.
+        """
+        def timed(name: str, awaitable):
+            return _timed(timings, name, awaitable)
+
+        user_oid = ObjectId(user_id)
+        today = DashboardService._today()
+        since = datetime.utcnow() - timedelta(hours=DashboardService.PARTNER_ACTIVITY_HOURS)
+
+        user, partnerships = await asyncio.gather(
+            timed("user", db.users.find_one({"_id": user_oid})),
+            timed("partnerships", db.partnerships.find({
+                "$or": [
+                    {"user_id_1": user_oid},
+                    {"user_id_2": user_oid}
+                ],
+                "status": "active"
+            }).to_list(100)),
+        )
+        if not user:
+            return None
+        if not partnerships:
+            return {"not_found": "No active partnership found"}
+
+        partnership = partnerships[0]
+        partnership_id = str(partnership["_id"])
+        partnership_ids = [str(p["_id"]) for p in partnerships]
+        partner_id = (
+            str(partnership["user_id_2"])
+            if str(partnership["user_id_1"]) == user_id
+            else str(partnership["user_id_1"])
+        )
+
+        async def load_habits():
+            # Active habits for this partnership, then their check-ins and streaks
+            habits = await timed("habits", db.habits.find({
+                "partnership_id": partnership_id,
+                "status": "active"
+            }).to_list(100))
+            habit_ids = [str(h["_id"]) for h in habits]
+            todays_logs, streak_data = await asyncio.gather(
+                timed("todays_logs", db.habit_logs.find({
+                    "habit_id": {"$in": habit_ids},
+                    "log_date": today
+                }).to_list(1000)),
+                # habit.current_streak is deprecated; read the streaks cache
+                timed("streaks", StreakCalculationService.get_streaks_cached_many(
+                    db, habit_ids, {habit_id: partnership_id for habit_id in habit_ids}
+                )),
+            )
+            return habits, todays_logs, streak_data
+
+        async def load_partner_activity():
+            # Partner's recent check-ins (last 48 hours), then those habits' names
+            partner_logs = await timed("partner_logs", db.habit_logs.find({
+                "user_id": {"$in": _user_id_variants(partner_id)},
+                "timestamp": {"$gte": since},
+                "completed": True
+            }).sort("timestamp", -1).limit(10).to_list(10))
+            if not partner_logs:
+                return [], {}
+            partner_habit_ids = list(set(str(log["habit_id"]) for log in partner_logs))
+            partner_habits = await timed("partner_habits", db.habits.find(
+                {"_id": {"$in": [ObjectId(hid) for hid in partner_habit_ids]}},
+                {"habit_name": 1}
+            ).to_list(100))
+            return partner_logs, {str(habit["_id"]): habit["habit_name"] for habit in partner_habits}
+
+        async def count_goals():
+            # Active goals for this user across all partnerships
+            habits_with_goals = await timed("goals", db.habits.find({
+                f"goals.{user_id}": {"$exists": True},
+                "partnership_id": {"$in": partnership_ids}
+            }, {f"goals.{user_id}.goal_status": 1}).to_list(1000))
+            total_goals = 0
+            for habit in habits_with_goals:
+                user_goals = habit.get("goals", {}).get(user_id, {})
+                if user_goals and user_goals.get("goal_status", "active") == "active":
+                    total_goals += 1
+            return total_goals
+
+        async def total_checkins():
+            # Running counter on the user doc (see CheckinCounterService); seeded on first use
+            total = user.get(USER_CHECKINS_FIELD)
+            if total is None:
+                total = await timed("total_checkins", CheckinCounterService.seed_user_total(db, user_id))
+            return total
+
+        (
+            partner,
+            (habits, todays_logs, streak_data),
+            (partner_logs, habits_lookup),
+            total_habits,
+            total_goals,
+            total_checkins_count,
+        ) = await asyncio.gather(
+            timed("partner", db.users.find_one({"_id": ObjectId(partner_id)})),
+            load_habits(),
+            load_partner_activity(),
+            # Active habits for this user across all partnerships
+            timed("total_habits", db.habits.count_documents({
+                "partnership_id": {"$in": partnership_ids},
+                "status": "active"
+            })),
+            count_goals(),
+            total_checkins(),
+        )
+        if not partner:
+            return {"not_found": "Partner not found"}
+
+        # Create lookup for today's check-ins by habit and user
+        checkins_map: Dict[str, Dict[str, bool]] = {}
+        for log in todays_logs:
+            checkins_map.setdefault(str(log["habit_id"]), {})[str(log["user_id"])] = log["completed"]
+
+        streaks = [
+            {
+                "habit_id": str(habit["_id"]),
+                "habit_name": habit["habit_name"],
+                "current_streak": streak_data.get(str(habit["_id"]), {}).get("current_streak", 0),
+                "category": habit["category"],
+            }
+            for habit in habits
+        ]
+
+        # Build today's goals with check-in status
+        todays_goals = [
+            {
+                "habit_id": str(habit["_id"]),
+                "habit_name": habit["habit_name"],
+                "checked_in_today": checkins_map.get(str(habit["_id"]), {}).get(user_id, False),
+                "category": habit["category"],
+            }
+            for habit in habits
+        ]
+
+        partner_name = partner.get("display_name") or partner.get("username", "")
+        partner_progress = [
+            {
+                "partner_name": partner_name,
+                "habit_name": habits_lookup.get(str(log["habit_id"]), "Unknown Habit"),
+                "checked_in_at": log["timestamp"],
+            }
+            for log in partner_logs
+        ]
+
+        return {
+            "user": {
+                "display_name": user.get("display_name") or user.get("username", ""),
+                "username": user["username"],
+            },
+            "streaks": streaks,
+            "todays_goals": todays_goals,
+            "partner_progress": partner_progress,
+            "partnership": {
+                "partner_name": partner_name,
+                "partner_username": partner["username"],
+                "total_active_habits": len(habits),
+            },
+            "activity_summary": {
+                "total_partners": len(partnerships),
+                "total_habits": total_habits,
+                "total_goals": total_goals,
+                "total_checkins": total_checkins_count,
+            },
+        }
+
+    @staticmethod
+    async def rebuild(db, user_id: str, timings: Optional[Dict[str, float]] = None) -> Optional[Dict]:
+        """Build `user_id`'s view and store it unless it was marked stale meanwhile"""
+        views = db[VIEW_COLLECTION]
+        oid = ObjectId(user_id)
+        current = await views.find_one({"_id": oid}, {"generation": 1})
+        if current is None:
+            # Stale placeholder first, so a mark_stale during the first build bumps its
+            # generation too and the result below isn't stored over that change
+            try:
+                await views.insert_one({"_id": oid, "generation": 0, "stale": True})
+            except DuplicateKeyError:
+                current = await views.find_one({"_id": oid}, {"generation": 1})
+        generation = (current or {}).get("generation", 0)
+
+        data = await DashboardService.build_view(db, user_id, timings)
+        if data is None:
+            await views.delete_one({"_id": oid})
+            return None
+
+        view = {
+            **data,
+            "version": DashboardService.VIEW_VERSION,
+            "built_for": DashboardService._today(),
+            "built_at": datetime.utcnow(),
+            "generation": generation,
+            "stale": False,
+        }
+        # Replaced whole: keys from an earlier build (e.g. not_found before partnering) go
+        await views.replace_one({"_id": oid, "generation": generation}, view)
+        return view
+
+    @staticmethod
+    def is_fresh(view: Optional[Dict]) -> bool:
+        return bool(
+            view
+            and not view.get("stale")
+            and view.get("version") == DashboardService.VIEW_VERSION
+            and view.get("built_for") == DashboardService._today()
+        )
+
+    @staticmethod
+    async def get_view(db, user_id: str, timings: Optional[Dict[str, float]] = None) -> Optional[Dict]:
+        """
+        The user's view: one read by _id, rebuilt first if it isn't fresh.
+        `timings` gets the read's duration and, for a rebuild, each build query's.
+        """
+        view = await _timed(timings, "view", db[VIEW_COLLECTION].find_one({"_id": ObjectId(user_id)}))
+        if DashboardService.is_fresh(view):
+            return view
+        return await _timed(timings, "rebuild", DashboardService.rebuild(db, user_id, timings))
+
+    @staticmethod
+    def to_response(view: Dict, now: Optional[datetime] = None) -> DashboardHomeResponse:
+        """Turn a stored view into the API response (ages partner activity to `now`)"""
+        now = now or datetime.utcnow()
+        since = now - timedelta(hours=DashboardService.PARTNER_ACTIVITY_HOURS)
+        return DashboardHomeResponse(
+            user=UserSummaryResponse(**view["user"]),
+            streaks=[StreakItemResponse(**item) for item in view["streaks"]],
+            todays_goals=[TodayGoalItemResponse(**item) for item in view["todays_goals"]],
+            partner_progress=[
+                PartnerActivityItemResponse(**item, hours_ago=calculate_hours_ago(item["checked_in_at"], now))
+                for item in view["partner_progress"]
+                if item["checked_in_at"] >= since
+            ],
+            partnership=PartnershipSummaryResponse(**view["partnership"]),
+            activity_summary=ActivitySummaryResponse(**view["activity_summary"]),
+        )
+
+    # ===== Invalidation =====
+
+    @staticmethod
+    async def mark_stale(db, user_ids: Iterable[Any]) -> None:
+        """Flag these users' views stale now and queue their rebuilds"""
+        ids = {str(uid) for uid in user_ids if uid and ObjectId.is_valid(str(uid))}
+        if not ids:
+            return
+        await db[VIEW_COLLECTION].update_many(
+            {"_id": {"$in": [ObjectId(uid) for uid in ids]}},
+            {"$set": {"stale": True}, "$inc": {"generation": 1}}
+        )
+
+        queued = sorted(ids - DashboardService._pending)
+        if queued:
+            DashboardService._pending.update(queued)
+            # The request-scoped identity map wrapper is closed once the response is sent
+            raw_db = getattr(db, "unwrapped", db)
+            await job_queue.enqueue(
+                DashboardService._rebuild_queued, raw_db, queued, job_name="dashboard_view_rebuild"
+            )
+
+    @staticmethod
+    async def mark_partnership_stale(db, partnership: Optional[Dict]) -> None:
+        """Both partners' views"""
+        if partnership:
+            await DashboardService.mark_stale(db, [partnership.get("user_id_1"), partnership.get("user_id_2")])
+
+    @staticmethod
+    async def mark_user_and_partners_stale(db, user_id: str) -> None:
+        """The user's view and those of everyone in an active partnership with them"""
+        partnerships = await db.partnerships.find({
+            "$or": [
+                {"user_id_1": ObjectId(user_id)},
+                {"user_id_2": ObjectId(user_id)}
+            ],
+            "status": "active"
+        }, {"user_id_1": 1, "user_id_2": 1}).to_list(100)
+        user_ids = {user_id}
+        for partnership in partnerships:
+            user_ids.update((str(partnership["user_id_1"]), str(partnership["user_id_2"])))
+        await DashboardService.mark_stale(db, user_ids)
+
+    @staticmethod
+    async def _rebuild_queued(db, user_ids: List[str]) -> None:
+        # Cleared first so a write during the rebuild queues another one
+        DashboardService._pending.difference_update(user_ids)
+        await asyncio.gather(*[DashboardService.rebuild(db, user_id) for user_id in user_ids])
+        if not DEMO_MODE:
+            print(f"🏠 Rebuilt {len(user_ids)} dashboard view(s)")
+
+    @staticmethod
+    async def rebuild_all(db, batch_size: int = 100) -> Dict[str, int]:
+        """Rebuild every user's view (drift repair); returns counts"""
+        counts = {"users": 0, "rebuilt": 0}
+        batch: List[str] = []
+        async for user in db.users.find({}, {"_id": 1}):
+            batch.append(str(user["_id"]))
+            if len(batch) >= batch_size:
+                await DashboardService._rebuild_batch(db, batch, counts)
+                batch = []
+        if batch:
+            await DashboardService._rebuild_batch(db, batch, counts)
+        return counts
+
+    @staticmethod
+    async def _rebuild_batch(db, user_ids: List[str], counts: Dict[str, int]) -> None:
+        views = await asyncio.gather(*[DashboardService.rebuild(db, user_id) for user_id in user_ids])
+        counts["users"] += len(user_ids)
+        counts["rebuilt"] += sum(1 for view in views if view is not None)
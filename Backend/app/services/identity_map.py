@@ -0,0 +1,147 @@
+"""
+Request-scoped identity map
+
+Wraps the Motor database for the lifetime of one request so a document is fetched
+from Mongo at most once:
+- find_one({"_id": X}) returns the document already loaded for X (concurrent lookups
+  of the same id share one round trip)
+- any other find_one that returns a full document (no projection) registers it under
+  its _id, so a later lookup by id is served from the map
+- writes through the wrapper evict what they touch (the _id in the filter, or the whole
+  collection when the filter isn't by _id)
+
+Everything else (find, aggregate, count_documents, ...) passes straight through.
+Saved round trips are counted per request and in process-wide totals for /health.
+"""
+
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+WRITE_METHODS = {
+    "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "find_one_and_update", "find_one_and_replace", "find_one_and_delete", "bulk_write",
+}
+
+_totals = {"requests": 0, "lookups": 0, "saved_round_trips": 0}
+
+
+def identity_map_stats() -> Dict[str, int]:
+    """Process-wide counters across all request identity maps."""
+    return dict(_totals)
+
+
+def _id_of(query: Any) -> Any:
+    """The _id of a {"_id": X} filter, or None for anything else."""
+    if isinstance(query, dict) and len(query) == 1 and "_id" in query and not isinstance(query["_id"], dict):
+        return query["_id"]
+    return None
+
+
+# Attributes of the wrapped database that get an identity-mapped view (tests add their doubles)
+COLLECTION_TYPES: Tuple[type, ...] = (AsyncIOMotorCollection,)
+
+
+def _is_collection(attr: Any) -> bool:
+    return isinstance(attr, COLLECTION_TYPES)
+
+
+class IdentityMapCollection:
+    """One collection's view of the request identity map"""
+
+    def __init__(self, collection: AsyncIOMotorCollection, identity_map: "IdentityMapDatabase"):
+        self._collection = collection
+        self._map = identity_map
+        self._docs: Dict[Any, asyncio.Future] = {}
+
+    async def find_one(self, filter: Any = None, *args, **kwargs) -> Optional[Dict]:
+        projection = args[0] if args else kwargs.get("projection")
+        doc_id = _id_of(filter)
+
+        if doc_id is not None:
+            self._map.lookups += 1
+            cached = self._docs.get(doc_id)
+            if cached is not None:
+                self._map.saved_round_trips += 1
+                return await asyncio.shield(cached)
+            if not args and not kwargs:
+                future = asyncio.ensure_future(self._collection.find_one(filter))
+                self._docs[doc_id] = future
+                try:
+                    return await asyncio.shield(future)
+                except Exception:
+                    self._docs.pop(doc_id, None)
+                    raise
+
+        doc = await self._collection.find_one(filter, *args, **kwargs)
+        if doc is not None and projection is None and "_id" in doc and doc["_id"] not in self._docs:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(doc)
+            self._docs[doc["_id"]] = future
+        return doc
+
+    def evict(self, filter: Any) -> None:
+        doc_id = _id_of(filter)
+        if doc_id is None:
+            self._docs.clear()
+        else:
+            self._docs.pop(doc_id, None)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._collection, name)
+        if name not in WRITE_METHODS:
+            return attr
+
+        async def write(*args, **kwargs):
+            if name == "bulk_write":
+                self._docs.clear()
+            else:
+                self.evict(args[0] if args else kwargs.get("filter"))
+            return await attr(*args, **kwargs)
+
+        return write
+
+
+class IdentityMapDatabase:
+    """
+    Per-request wrapper around an AsyncIOMotorDatabase:
+
+        db = IdentityMapDatabase(get_database())
+        await db.habits.find_one({"_id": habit_id})   # Mongo
+        await db.habits.find_one({"_id": habit_id})   # served from the map
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._collections: Dict[str, IdentityMapCollection] = {}
+        self.lookups = 0
+        self.saved_round_trips = 0
+
+    @property
+    def unwrapped(self):
+        return self._db
+
+    def _collection(self, name: str) -> IdentityMapCollection:
+        if name not in self._collections:
+            self._collections[name] = IdentityMapCollection(getattr(self._db, name), self)
+        return self._collections[name]
+
+    def __getitem__(self, name: str) -> IdentityMapCollection:
+        return self._collection(name)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._db, name)
+        if _is_collection(attr):
+            return self._collection(name)
+        return attr
+
+    def stats(self) -> Dict[str, int]:
+        return {"lookups": self.lookups, "saved_round_trips": self.saved_round_trips}
+
+    def close(self) -> None:
+        """Fold this request's counters into the process totals and drop the documents."""
+        _totals["requests"] += 1
+        _totals["lookups"] += self.lookups
+        _totals["saved_round_trips"] += self.saved_round_trips
+        self._collections.clear()
@@ -0,0 +1,173 @@
+"""
+Background Job Queue
+
+In-process queue for side effects that shouldn't hold up a response
+(partner notifications, milestone checks, ...).
+
+- Bounded: at most JOB_QUEUE_MAX_SIZE jobs wait, JOB_QUEUE_CONCURRENCY run at once
+- Workers retry failed jobs with exponential backoff
+- Backpressure: when the queue is full (or not running) the job gets one inline attempt
+  in the caller, with no retries or backoff sleeps, and is counted in the metrics
+- Started/stopped from the app lifespan; stop() drains queued jobs before exiting
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+
+class BackgroundJobQueue:
+    """Bounded asyncio job queue with a fixed pool of workers"""
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 0.5
+    ):
+        self.max_size = max_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running = False
+        self._in_flight = 0
+
+        self._counters: Dict[str, int] = {
+            "enqueued": 0,
+            "completed": 0,
+            "failed": 0,
+            "retried": 0,
+            "ran_inline": 0,
+            "rejected_full": 0,
+        }
+        self._max_depth_seen = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self) -> None:
+        """Create the queue and spawn the worker tasks (call from lifespan startup)"""
+        if self._running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        self._running = True
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop accepting jobs, wait up to `timeout` seconds for queued jobs to finish,
+        then cancel the workers.
+        """
+        if not self._running:
+            return
+        self._running = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            if not DEMO_MODE:
+                print(f"⚠️ Job queue shutdown timed out with {self._queue.qsize()} jobs left")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enqueue(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        *args,
+        job_name: Optional[str] = None,
+        **kwargs
+    ) -> bool:
+        """
+        Queue `func(*args, **kwargs)` to run in the background.
+
+        Returns True if the job was queued. If the queue isn't running or is full,
+        the job is attempted once inline (a failure is counted, not retried) and
+        False is returned, so an overloaded queue never stalls a request on backoff.
+        """
+        job = {
+            "func": func,
+            "args": args,
+            "kwargs": kwargs,
+            "name": job_name or getattr(func, "__name__", "job"),
+        }
+
+        if self._running:
+            try:
+                self._queue.put_nowait(job)
+                self._counters["enqueued"] += 1
+                self._max_depth_seen = max(self._max_depth_seen, self._queue.qsize())
+                return True
+            except asyncio.QueueFull:
+                self._counters["rejected_full"] += 1
+
+        self._counters["ran_inline"] += 1
+        await self._run_with_retries(job, max_retries=0)
+        return False
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue depth and job counters, for sizing the queue"""
+        return {
+            **self._counters,
+            "running": self._running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self._max_depth_seen,
+            "in_flight": self._in_flight,
+            "max_size": self.max_size,
+            "concurrency": self.concurrency,
+        }
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_with_retries(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_with_retries(self, job: Dict, max_retries: Optional[int] = None) -> None:
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        self._in_flight += 1
+        try:
+            while True:
+                try:
+                    started = time.perf_counter()
+                    await job["func"](*job["args"], **job["kwargs"])
+                    self._counters["completed"] += 1
+                    if not DEMO_MODE:
+                        print(f"✅ Job {job['name']} done in {(time.perf_counter() - started) * 1000:.1f}ms")
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if attempt >= max_retries:
+                        self._counters["failed"] += 1
+                        if not DEMO_MODE:
+                            print(f"❌ Job {job['name']} failed after {attempt + 1} attempts: {e}")
+                        return
+                    self._counters["retried"] += 1
+                    await asyncio.sleep(self.retry_backoff_seconds * (2 ** attempt))
+                    attempt += 1
+        finally:
+            self._in_flight -= 1
+
+
+# Global job queue instance
+job_queue = BackgroundJobQueue(
+    max_size=int(os.getenv("JOB_QUEUE_MAX_SIZE", 1000)),
+    concurrency=int(os.getenv("JOB_QUEUE_CONCURRENCY", 4)),
+    max_retries=int(os.getenv("JOB_QUEUE_MAX_RETRIES", 3)),
+)
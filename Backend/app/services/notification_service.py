@@ -3,21 +3,48 @@ Notification Service
 
 Handles sending notifications with preference checking.
 Creates database records and sends real-time notifications via WebSocket.
+
+Each stored notification carries a `snapshot` of the display fields the list endpoint
+shows (partner_username / partner_avatar for the related user, habit_name for habit
+notifications), looked up in one batch when it's written, so reading notifications
+needs no joins. When a user's avatar or a habit's name changes, the routes queue
+refresh_user_snapshots / refresh_habit_snapshots on the background job queue, which
+rewrite the snapshots with one update_many. Rows written before snapshots existed are
+filled in by backfill_snapshots (scripts/backfill_notification_snapshots.py).
 """
 
 from bson import ObjectId
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import os
 import random
 
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
 from config.database import get_database
+from app.services.cache import CacheBackend, build_cache_backend
+from app.services.job_queue import job_queue
 from app.services.websocket import manager
 from app.models.notification import NotificationType
 
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
 
 class NotificationService:
     """Service for managing notifications with user preference checks"""
     
+    # user_id → notification_preferences, loaded with a projection; invalidated from
+    # the preferences update route (and across workers when a bus is configured)
+    PREFERENCE_CACHE_TTL_SECONDS = int(os.getenv("NOTIFICATION_PREFS_CACHE_TTL_SECONDS", 300))
+    preference_cache: CacheBackend = build_cache_backend(
+        "notification_prefs",
+        max_entries=int(os.getenv("NOTIFICATION_PREFS_CACHE_MAX_ENTRIES", 10000)),
+        default_ttl_seconds=PREFERENCE_CACHE_TTL_SECONDS,
+    )
+    
     # Map notification types to preference keys
     NOTIFICATION_PREFERENCE_MAP = {
         "partnership_request": "partner_requests",
@@ -34,10 +61,91 @@ class NotificationService:
         "streak_broken": "habit_reminders"  # Legacy support
     }
     
+    # Notification types whose related_id is a habit (their snapshot has habit_name)
+    HABIT_NOTIFICATION_TYPES = [
+        NotificationType.HABIT_REMINDER,
+        NotificationType.MISSED_HABIT,
+        NotificationType.PROGRESS_MILESTONE
+    ]
+    
+    # What a snapshot shows about the related user
+    USER_SNAPSHOT_PROJECTION = {"username": 1, "profile_photo_url": 1, "profile_picture": 1}
+    
+    async def get_user_preferences(self, user_id: str, db=None) -> Optional[Dict[str, Any]]:
+        """
+        A user's notification_preferences (cached), or None if the user doesn't exist
+        """
+        cached = self.preference_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
+        db = db or get_database()
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, {"notification_preferences": 1})
+        if not user:
+            return None
+        
+        preferences = user.get("notification_preferences") or {}
+        self.preference_cache.set(user_id, preferences)
+        return preferences
+    
+    async def get_preferences_many(self, user_ids: List[str], db=None) -> Dict[str, Dict[str, Any]]:
+        """
+        notification_preferences for many users: cache hits first, then one $in query
+        for the rest. Users that don't exist are left out of the result.
+        """
+        result: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = self.preference_cache.get(user_id)
+            if cached is not None:
+                result[user_id] = cached
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            db = db or get_database()
+            cursor = db.users.find(
+                {"_id": {"$in": [ObjectId(uid) for uid in missing]}},
+                {"notification_preferences": 1}
+            )
+            async for user in cursor:
+                preferences = user.get("notification_preferences") or {}
+                result[str(user["_id"])] = preferences
+                self.preference_cache.set(str(user["_id"]), preferences)
+        
+        return result
+    
+    def invalidate_user_preferences(self, user_id: str) -> None:
+        """Drop a user's cached preferences (call after updating them)"""
+        self.preference_cache.invalidate(str(user_id))
+    
+    def is_enabled(self, preferences: Dict[str, Any], notification_type: str) -> bool:
+        """Whether `preferences` allow `notification_type` (unset preferences default to enabled)"""
+        preference_key = self.NOTIFICATION_PREFERENCE_MAP.get(notification_type)
+        if not preference_key:
+            return False
+        return preferences.get(preference_key, True)
+    
+    async def filter_by_preferences(
+        self,
+        user_ids: List[str],
+        notification_type: str,
+        db=None
+    ) -> List[str]:
+        """
+        Bulk preference check: the user_ids (in order) that want `notification_type`
+        """
+        preferences = await self.get_preferences_many(user_ids, db=db)
+        return [
+            user_id for user_id in user_ids
+            if user_id in preferences and self.is_enabled(preferences[user_id], notification_type)
+        ]
+    
     async def check_user_preferences(
         self, 
         user_id: str, 
-        notification_type: str
+        notification_type: str,
+        db=None
     ) -> bool:
         """
         Check if user has enabled this notification type
@@ -45,16 +153,16 @@ class NotificationService:
         takes in:
             user_id: User's ID
             notification_type: Type of notification (partner_request, nudge, etc.)
+            db: Optional database handle (pass the route's request db to reuse a user
+                document it already loaded)
             
         Returns:
             bool: True if user wants this notification, False otherwise
         """
-        db = get_database()
-        
-        # Get user's notification preferences
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        # Get user's notification preferences (projected + cached)
+        notification_preferences = await self.get_user_preferences(user_id, db=db)
         
-        if not user:
+        if notification_preferences is None:
             print(f"⚠️ User {user_id} not found")
             return False
         
@@ -66,7 +174,6 @@ class NotificationService:
             return False
         
         # Check user's preferences (default to True if not set)
-        notification_preferences = user.get("notification_preferences", {})
         is_enabled = notification_preferences.get(preference_key, True)  # Default to enabled
         
         print(f"📋 User {user_id} preference for {preference_key}: {is_enabled}")
@@ -83,7 +190,8 @@ class NotificationService:
         partnership_id: Optional[str] = None,
         related_id: Optional[str] = None,
         related_user_id: Optional[str] = None,
-        skip_preference_check: bool = False
+        skip_preference_check: bool = False,
+        db=None
     ):
         """
         Send a notification to a user (checks preferences first)
@@ -99,24 +207,111 @@ class NotificationService:
             related_id: Optional related ID (habit_id, request_id, etc.)
             related_user_id: Optional related user ID (partner who triggered)
             skip_preference_check: If True, skip preference check (for critical notifications)
+            db: Optional database handle (e.g. the route's request db)
         """
         # Step 1: Check if user wants this notification (unless skipped)
         if not skip_preference_check:
-            if not await self.check_user_preferences(user_id, notification_type):
+            if not await self.check_user_preferences(user_id, notification_type, db=db):
                 print(f"🚫 Notification blocked by user preferences: {user_id} - {notification_type}")
                 return
         
-        db = get_database()
-        
-        # Use message as description if description not provided
-        final_description = description or message or ""
+        db = db or get_database()
         
         # Step 2: Store notification in database (using 'type' field to match models)
+        notification_doc = self._build_notification_doc(
+            user_id, notification_type, title, message, description,
+            partnership_id, related_id, related_user_id
+        )
+        await self.attach_snapshots(db, [notification_doc])
+        
+        result = await db.notifications.insert_one(notification_doc)
+        notification_id = str(result.inserted_id)
+        
+        print(f"💾 Notification saved to DB: {notification_id}")
+        
+        # Step 3: Send via WebSocket if user is connected
+        await manager.send_notification(user_id, self._websocket_message(notification_doc, data))
+    
+    async def send_many(
+        self,
+        notifications: List[Dict[str, Any]],
+        skip_preference_check: bool = False,
+        db=None
+    ) -> Dict[str, int]:
+        """
+        Send many notifications at once (fan-out jobs like reminders)
+        
+        Each item takes the same keyword arguments as send_notification (user_id,
+        notification_type, title, message, description, data, partnership_id,
+        related_id, related_user_id). Preferences are checked in bulk, everything is
+        stored with one insert_many(ordered=False), and WebSocket delivery runs
+        concurrently with a per-socket timeout.
+        
+        Returns:
+            Counts: requested, blocked (by preferences), inserted, failed, delivered
+        """
+        db = db or get_database()
+        summary = {"requested": len(notifications), "blocked": 0, "inserted": 0, "failed": 0, "delivered": 0}
+        
+        # Step 1: bulk preference check - one query for every recipient not already cached
+        if not skip_preference_check:
+            preferences = await self.get_preferences_many([n["user_id"] for n in notifications], db=db)
+            allowed = [
+                n for n in notifications
+                if n["user_id"] in preferences and self.is_enabled(preferences[n["user_id"]], n["notification_type"])
+            ]
+            summary["blocked"] = len(notifications) - len(allowed)
+            notifications = allowed
+        if not notifications:
+            return summary
+        
+        # Step 2: one round trip for all documents; a bad document doesn't stop the rest
+        docs = [
+            self._build_notification_doc(
+                n["user_id"], n["notification_type"], n["title"], n.get("message"), n.get("description"),
+                n.get("partnership_id"), n.get("related_id"), n.get("related_user_id")
+            )
+            for n in notifications
+        ]
+        await self.attach_snapshots(db, docs)
+        failed_indexes = set()
+        try:
+            await db.notifications.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+            print(f"⚠️ {len(failed_indexes)} notification(s) failed to insert")
+        summary["failed"] = len(failed_indexes)
+        summary["inserted"] = len(docs) - len(failed_indexes)
+        
+        # Step 3: concurrent WebSocket delivery for the stored notifications
+        summary["delivered"] = await manager.send_many([
+            (n["user_id"], self._websocket_message(doc, n.get("data")))
+            for i, (n, doc) in enumerate(zip(notifications, docs))
+            if i not in failed_indexes
+        ])
+        
+        if not DEMO_MODE:
+            print(f"💾 Bulk notifications: {summary}")
+        return summary
+    
+    @staticmethod
+    def _build_notification_doc(
+        user_id: str,
+        notification_type: str,
+        title: str,
+        message: Optional[str],
+        description: Optional[str],
+        partnership_id: Optional[str],
+        related_id: Optional[str],
+        related_user_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """The notifications collection document for one notification"""
+        # Use message as description if description not provided
         notification_doc = {
             "user_id": ObjectId(user_id),
             "type": notification_type,
             "title": title,
-            "message": final_description,
+            "message": description or message or "",
             "is_read": False,
             "action_taken": False,
             "created_at": datetime.utcnow()
@@ -129,26 +324,166 @@ class NotificationService:
             notification_doc["related_id"] = related_id
         if related_user_id:
             notification_doc["related_user_id"] = related_user_id
+        return notification_doc
+    
+    # ===== Display snapshots =====
+    
+    @staticmethod
+    async def related_lookups(db, notification_docs: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+        """
+        Related users (str id → user) and habit names (str id → name) for these
+        notifications: one `$in` query each, run together, display fields only
+        """
+        user_ids = {
+            ObjectId(str(doc["related_user_id"]))
+            for doc in notification_docs
+            if doc.get("related_user_id") and ObjectId.is_valid(str(doc["related_user_id"]))
+        }
+        habit_ids = {
+            ObjectId(str(doc["related_id"]))
+            for doc in notification_docs
+            if doc.get("related_id")
+            and doc.get("type") in NotificationService.HABIT_NOTIFICATION_TYPES
+            and ObjectId.is_valid(str(doc["related_id"]))
+        }
         
-        result = await db.notifications.insert_one(notification_doc)
-        notification_id = str(result.inserted_id)
-        
-        print(f"💾 Notification saved to DB: {notification_id}")
+        async def find(collection, ids, projection):
+            if not ids:
+                return []
+            return await db[collection].find({"_id": {"$in": list(ids)}}, projection).to_list(length=None)
         
-        # Step 3: Send via WebSocket if user is connected
-        websocket_message = {
-            "id": notification_id,
-            "type": notification_type,
-            "title": title,
-            "message": final_description,
+        users, habits = await asyncio.gather(
+            find("users", user_ids, NotificationService.USER_SNAPSHOT_PROJECTION),
+            find("habits", habit_ids, {"habit_name": 1}),
+        )
+        return (
+            {str(user["_id"]): user for user in users},
+            {str(habit["_id"]): habit.get("habit_name") for habit in habits},
+        )
+    
+    @staticmethod
+    def build_snapshot(
+        notification_doc: Dict[str, Any],
+        users_by_id: Dict[str, Dict],
+        habit_names: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """The display fields for one notification, from related_lookups results"""
+        snapshot: Dict[str, Any] = {}
+        partner = users_by_id.get(str(notification_doc.get("related_user_id")))
+        if partner:
+            snapshot["partner_username"] = partner.get("username")
+            snapshot["partner_avatar"] = partner.get("profile_photo_url") or partner.get("profile_picture")
+        if notification_doc.get("type") in NotificationService.HABIT_NOTIFICATION_TYPES:
+            habit_name = habit_names.get(str(notification_doc.get("related_id")))
+            if habit_name:
+                snapshot["habit_name"] = habit_name
+        return snapshot
+    
+    async def attach_snapshots(self, db, notification_docs: List[Dict[str, Any]]) -> None:
+        """Set `snapshot` on documents about to be stored (left off if the lookup fails)"""
+        try:
+            users_by_id, habit_names = await self.related_lookups(db, notification_docs)
+        except Exception as e:
+            # The list endpoint falls back to looking these up; don't lose the notification
+            print(f"⚠️ Notification snapshot lookup failed: {e}")
+            return
+        for doc in notification_docs:
+            doc["snapshot"] = self.build_snapshot(doc, users_by_id, habit_names)
+    
+    @staticmethod
+    def _id_variants(value: str) -> List[Any]:
+        """related ids are stored as strings (older rows may hold ObjectIds)"""
+        return [str(value), ObjectId(str(value))] if ObjectId.is_valid(str(value)) else [str(value)]
+    
+    async def refresh_user_snapshots(self, user_id: str, db=None) -> int:
+        """Rewrite the user's name/avatar in every notification about them"""
+        db = db or get_database()
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, self.USER_SNAPSHOT_PROJECTION)
+        if not user:
+            return 0
+        result = await db.notifications.update_many(
+            {"related_user_id": {"$in": self._id_variants(user_id)}, "snapshot": {"$exists": True}},
+            {"$set": {
+                "snapshot.partner_username": user.get("username"),
+                "snapshot.partner_avatar": user.get("profile_photo_url") or user.get("profile_picture"),
+            }}
+        )
+        if not DEMO_MODE:
+            print(f"🔄 Refreshed {result.modified_count} notification snapshot(s) for user {user_id}")
+        return result.modified_count
+    
+    async def refresh_habit_snapshots(self, habit_id: str, db=None) -> int:
+        """Rewrite the habit's name in every habit notification about it"""
+        db = db or get_database()
+        habit = await db.habits.find_one({"_id": ObjectId(habit_id)}, {"habit_name": 1})
+        if not habit:
+            return 0
+        result = await db.notifications.update_many(
+            {
+                "type": {"$in": [t.value for t in self.HABIT_NOTIFICATION_TYPES]},
+                "related_id": {"$in": self._id_variants(habit_id)},
+                "snapshot": {"$exists": True},
+            },
+            {"$set": {"snapshot.habit_name": habit.get("habit_name")}}
+        )
+        if not DEMO_MODE:
+            print(f"🔄 Refreshed {result.modified_count} notification snapshot(s) for habit {habit_id}")
+        return result.modified_count
+    
+    async def queue_user_snapshot_refresh(self, db, user_id: str) -> None:
+        """Refresh in the background; the job reads the current values when it runs"""
+        # The request-scoped identity map wrapper is closed once the response is sent
+        raw_db = getattr(db, "unwrapped", db)
+        await job_queue.enqueue(
+            self.refresh_user_snapshots, user_id, db=raw_db, job_name="notification_snapshot_refresh"
+        )
+    
+    async def queue_habit_snapshot_refresh(self, db, habit_id: str) -> None:
+        """Refresh in the background; the job reads the current values when it runs"""
+        raw_db = getattr(db, "unwrapped", db)
+        await job_queue.enqueue(
+            self.refresh_habit_snapshots, habit_id, db=raw_db, job_name="notification_snapshot_refresh"
+        )
+    
+    async def backfill_snapshots(self, db=None, batch_size: int = 500) -> Dict[str, int]:
+        """Add snapshots to notifications stored before they existed; returns counts"""
+        db = db or get_database()
+        counts = {"notifications": 0, "updated": 0}
+        while True:
+            docs = await db.notifications.find(
+                {"snapshot": {"$exists": False}},
+                {"type": 1, "related_id": 1, "related_user_id": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            users_by_id, habit_names = await self.related_lookups(db, docs)
+            result = await db.notifications.bulk_write([
+                UpdateOne(
+                    {"_id": doc["_id"], "snapshot": {"$exists": False}},
+                    {"$set": {"snapshot": self.build_snapshot(doc, users_by_id, habit_names)}}
+                )
+                for doc in docs
+            ], ordered=False)
+            counts["notifications"] += len(docs)
+            counts["updated"] += result.modified_count
+            if len(docs) < batch_size:
+                break
+        return counts
+    
+    @staticmethod
+    def _websocket_message(notification_doc: Dict[str, Any], data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """The real-time payload for a stored notification document"""
+        return {
+            "id": str(notification_doc["_id"]),
+            "type": notification_doc["type"],
+            "title": notification_doc["title"],
+            "message": notification_doc["message"],
             "data": data or {},
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": notification_doc["created_at"].isoformat(),
             "is_read": False,
-            "related_id": related_id,
-            "related_user_id": related_user_id
+            "related_id": notification_doc.get("related_id"),
+            "related_user_id": notification_doc.get("related_user_id")
         }
-        
-        await manager.send_notification(user_id, websocket_message)
     
     async def send_partner_request_notification(
         self,
@@ -156,7 +491,8 @@ class NotificationService:
         sender_id: str,
         sender_username: str,
         request_id: str,
-        message: Optional[str] = None
+        message: Optional[str] = None,
+        db=None
     ):
         """
         Send notification when a partner request is received
@@ -167,6 +503,7 @@ class NotificationService:
             sender_username: Username of sender for display
             request_id: Partnership request ID
             message: Optional custom message
+            db: Optional database handle (e.g. the route's request db)
         """
         # Playful partnership request messages
         request_messages = [
@@ -190,7 +527,8 @@ class NotificationService:
                 "sender_id": sender_id,
                 "sender_username": sender_username,
                 "request_id": request_id
-            }
+            },
+            db=db
         )
     
     async def send_partner_checkin_notification(
@@ -354,7 +692,8 @@ class NotificationService:
         sender_user_id: str,
         sender_username: str,
         habit_id: str,
-        habit_name: str
+        habit_name: str,
+        db=None
     ):
         """
         Send nudge notification to a partner
@@ -365,6 +704,7 @@ class NotificationService:
             sender_username: Sender's username
             habit_id: Habit ID
             habit_name: Habit name
+            db: Optional database handle (e.g. the route's request db)
         """
         # Playful nudge messages
         nudge_messages = [
@@ -399,7 +739,8 @@ class NotificationService:
                 "sender_username": sender_username,
                 "habit_name": habit_name,
                 "habit_id": habit_id
-            }
+            },
+            db=db
         )
     
     async def send_habit_reminder_notification(
@@ -416,6 +757,12 @@ class NotificationService:
             habit_id: Habit ID
             habit_name: Habit name
         """
+        await self.send_notification(**self.build_habit_reminder(user_id, habit_id, habit_name))
+    
+    def build_habit_reminder(self, user_id: str, habit_id: str, habit_name: str) -> Dict[str, Any]:
+        """
+        send_notification/send_many arguments for a daily habit reminder
+        """
         # Playful reminder messages
         reminder_messages = [
             f"⏰ Time to check in for {habit_name}! Your future self will thank you!",
@@ -438,17 +785,17 @@ class NotificationService:
             f"⚡ Don't forget {habit_name}!",
         ]
         
-        await self.send_notification(
-            user_id=user_id,
-            notification_type=NotificationType.HABIT_REMINDER,
-            title=random.choice(title_options),
-            message=selected_message,
-            related_id=habit_id,
-            data={
+        return {
+            "user_id": user_id,
+            "notification_type": NotificationType.HABIT_REMINDER,
+            "title": random.choice(title_options),
+            "message": selected_message,
+            "related_id": habit_id,
+            "data": {
                 "habit_name": habit_name,
                 "habit_id": habit_id
             }
-        )
+        }
     
     async def send_missed_habit_notification(
         self,
@@ -464,6 +811,12 @@ class NotificationService:
             habit_id: Habit ID
             habit_name: Habit name
         """
+        await self.send_notification(**self.build_missed_habit(user_id, habit_id, habit_name))
+    
+    def build_missed_habit(self, user_id: str, habit_id: str, habit_name: str) -> Dict[str, Any]:
+        """
+        send_notification/send_many arguments for a missed check-in
+        """
         # Encouraging messages for missed habits (positive, not shaming)
         missed_messages = [
             f"💪 Oops! You missed {habit_name} yesterday. No worries - today is a fresh start!",
@@ -486,17 +839,17 @@ class NotificationService:
             f"🌟 Back on track with {habit_name}!",
         ]
         
-        await self.send_notification(
-            user_id=user_id,
-            notification_type=NotificationType.MISSED_HABIT,
-            title=random.choice(title_options),
-            message=selected_message,
-            related_id=habit_id,
-            data={
+        return {
+            "user_id": user_id,
+            "notification_type": NotificationType.MISSED_HABIT,
+            "title": random.choice(title_options),
+            "message": selected_message,
+            "related_id": habit_id,
+            "data": {
                 "habit_name": habit_name,
                 "habit_id": habit_id
             }
-        )
+        }
 
 
 # Global notification service instance
@@ -0,0 +1,289 @@
+"""
+Partnership Service
+
+Batched lookups for the partnership list endpoints: every partner/sender is fetched
+with one `$in` query (summary projection only) and habit counts per partnership with
+one `$group` aggregation, so a list costs the same round trips however long it is.
+
+Partnership stats without a query per habit:
+- Per-habit check-in and milestone counts come from one `$group` aggregation each
+- Check-in counts are also kept in a small `partnership_stats` document per partnership
+  (_id = partnership ObjectId), which POST /habits/{habit_id}/log updates with `$inc`
+  when a day flips between completed and not completed. The stats route reads that
+  document and only falls back to the aggregation when it's missing or older than
+  PARTNERSHIP_STATS_MAX_AGE_SECONDS (a safety net for logs written outside the API,
+  e.g. the seed scripts)
+
+Ending a partnership archives every live streak and deactivates the habits with a
+fixed number of writes (insert_many + update_many), in one transaction when the
+deployment supports them (replica set / sharded cluster).
+"""
+
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import os
+
+from app.models.partnership_model import PartnershipStatus
+from app.services.streak_service import StreakCalculationService
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+STATS_COLLECTION = "partnership_stats"
+
+# What the list endpoints show about the other user
+USER_SUMMARY_PROJECTION = {
+    "username": 1,
+    "email": 1,
+    "display_name": 1,
+    "profile_photo_url": 1,
+    "profile_picture": 1,
+}
+
+
+class PartnershipService:
+    """Partnership-level reads shared by the partnership routes"""
+
+    STATS_MAX_AGE_SECONDS = int(os.getenv("PARTNERSHIP_STATS_MAX_AGE_SECONDS", 86400))
+    # id(client) → whether it can run multi-document transactions
+    _transaction_support: Dict[int, bool] = {}
+
+    @staticmethod
+    def _id_variants(ids: List[str]) -> List[Any]:
+        """Both the string and ObjectId form of each id (older docs store ObjectIds)"""
+        variants: List[Any] = []
+        for value in ids:
+            variants.append(str(value))
+            if ObjectId.is_valid(str(value)):
+                variants.append(ObjectId(str(value)))
+        return variants
+
+    # ===== Partner resolution for list endpoints =====
+
+    @staticmethod
+    def partner_id_of(partnership: Dict, user_id: str) -> ObjectId:
+        """The other user's id in `partnership`"""
+        if partnership["user_id_1"] == ObjectId(user_id):
+            return partnership["user_id_2"]
+        return partnership["user_id_1"]
+
+    @staticmethod
+    async def users_by_id(db, user_ids: Iterable[Any]) -> Dict[str, Dict]:
+        """str(user_id) → user summary (USER_SUMMARY_PROJECTION), one `$in` query"""
+        oids = list({ObjectId(str(uid)) for uid in user_ids if ObjectId.is_valid(str(uid))})
+        if not oids:
+            return {}
+        users = await db.users.find(
+            {"_id": {"$in": oids}}, USER_SUMMARY_PROJECTION
+        ).to_list(length=None)
+        return {str(user["_id"]): user for user in users}
+
+    @staticmethod
+    async def habit_counts(db, partnership_ids: Iterable[Any], status: Optional[str] = None) -> Dict[str, int]:
+        """str(partnership_id) → number of habits (optionally with `status`), one aggregation"""
+        ids = [str(pid) for pid in partnership_ids]
+        if not ids:
+            return {}
+        match: Dict[str, Any] = {"partnership_id": {"$in": PartnershipService._id_variants(ids)}}
+        if status:
+            match["status"] = status
+        rows = await db.habits.aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"$toString": "$partnership_id"}, "count": {"$sum": 1}}},
+        ]).to_list(length=None)
+        return {row["_id"]: row["count"] for row in rows}
+
+    @staticmethod
+    async def resolve_partners(
+        db,
+        partnerships: List[Dict],
+        user_id: str,
+        habit_status: Optional[str] = None
+    ) -> List[Tuple[Dict, Dict, int]]:
+        """
+        (partnership, partner, habits_count) for each of `user_id`'s partnerships, in
+        order. Partnerships whose partner no longer exists are left out.
+        """
+        partner_ids = [PartnershipService.partner_id_of(p, user_id) for p in partnerships]
+        users, counts = await asyncio.gather(
+            PartnershipService.users_by_id(db, partner_ids),
+            PartnershipService.habit_counts(db, [p["_id"] for p in partnerships], habit_status),
+        )
+        resolved = []
+        for partnership, partner_id in zip(partnerships, partner_ids):
+            partner = users.get(str(partner_id))
+            if partner:
+                resolved.append((partnership, partner, counts.get(str(partnership["_id"]), 0)))
+        return resolved
+
+    # ===== Stats =====
+
+    @staticmethod
+    async def _count_by_habit(collection, habit_ids: List[str], match: Dict) -> Dict[str, int]:
+        if not habit_ids:
+            return {}
+        pipeline = [
+            {"$match": {"habit_id": {"$in": PartnershipService._id_variants(habit_ids)}, **match}},
+            {"$group": {"_id": {"$toString": "$habit_id"}, "count": {"$sum": 1}}},
+        ]
+        rows = await collection.aggregate(pipeline).to_list(length=None)
+        return {row["_id"]: row["count"] for row in rows}
+
+    @staticmethod
+    async def checkin_counts(db, habit_ids: List[str]) -> Dict[str, int]:
+        """habit_id → completed check-ins (both partners), one aggregation"""
+        return await PartnershipService._count_by_habit(db.habit_logs, habit_ids, {"completed": True})
+
+    @staticmethod
+    async def milestone_counts(db, habit_ids: List[str]) -> Dict[str, int]:
+        """habit_id → achieved milestones, one aggregation"""
+        return await PartnershipService._count_by_habit(db.milestones, habit_ids, {"is_achieved": True})
+
+    @staticmethod
+    async def rebuild_stats(db, partnership_id: str, habit_ids: List[str]) -> Dict:
+        """Recount check-ins from habit_logs and store them as the partnership's stats doc"""
+        stats = {
+            "checkins_by_habit": await PartnershipService.checkin_counts(db, habit_ids),
+            "rebuilt_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        }
+        await db[STATS_COLLECTION].update_one(
+            {"_id": ObjectId(partnership_id)}, {"$set": stats}, upsert=True
+        )
+        return stats
+
+    @staticmethod
+    async def get_stats(db, partnership_id: str, habit_ids: List[str]) -> Dict:
+        """
+        The partnership's stats doc, rebuilt first if it's missing or stale. Habits
+        missing from checkins_by_habit have no check-ins since the last rebuild.
+        """
+        stats = await db[STATS_COLLECTION].find_one({"_id": ObjectId(partnership_id)})
+        max_age = timedelta(seconds=PartnershipService.STATS_MAX_AGE_SECONDS)
+        if (
+            stats is None
+            or stats.get("rebuilt_at") is None
+            or datetime.utcnow() - stats["rebuilt_at"] > max_age
+        ):
+            return await PartnershipService.rebuild_stats(db, partnership_id, habit_ids)
+        return stats
+
+    @staticmethod
+    async def record_checkin(db, partnership_id: str, habit_id: str, delta: int) -> None:
+        """
+        Apply a check-in (+1) or an un-check (-1) to the stats doc. A missing doc is left
+        missing - the next read rebuilds it from the logs, which already include this one.
+        """
+        if not delta or not ObjectId.is_valid(str(partnership_id)):
+            return
+        await db[STATS_COLLECTION].update_one(
+            {"_id": ObjectId(partnership_id)},
+            {
+                "$inc": {f"checkins_by_habit.{habit_id}": delta},
+                "$set": {"updated_at": datetime.utcnow()},
+            }
+        )
+
+    # ===== Ending =====
+
+    @staticmethod
+    async def transactions_supported(db) -> bool:
+        """True if `db`'s deployment is a replica set or sharded cluster (cached per client)"""
+        client = db.client
+        key = id(client)
+        if key not in PartnershipService._transaction_support:
+            try:
+                hello = await client.admin.command("hello")
+                supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+            except Exception:
+                supported = False
+            PartnershipService._transaction_support[key] = supported
+        return PartnershipService._transaction_support[key]
+
+    @staticmethod
+    async def end_partnership(db, partnership: Dict, ended_reason: str = "partnership_ended") -> Dict:
+        """
+        Mark `partnership` broken, record each active habit's live streak (from `streaks`)
+        in streak_history, zero those streaks and turn the habits back into drafts.
+
+        Returns {"ended_at", "saved_streaks": [{habit_name, streak_length}], "habits_deactivated"}.
+        """
+        now = datetime.utcnow()
+
+        async def write(session=None) -> Tuple[List[Dict], List[ObjectId]]:
+            # Read inside the transaction so a concurrent check-in can't slip between the
+            # snapshot and the archive
+            habits = await db.habits.find(
+                {
+                    "partnership_id": {"$in": PartnershipService._id_variants([partnership["_id"]])},
+                    "status": "active",
+                },
+                {"habit_name": 1},
+                session=session
+            ).to_list(length=None)
+            habit_oids = [habit["_id"] for habit in habits]
+
+            live_streaks: Dict[str, Dict] = {}
+            if habit_oids:
+                streak_docs = await db.streaks.find(
+                    {"habit_id": {"$in": habit_oids}, "current_streak": {"$gt": 0}},
+                    {"habit_id": 1, "current_streak": 1, "streak_started_at": 1, "last_both_completed_date": 1},
+                    session=session
+                ).to_list(length=None)
+                live_streaks = {str(streak["habit_id"]): streak for streak in streak_docs}
+
+            records, saved_streaks = [], []
+            for habit in habits:
+                streak = live_streaks.get(str(habit["_id"]))
+                if not streak:
+                    continue
+                current = streak["current_streak"]
+                last_both = streak.get("last_both_completed_date") or now
+                records.append({
+                    "partnership_id": str(partnership["_id"]),
+                    "habit_id": str(habit["_id"]),
+                    "streak_start_date": streak.get("streak_started_at") or last_both - timedelta(days=current - 1),
+                    "streak_end_date": last_both,
+                    "streak_length_days": current,
+                    "ended_reason": ended_reason,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+                saved_streaks.append({"habit_name": habit.get("habit_name"), "streak_length": current})
+
+            if records:
+                await db.streak_history.insert_many(records, session=session)
+            if habit_oids:
+                await db.habits.update_many(
+                    {"_id": {"$in": habit_oids}},
+                    {"$set": {"is_active": False, "status": "draft"}},
+                    session=session
+                )
+                # Archived above - zeroed so the nightly streak-break job doesn't archive them again
+                await db.streaks.update_many(
+                    {"habit_id": {"$in": habit_oids}, "current_streak": {"$gt": 0}},
+                    {"$set": {"current_streak": 0, "streak_started_at": None, "updated_at": now}},
+                    session=session
+                )
+            await db.partnerships.update_one(
+                {"_id": partnership["_id"]},
+                {"$set": {"status": PartnershipStatus.BROKEN.value, "ended_at": now}},
+                session=session
+            )
+            return saved_streaks, habit_oids
+
+        if await PartnershipService.transactions_supported(db):
+            async with await db.client.start_session() as session:
+                async with session.start_transaction():
+                    saved_streaks, habit_oids = await write(session)
+        else:
+            saved_streaks, habit_oids = await write()
+
+        for habit_oid in habit_oids:
+            StreakCalculationService.invalidate_mem_cache(str(habit_oid))
+
+        if not DEMO_MODE:
+            print(f"💔 Partnership {partnership['_id']} ended: {len(saved_streaks)} streaks archived, {len(habit_oids)} habits deactivated")
+        return {"ended_at": now, "saved_streaks": saved_streaks, "habits_deactivated": len(habit_oids)}
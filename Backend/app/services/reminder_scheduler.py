@@ -0,0 +1,215 @@
+"""
+Reminder Scheduler
+
+In-process replacement for the daily cron call to /api/notifications/send-checkin-reminders:
+- Wakes every REMINDER_TICK_SECONDS and works on the current UTC hour ("slot")
+- Users are bucketed by their IANA `timezone` (missing or unknown → UTC); a slot sends
+  reminders to the buckets where it is REMINDER_LOCAL_HOUR locally, so the daily load
+  is spread across the day instead of one spike
+- One worker runs each slot: the first to insert the slot's lease document (unique _id
+  in `scheduler_leases`) wins, the others skip it. A running lease is short-lived: if
+  the slot fails, or the worker dies before finishing it, a later tick (on any worker)
+  takes the lease over and runs the slot again. Finished leases are kept for
+  LEASE_RETENTION and then removed by a TTL index (config/indexes.py)
+- Started/stopped from the app lifespan when REMINDER_SCHEDULER_ENABLED is true
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pytz
+from pymongo.errors import DuplicateKeyError
+
+from app.services.reminder_service import ReminderService
+from config.database import get_database
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+LEASE_COLLECTION = "scheduler_leases"
+LEASE_RETENTION = timedelta(days=2)
+# How long a running slot holds its lease before another tick may take it over
+LEASE_TIMEOUT = timedelta(seconds=int(os.getenv("SCHEDULER_LEASE_SECONDS", 900)))
+
+
+async def acquire_lease(db, lease_id: str, owner: str, now: Optional[datetime] = None) -> bool:
+    """
+    Claim `lease_id` for `owner`. Returns False if another worker holds it, or it has
+    already finished. A lease that expired without finishing is taken over.
+    """
+    now = now or datetime.utcnow()
+    claim = {"owner": owner, "acquired_at": now, "expires_at": now + LEASE_TIMEOUT, "status": "running"}
+    try:
+        await db[LEASE_COLLECTION].insert_one({"_id": lease_id, **claim, "attempts": 1})
+        return True
+    except DuplicateKeyError:
+        pass
+    taken = await db[LEASE_COLLECTION].find_one_and_update(
+        {"_id": lease_id, "finished_at": None, "expires_at": {"$lte": now}},
+        {"$set": claim, "$inc": {"attempts": 1}},
+    )
+    return taken is not None
+
+
+async def finish_lease(db, lease_id: str, owner: str, summary: Dict[str, Any]) -> None:
+    """Mark the lease done so no worker runs it again (kept for LEASE_RETENTION)"""
+    now = datetime.utcnow()
+    await db[LEASE_COLLECTION].update_one(
+        {"_id": lease_id, "owner": owner},
+        {"$set": {
+            "status": "finished",
+            "finished_at": now,
+            "expires_at": now + LEASE_RETENTION,
+            "summary": summary,
+        }}
+    )
+
+
+async def fail_lease(db, lease_id: str, owner: str, error: BaseException, now: Optional[datetime] = None) -> None:
+    """Give the lease up after a failed run so the next tick can retry it"""
+    await db[LEASE_COLLECTION].update_one(
+        {"_id": lease_id, "owner": owner},
+        {"$set": {"status": "failed", "expires_at": now or datetime.utcnow(), "error": str(error)}}
+    )
+
+
+def local_hour(timezone_name: Optional[str], utc_now: datetime) -> Optional[int]:
+    """Hour of day in `timezone_name` at naive-UTC `utc_now`; None if the name is unknown."""
+    try:
+        tz = pytz.timezone(timezone_name or "UTC")
+    except pytz.UnknownTimeZoneError:
+        return None
+    return pytz.utc.localize(utc_now).astimezone(tz).hour
+
+
+def due_timezones(timezone_names: List[Optional[str]], utc_now: datetime, reminder_hour: int) -> List[str]:
+    """
+    The timezone names whose local hour at `utc_now` is `reminder_hour`. Unknown names
+    are bucketed with UTC, the same fallback as StreakCalculationService.get_today_in_timezone.
+    """
+    utc_due = local_hour("UTC", utc_now) == reminder_hour
+    due = []
+    for name in timezone_names:
+        if not name:
+            continue
+        hour = local_hour(name, utc_now)
+        if hour == reminder_hour or (hour is None and utc_due):
+            due.append(name)
+    if utc_due and "UTC" not in due:
+        due.append("UTC")
+    return due
+
+
+class ReminderScheduler:
+    """Hourly, lease-guarded, timezone-bucketed check-in reminders"""
+
+    def __init__(
+        self,
+        get_db: Callable,
+        reminder_hour: int = 9,
+        tick_seconds: float = 60.0
+    ):
+        self.get_db = get_db
+        self.reminder_hour = reminder_hour
+        self.tick_seconds = tick_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._task: Optional[asyncio.Task] = None
+        self._last_slot: Optional[datetime] = None
+        self._skipped_slot: Optional[datetime] = None
+        self._counters: Dict[str, int] = {"slots_run": 0, "slots_skipped": 0, "reminders_sent": 0, "errors": 0}
+        self._last_run: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        """Start the tick loop (call from lifespan startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="reminder-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "running": self.running,
+            "reminder_hour": self.reminder_hour,
+            "last_run": self._last_run,
+        }
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counters["errors"] += 1
+                if not DEMO_MODE:
+                    print(f"❌ Reminder scheduler tick failed: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def tick(self, utc_now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Run the current hour's slot if no worker has yet. Returns the run summary,
+        or None if this worker didn't run it.
+
+        The slot only counts as done here once it succeeded; until then every tick
+        tries the lease again, so a failed or abandoned run is retried within the hour.
+        """
+        utc_now = utc_now or datetime.utcnow()
+        slot = utc_now.replace(minute=0, second=0, microsecond=0)
+        if slot == self._last_slot:
+            return None
+
+        db = self.get_db()
+        lease_id = f"checkin_reminders:{slot:%Y-%m-%dT%H}"
+        if not await acquire_lease(db, lease_id, self.owner, utc_now):
+            if slot != self._skipped_slot:
+                self._skipped_slot = slot
+                self._counters["slots_skipped"] += 1
+            return None
+
+        try:
+            timezones, summary = await self.run_slot(db, slot)
+        except Exception as e:
+            await fail_lease(db, lease_id, self.owner, e, utc_now)
+            raise
+        self._last_slot = slot
+        self._counters["slots_run"] += 1
+        self._counters["reminders_sent"] += summary.get("inserted", 0)
+        self._last_run = {"slot": slot.isoformat(), "timezones": len(timezones), **summary}
+        await finish_lease(db, lease_id, self.owner, self._last_run)
+        return self._last_run
+
+    async def run_slot(self, db, slot: datetime) -> Tuple[List[str], Dict[str, Any]]:
+        """Send reminders to every timezone bucket that is at the reminder hour in `slot`"""
+        timezone_names = await db.users.distinct("timezone")
+        timezones = due_timezones(timezone_names, slot, self.reminder_hour)
+        if not timezones:
+            return timezones, {}
+
+        # Check-ins are logged per UTC day, so "today" is the UTC date of the slot
+        today = slot.replace(hour=0)
+        summary = await ReminderService.send_checkin_reminders(db, today=today, timezones=timezones)
+        if not DEMO_MODE:
+            print(f"⏰ Reminder slot {slot:%Y-%m-%d %H}:00 UTC → {timezones}: {summary.get('inserted', 0)} sent")
+        return timezones, summary
+
+
+# Global scheduler instance
+reminder_scheduler = ReminderScheduler(
+    get_db=get_database,
+    reminder_hour=int(os.getenv("REMINDER_LOCAL_HOUR", 9)),
+    tick_seconds=float(os.getenv("REMINDER_TICK_SECONDS", 60)),
+)
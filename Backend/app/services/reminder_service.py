@@ -0,0 +1,168 @@
+"""
+Reminder Service
+
+Finds every (user, habit) pair still missing today's check-in with one aggregation:
+
+    active habits → their active partnership → both partners → today's completed log
+
+and streams the pairs in batches into NotificationService.send_many. Nothing is
+materialized beyond one batch, so memory stays bounded regardless of how many habits
+there are (no $group/$sort in the pipeline, and allowDiskUse covers the lookups).
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import os
+import time
+
+from app.services.notification_service import notification_service
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+
+class ReminderService:
+    """Set-based check-in reminder job"""
+
+    BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", 1000))
+
+    @staticmethod
+    def missing_checkin_pipeline(
+        today: datetime,
+        habit_filter: Optional[Dict] = None,
+        timezones: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Aggregation over `habits` yielding {user_id, habit_id, habit_name} for every
+        partner of an active habit without a completed log for `today` (midnight UTC).
+
+        Ids come out as strings, the shape POST /habits/{habit_id}/log stores in
+        habit_logs. With `timezones`, only users whose `timezone` is one of them are
+        included (users without one count as "UTC").
+        """
+        match: Dict[str, Any] = {"status": "active", "partnership_id": {"$nin": [None, ""]}}
+        if habit_filter:
+            match.update(habit_filter)
+
+        return [
+            {"$match": match},
+            {"$project": {
+                "habit_name": 1,
+                # habits store partnership_id as a string (older docs as an ObjectId)
+                "partnership_oid": {"$convert": {
+                    "input": "$partnership_id", "to": "objectId", "onError": None, "onNull": None
+                }},
+            }},
+            {"$lookup": {
+                "from": "partnerships",
+                "localField": "partnership_oid",
+                "foreignField": "_id",
+                "pipeline": [
+                    {"$match": {"status": "active"}},
+                    {"$project": {"user_id_1": 1, "user_id_2": 1}},
+                ],
+                "as": "partnership",
+            }},
+            {"$unwind": "$partnership"},
+            {"$project": {
+                "_id": 0,
+                "habit_id": {"$toString": "$_id"},
+                "habit_name": 1,
+                "user_oid": ["$partnership.user_id_1", "$partnership.user_id_2"],
+            }},
+            {"$unwind": "$user_oid"},
+            *ReminderService._timezone_stages(timezones),
+            {"$addFields": {"user_id": {"$toString": "$user_oid"}}},
+            {"$lookup": {
+                "from": "habit_logs",
+                "localField": "habit_id",
+                "foreignField": "habit_id",
+                "let": {"user_id": "$user_id"},
+                "pipeline": [
+                    {"$match": {
+                        "log_date": today,
+                        "completed": True,
+                        "$expr": {"$eq": ["$user_id", "$$user_id"]},
+                    }},
+                    {"$limit": 1},
+                    {"$project": {"_id": 1}},
+                ],
+                "as": "checked_in",
+            }},
+            {"$match": {"checked_in": []}},
+            {"$project": {"checked_in": 0, "user_oid": 0}},
+        ]
+
+    @staticmethod
+    def _timezone_stages(timezones: Optional[List[str]]) -> List[Dict]:
+        """Stages keeping only partners whose timezone is in `timezones` (none → no filter)"""
+        if timezones is None:
+            return []
+        zones: List[Any] = list(timezones)
+        if "UTC" in zones:
+            zones.extend([None, ""])  # matches a missing/null/empty timezone too
+        return [
+            {"$lookup": {
+                "from": "users",
+                "localField": "user_oid",
+                "foreignField": "_id",
+                "pipeline": [
+                    {"$match": {"timezone": {"$in": zones}}},
+                    {"$project": {"_id": 1}},
+                ],
+                "as": "in_zone",
+            }},
+            {"$match": {"in_zone": {"$ne": []}}},
+            {"$project": {"in_zone": 0}},
+        ]
+
+    @staticmethod
+    async def send_checkin_reminders(
+        db,
+        today: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+        habit_filter: Optional[Dict] = None,
+        timezones: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Send a reminder to everyone who hasn't checked in today, batch by batch.
+
+        Returns the summed send_many counts plus pairs found, batches and throughput.
+        """
+        today = today or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        batch_size = batch_size or ReminderService.BATCH_SIZE
+        summary = {
+            "pairs": 0, "batches": 0,
+            "requested": 0, "blocked": 0, "inserted": 0, "failed": 0, "delivered": 0,
+        }
+        started = time.perf_counter()
+
+        async def flush(batch: List[Dict]):
+            result = await notification_service.send_many(batch, db=db)
+            for key, value in result.items():
+                summary[key] += value
+            summary["batches"] += 1
+
+        batch: List[Dict] = []
+        cursor = db.habits.aggregate(
+            ReminderService.missing_checkin_pipeline(today, habit_filter, timezones),
+            allowDiskUse=True,
+            batchSize=batch_size,
+        )
+        async for pair in cursor:
+            summary["pairs"] += 1
+            batch.append(notification_service.build_habit_reminder(
+                pair["user_id"], pair["habit_id"], pair.get("habit_name") or "your habit"
+            ))
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+
+        seconds = time.perf_counter() - started
+        summary["seconds"] = round(seconds, 3)
+        summary["pairs_per_second"] = round(summary["pairs"] / seconds, 1) if seconds else 0.0
+        if not DEMO_MODE:
+            print(f"⏰ Check-in reminders: {summary}")
+        return summary
@@ -0,0 +1,266 @@
+"""
+Nightly streak-break job
+
+Streaks are only advanced on check-in, so a streak whose partners stopped checking in
+keeps its old current_streak until something resets it. This job does that for every
+habit at once:
+
+1. One aggregation over `streaks` finds live streaks (current_streak > 0) whose
+   last_both_completed_date is before yesterday, i.e. yesterday wasn't completed by both
+   partners, joined with the habit name, the partners and who did check in yesterday
+2. Per batch, the streaks are zeroed concurrently, each update guarded on the values
+   read so a concurrent check-in wins; one bulk_write records the runs that were actually
+   reset in streak_history
+3. Missed-habit notifications for those resets' partners who didn't check in go onto
+   the background job queue
+
+After it runs, the persisted streaks are current and reads don't need to recompute.
+Runs once per UTC day after STREAK_BREAK_UTC_HOUR, guarded by a scheduler lease
+(see app/services/reminder_scheduler.py); a failed run is retried by a later tick.
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from typing import Any, Dict, List, Optional
+
+from pymongo import InsertOne
+
+from app.services.dashboard_service import DashboardService
+from app.services.job_queue import job_queue
+from app.services.notification_service import notification_service
+from app.services.reminder_scheduler import acquire_lease, fail_lease, finish_lease
+from app.services.streak_service import StreakCalculationService
+from config.database import get_database
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+
+class StreakBreakJob:
+    """Finds and resets every streak broken by a missed day"""
+
+    BATCH_SIZE = int(os.getenv("STREAK_BREAK_BATCH_SIZE", 1000))
+    # Guarded reset updates in flight at once within a batch
+    RESET_CONCURRENCY = int(os.getenv("STREAK_BREAK_RESET_CONCURRENCY", 50))
+
+    def __init__(self, get_db=get_database, run_hour: int = 0, tick_seconds: float = 300.0):
+        self.get_db = get_db
+        self.run_hour = run_hour
+        self.tick_seconds = tick_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+        self._last_day: Optional[date] = None
+        self._last_run: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def broken_streaks_pipeline(yesterday: date) -> List[Dict]:
+        """Streaks still counting a run that yesterday's missed check-in ended"""
+        yesterday_dt = datetime.combine(yesterday, dt_time.min)
+        return [
+            {"$match": {
+                "last_both_completed_date": {"$lt": yesterday_dt},
+                "current_streak": {"$gt": 0},
+            }},
+            {"$lookup": {
+                "from": "habits",
+                "localField": "habit_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"habit_name": 1, "status": 1}}],
+                "as": "habit",
+            }},
+            {"$lookup": {
+                "from": "partnerships",
+                "localField": "partnership_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"user_id_1": 1, "user_id_2": 1}}],
+                "as": "partnership",
+            }},
+            {"$addFields": {"habit_id_str": {"$toString": "$habit_id"}}},
+            {"$lookup": {
+                # habit_logs store string ids (see POST /habits/{habit_id}/log)
+                "from": "habit_logs",
+                "localField": "habit_id_str",
+                "foreignField": "habit_id",
+                "pipeline": [
+                    {"$match": {"log_date": yesterday_dt, "completed": True}},
+                    {"$project": {"_id": 0, "user_id": 1}},
+                ],
+                "as": "checked_in_yesterday",
+            }},
+            {"$project": {
+                "habit_id": 1,
+                "partnership_id": 1,
+                "current_streak": 1,
+                "streak_started_at": 1,
+                "last_both_completed_date": 1,
+                "habit": {"$first": "$habit"},
+                "partnership": {"$first": "$partnership"},
+                "checked_in_yesterday": "$checked_in_yesterday.user_id",
+            }},
+        ]
+
+    @staticmethod
+    async def run(db, today: Optional[date] = None, batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Reset every streak broken before `today` (default: today, UTC).
+
+        Returns counts: found, reset, history_written, notifications, batches, seconds.
+        """
+        today = today or datetime.utcnow().date()
+        batch_size = batch_size or StreakBreakJob.BATCH_SIZE
+        summary = {"found": 0, "reset": 0, "history_written": 0, "notifications": 0, "batches": 0}
+        started = time.perf_counter()
+
+        batch: List[Dict] = []
+        cursor = db.streaks.aggregate(
+            StreakBreakJob.broken_streaks_pipeline(today - timedelta(days=1)),
+            allowDiskUse=True,
+            batchSize=batch_size,
+        )
+        async for streak in cursor:
+            summary["found"] += 1
+            batch.append(streak)
+            if len(batch) >= batch_size:
+                await StreakBreakJob._apply_batch(db, batch, summary)
+                batch = []
+        if batch:
+            await StreakBreakJob._apply_batch(db, batch, summary)
+
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        if not DEMO_MODE:
+            print(f"💔 Streak breaks for {today}: {summary}")
+        return summary
+
+    @staticmethod
+    async def _reset(db, streak: Dict, now: datetime, limit: asyncio.Semaphore) -> bool:
+        """Zero one streak, only if nothing changed since the aggregation read it"""
+        async with limit:
+            result = await db.streaks.update_one(
+                {
+                    "_id": streak["_id"],
+                    "current_streak": streak["current_streak"],
+                    "last_both_completed_date": streak["last_both_completed_date"],
+                },
+                {"$set": {"current_streak": 0, "streak_started_at": None, "updated_at": now}},
+            )
+        return result.modified_count > 0
+
+    @staticmethod
+    async def _apply_batch(db, streaks: List[Dict], summary: Dict[str, Any]) -> None:
+        now = datetime.utcnow()
+        limit = asyncio.Semaphore(StreakBreakJob.RESET_CONCURRENCY)
+        applied = await asyncio.gather(*[StreakBreakJob._reset(db, streak, now, limit) for streak in streaks])
+        # A concurrent check-in won for the others: their run didn't end, so nothing to record
+        reset = [streak for streak, ok in zip(streaks, applied) if ok]
+        summary["reset"] += len(reset)
+        summary["batches"] += 1
+        if not reset:
+            return
+
+        history, missed, affected_users = [], [], set()
+        for streak in reset:
+            current = streak["current_streak"]
+            last_both = streak["last_both_completed_date"]
+            history.append(InsertOne({
+                "partnership_id": str(streak["partnership_id"]),
+                "habit_id": str(streak["habit_id"]),
+                "streak_start_date": streak.get("streak_started_at") or last_both - timedelta(days=current - 1),
+                "streak_end_date": last_both,
+                "streak_length_days": current,
+                "ended_reason": "missed_day",
+                "created_at": now,
+                "updated_at": now,
+            }))
+            StreakCalculationService.invalidate_mem_cache(str(streak["habit_id"]))
+
+            habit = streak.get("habit") or {}
+            partnership = streak.get("partnership")
+            if not partnership:
+                continue
+            affected_users.update((partnership["user_id_1"], partnership["user_id_2"]))
+            if habit.get("status", "active") == "active":
+                checked_in = {str(uid) for uid in streak.get("checked_in_yesterday", [])}
+                for user_id in (str(partnership["user_id_1"]), str(partnership["user_id_2"])):
+                    if user_id not in checked_in:
+                        missed.append(notification_service.build_missed_habit(
+                            user_id, str(streak["habit_id"]), habit.get("habit_name") or "your habit"
+                        ))
+
+        result = await db.streak_history.bulk_write(history, ordered=False)
+        summary["history_written"] += result.inserted_count
+        # Home screens show the streaks that were just reset
+        await DashboardService.mark_stale(db, affected_users)
+
+        if missed:
+            summary["notifications"] += len(missed)
+            await job_queue.enqueue(
+                notification_service.send_many, missed, db=db, job_name="missed_habit_notifications"
+            )
+
+    # ===== Scheduling =====
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        """Start the daily loop (call from lifespan startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="streak-break-job")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"running": self.running, "run_hour": self.run_hour, "last_run": self._last_run}
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not DEMO_MODE:
+                    print(f"❌ Streak break job failed: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def tick(self, utc_now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Run today's job once it's past run_hour, if no worker has yet. A failed or
+        abandoned run releases (or outlives) its lease and is retried by a later tick.
+        """
+        utc_now = utc_now or datetime.utcnow()
+        today = utc_now.date()
+        if utc_now.hour < self.run_hour or today == self._last_day:
+            return None
+
+        db = self.get_db()
+        lease_id = f"streak_breaks:{today.isoformat()}"
+        if not await acquire_lease(db, lease_id, self.owner, utc_now):
+            return None
+
+        try:
+            summary = await StreakBreakJob.run(db, today)
+        except Exception as e:
+            await fail_lease(db, lease_id, self.owner, e, utc_now)
+            raise
+        self._last_day = today
+        self._last_run = {"day": today.isoformat(), **summary}
+        await finish_lease(db, lease_id, self.owner, self._last_run)
+        return self._last_run
+
+
+# Global job instance
+streak_break_job = StreakBreakJob(
+    run_hour=int(os.getenv("STREAK_BREAK_UTC_HOUR", 0)),
+    tick_seconds=float(os.getenv("STREAK_BREAK_TICK_SECONDS", 300)),
+)
@@ -10,19 +10,33 @@ Handles streak calculation logic with the following design:
 
 from datetime import datetime, timedelta, timezone, date, time
 import asyncio
+from contextlib import asynccontextmanager
 from bson import ObjectId
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, List, Tuple
+import os
 import pytz
 
+from app.services.cache import CacheBackend, build_cache_backend
+
 
 class StreakCalculationService:
     """Service for calculating and managing habit streaks"""
-    # In-process hashmap cache (per worker process). This is OPTIONAL.
+    # Per-worker memory cache. This is OPTIONAL. The backend is pluggable via
+    # CACHE_INVALIDATION_BACKEND so invalidations can reach other workers (see app/services/cache.py).
     # Key: habit_id (str) → {"data": Dict, "expires_at": datetime}
-    streak_mem_cache: Dict[str, Dict] = {}
-    CACHE_TTL_SECONDS: int = 60
-    # Per-habit recompute locks to avoid concurrent recomputes/upserts (thundering herd)
+    # Bounded LRU: expired entries are purged lazily, hits/misses/evictions are in cache_stats()
+    CACHE_TTL_SECONDS: int = int(os.getenv("STREAK_CACHE_TTL_SECONDS", 60))
+    streak_mem_cache: CacheBackend = build_cache_backend(
+        "streaks",
+        max_entries=int(os.getenv("STREAK_CACHE_MAX_ENTRIES", 10000)),
+        default_ttl_seconds=CACHE_TTL_SECONDS,
+    )
+    # Per-habit recompute locks to avoid concurrent recomputes/upserts (thundering herd).
+    # A lock only lives while someone holds or waits on it (refcounted in _recompute_lock_users).
     _recompute_locks: Dict[str, asyncio.Lock] = {}
+    _recompute_lock_users: Dict[str, int] = {}
+    # Conditional writes tried on a check-in before giving up and recomputing from logs
+    CHECKIN_WRITE_ATTEMPTS: int = 3
     
     @staticmethod
     async def calculate_streak_for_habit(
@@ -46,7 +60,11 @@ class StreakCalculationService:
         
         # Use the layered cache: in-memory → Mongo streaks → recompute fallback
         data = await StreakCalculationService.get_streak_cached(db, habit_id, partnership_id)
-        # Map to the legacy response fields expected by callers of this method
+        return StreakCalculationService.to_legacy_streak_fields(data)
+
+    @staticmethod
+    def to_legacy_streak_fields(data: Dict) -> Dict:
+        """Map cached streak data to the response fields returned by calculate_streak_for_habit."""
         today = date.today()
         is_on_track = data.get("last_both_completed_date") == today
         return {
@@ -67,7 +85,8 @@ class StreakCalculationService:
         """
         Check if a day was missed and reset streak if necessary.
         
-        This should be called daily (e.g., via scheduled task) to detect missed days.
+        Checks a single habit; the nightly StreakBreakJob (app/services/streak_break_job.py)
+        resets every broken streak at once.
         """
         partnership = await db.partnerships.find_one({"_id": ObjectId(partnership_id)})
         habit = await db.habits.find_one({"_id": ObjectId(habit_id)})
@@ -157,33 +176,133 @@ class StreakCalculationService:
             return datetime.utcnow().date()
 
     # ===== New cache-aware helpers =====
+    @staticmethod
+    def _streak_doc_to_data(streak: Dict) -> Dict:
+        """Map a persisted `streaks` document to the cached streak data shape."""
+        return {
+            "current_streak": streak.get("current_streak", 0),
+            "longest_streak": streak.get("longest_streak", 0),
+            "streak_started_at": streak.get("streak_started_at"),
+            "last_both_completed_date": streak.get("last_both_completed_date"),
+            "updated_at": streak.get("updated_at"),
+        }
+
+    @staticmethod
+    def _cache_streak(habit_id: str, data: Dict) -> None:
+        """Store streak data in the memory cache for CACHE_TTL_SECONDS."""
+        ttl = StreakCalculationService.CACHE_TTL_SECONDS
+        StreakCalculationService.streak_mem_cache.set(
+            habit_id,
+            {"data": data, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)},
+            ttl_seconds=ttl,
+        )
+
+    @staticmethod
+    @asynccontextmanager
+    async def _recompute_lock(habit_id: str):
+        """Hold the per-habit recompute lock; the lock is dropped once nobody needs it."""
+        locks = StreakCalculationService._recompute_locks
+        users = StreakCalculationService._recompute_lock_users
+        lock = locks.setdefault(habit_id, asyncio.Lock())
+        users[habit_id] = users.get(habit_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            users[habit_id] -= 1
+            if users[habit_id] == 0:
+                del users[habit_id]
+                del locks[habit_id]
+
+    @staticmethod
+    def cache_stats() -> Dict:
+        """Memory cache counters (hits, misses, evictions, size) for sizing in production."""
+        return {
+            **StreakCalculationService.streak_mem_cache.stats(),
+            "recompute_locks": len(StreakCalculationService._recompute_locks),
+        }
+
     @staticmethod
     async def get_streak_cached(db, habit_id: str, partnership_id: str) -> Dict:
-        """Layered cache: in-memory hashmap (short TTL) → Mongo streaks → recompute."""
-        now = datetime.utcnow()
+        """Layered cache: in-memory LRU (short TTL) → Mongo streaks → recompute."""
         cached = StreakCalculationService.streak_mem_cache.get(habit_id)
-        if cached and cached["expires_at"] > now:
+        if cached and cached["expires_at"] > datetime.utcnow():
             return cached["data"]
 
         # Persistent cache in Mongo
         streak = await db.streaks.find_one({"habit_id": ObjectId(habit_id)})
         if streak:
-            data = {
-                "current_streak": streak.get("current_streak", 0),
-                "longest_streak": streak.get("longest_streak", 0),
-                "streak_started_at": streak.get("streak_started_at"),
-                "last_both_completed_date": streak.get("last_both_completed_date"),
-                "updated_at": streak.get("updated_at"),
-            }
-            StreakCalculationService.streak_mem_cache[habit_id] = {
-                "data": data,
-                "expires_at": now + timedelta(seconds=StreakCalculationService.CACHE_TTL_SECONDS),
-            }
+            data = StreakCalculationService._streak_doc_to_data(streak)
+            StreakCalculationService._cache_streak(habit_id, data)
             return data
 
-        # Cold start: recompute and persist with per-habit lock (double-checked)
-        lock = StreakCalculationService._recompute_locks.setdefault(habit_id, asyncio.Lock())
-        async with lock:
+        return await StreakCalculationService._recompute_and_cache(db, habit_id, partnership_id)
+
+    @staticmethod
+    async def get_streaks_cached_many(
+        db,
+        habit_ids: List[str],
+        partnership_ids: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Dict]:
+        """
+        Batched get_streak_cached for multi-habit views.
+
+        Serves what it can from memory, fetches the rest with one `$in` query on
+        `streaks`, and recomputes any leftover misses concurrently. Pass
+        `partnership_ids` (habit_id → partnership_id) when the caller already has the
+        habit docs; otherwise they're looked up only if a recompute is needed.
+
+        Returns {habit_id: streak data}; habits that can't be resolved are left out.
+        """
+        results: Dict[str, Dict] = {}
+        now = datetime.utcnow()
+        misses = []
+        for habit_id in dict.fromkeys(habit_ids):
+            cached = StreakCalculationService.streak_mem_cache.get(habit_id)
+            if cached and cached["expires_at"] > now:
+                results[habit_id] = cached["data"]
+            else:
+                misses.append(habit_id)
+        if not misses:
+            return results
+
+        # Persistent cache in Mongo, one round trip for every miss
+        streak_docs = await db.streaks.find(
+            {"habit_id": {"$in": [ObjectId(habit_id) for habit_id in misses]}}
+        ).to_list(length=None)
+        for streak in streak_docs:
+            habit_id = str(streak["habit_id"])
+            data = StreakCalculationService._streak_doc_to_data(streak)
+            StreakCalculationService._cache_streak(habit_id, data)
+            results[habit_id] = data
+
+        cold = [habit_id for habit_id in misses if habit_id not in results]
+        if not cold:
+            return results
+
+        partnership_ids = dict(partnership_ids or {})
+        unknown = [habit_id for habit_id in cold if not partnership_ids.get(habit_id)]
+        if unknown:
+            habits = await db.habits.find(
+                {"_id": {"$in": [ObjectId(habit_id) for habit_id in unknown]}},
+                {"partnership_id": 1}
+            ).to_list(length=None)
+            for habit in habits:
+                if habit.get("partnership_id"):
+                    partnership_ids[str(habit["_id"])] = str(habit["partnership_id"])
+
+        cold = [habit_id for habit_id in cold if partnership_ids.get(habit_id)]
+        recomputed = await asyncio.gather(*[
+            StreakCalculationService._recompute_and_cache(db, habit_id, partnership_ids[habit_id])
+            for habit_id in cold
+        ])
+        results.update(zip(cold, recomputed))
+        return results
+
+    @staticmethod
+    async def _recompute_and_cache(db, habit_id: str, partnership_id: str) -> Dict:
+        """Cold start: recompute and persist with per-habit lock (double-checked)."""
+        async with StreakCalculationService._recompute_lock(habit_id):
             # Recheck memory inside lock
             cached2 = StreakCalculationService.streak_mem_cache.get(habit_id)
             if cached2 and cached2["expires_at"] > datetime.utcnow():
@@ -191,30 +310,159 @@ class StreakCalculationService:
             # Recheck persistent cache inside lock
             streak2 = await db.streaks.find_one({"habit_id": ObjectId(habit_id)})
             if streak2:
-                data2 = {
-                    "current_streak": streak2.get("current_streak", 0),
-                    "longest_streak": streak2.get("longest_streak", 0),
-                    "streak_started_at": streak2.get("streak_started_at"),
-                    "last_both_completed_date": streak2.get("last_both_completed_date"),
-                    "updated_at": streak2.get("updated_at"),
-                }
-                StreakCalculationService.streak_mem_cache[habit_id] = {
-                    "data": data2,
-                    "expires_at": datetime.utcnow() + timedelta(seconds=StreakCalculationService.CACHE_TTL_SECONDS),
-                }
+                data2 = StreakCalculationService._streak_doc_to_data(streak2)
+                StreakCalculationService._cache_streak(habit_id, data2)
                 return data2
 
             data = await StreakCalculationService.recompute_streak_from_logs(db, habit_id, partnership_id)
             await StreakCalculationService.upsert_streaks(db, habit_id, partnership_id, data)
-            StreakCalculationService.streak_mem_cache[habit_id] = {
-                "data": data,
-                "expires_at": datetime.utcnow() + timedelta(seconds=StreakCalculationService.CACHE_TTL_SECONDS),
-            }
+            StreakCalculationService._cache_streak(habit_id, data)
             return data
 
+    @staticmethod
+    def _as_date(value) -> Optional[date]:
+        """Normalize a stored streak date (Mongo hands back datetimes) to a date."""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return None
+
+    @staticmethod
+    def _as_datetime(value):
+        """Dates are stored as midnight datetimes (MongoDB has no plain date type)."""
+        # datetime is a subclass of date, so it has to be excluded explicitly
+        if isinstance(value, date) and not isinstance(value, datetime):
+            return datetime.combine(value, time.min)
+        return value
+
+    @staticmethod
+    def apply_checkin_to_streak(
+        state: Optional[Dict],
+        log_date: date,
+        both_completed: bool
+    ) -> Optional[Dict]:
+        """
+        Derive the next streak state from the persisted one and a single day's outcome.
+
+        `both_completed` says whether both partners have a completed log for `log_date`.
+        Returns None when the change can't be applied incrementally (no persisted state,
+        a back-dated log, or un-checking a day that was already counted); callers should
+        fall back to recompute_streak_from_logs in that case.
+        """
+        if state is None:
+            return None
+
+        last_both = StreakCalculationService._as_date(state.get("last_both_completed_date"))
+        current = state.get("current_streak", 0) or 0
+        longest = state.get("longest_streak", 0) or 0
+        started = StreakCalculationService._as_date(state.get("streak_started_at"))
+
+        if last_both is not None and log_date < last_both:
+            return None
+
+        if not both_completed:
+            if last_both == log_date:
+                # The day was counted and is now incomplete - the run has to be rebuilt
+                return None
+            return {**state, "updated_at": datetime.utcnow()}
+
+        if last_both == log_date:
+            # Day already counted (e.g. a repeated check-in)
+            return {**state, "updated_at": datetime.utcnow()}
+
+        if last_both == log_date - timedelta(days=1) and current > 0:
+            current += 1
+            started = started or (log_date - timedelta(days=current - 1))
+        else:
+            current = 1
+            started = log_date
+
+        return {
+            "current_streak": current,
+            "longest_streak": max(longest, current),
+            "streak_started_at": started,
+            "last_both_completed_date": log_date,
+            "updated_at": datetime.utcnow(),
+        }
+
+    @staticmethod
+    async def update_streak_on_checkin(
+        db,
+        habit_id: str,
+        partnership_id: str,
+        log_date: date,
+        both_completed: bool,
+        streak_doc: Optional[Dict]
+    ) -> Dict:
+        """
+        Incremental streak update for a single check-in.
+
+        `streak_doc` is the habit's persisted `streaks` document (None if it has none yet);
+        the check-in pipeline loads it up front alongside the habit. Applies the day's
+        outcome in O(1), falling back to the full recompute from habit_logs only when the
+        incremental path can't be applied.
+
+        The doc may be stale by the time we write (the partner's check-in can complete the
+        day concurrently), so an incremental result is only written if the stored streak
+        still matches what it was derived from; otherwise the doc is re-read and the day
+        applied again. A check-in that doesn't change the streak writes nothing.
+        """
+        for _ in range(StreakCalculationService.CHECKIN_WRITE_ATTEMPTS):
+            state = StreakCalculationService._streak_doc_to_data(streak_doc) if streak_doc else None
+            data = StreakCalculationService.apply_checkin_to_streak(state, log_date, both_completed)
+            if data is None:
+                break
+            if StreakCalculationService._same_streak(state, data):
+                return state
+            if await StreakCalculationService._write_streak_if_unchanged(db, habit_id, streak_doc, data):
+                StreakCalculationService.invalidate_mem_cache(habit_id)
+                return data
+            streak_doc = await db.streaks.find_one({"habit_id": ObjectId(habit_id)})
+
+        # No usable state, or the doc kept moving under us: rebuild from the logs
+        data = await StreakCalculationService.recompute_streak_from_logs(db, habit_id, partnership_id)
+        await StreakCalculationService.upsert_streaks(db, habit_id, partnership_id, data)
+        StreakCalculationService.invalidate_mem_cache(habit_id)
+        return data
+
+    @staticmethod
+    def _same_streak(state: Dict, data: Dict) -> bool:
+        """True when `data` changes nothing but updated_at."""
+        return all(
+            StreakCalculationService._as_date(state.get(field)) == StreakCalculationService._as_date(data.get(field))
+            if field in ("streak_started_at", "last_both_completed_date")
+            else (state.get(field) or 0) == (data.get(field) or 0)
+            for field in ("current_streak", "longest_streak", "streak_started_at", "last_both_completed_date")
+        )
+
+    @staticmethod
+    async def _write_streak_if_unchanged(db, habit_id: str, streak_doc: Dict, data: Dict) -> bool:
+        """Write `data` only if the stored streak is still the one `streak_doc` was read as."""
+        result = await db.streaks.update_one(
+            {
+                "habit_id": ObjectId(habit_id),
+                "current_streak": streak_doc.get("current_streak"),
+                "last_both_completed_date": streak_doc.get("last_both_completed_date"),
+            },
+            {"$set": {
+                "current_streak": data["current_streak"],
+                "longest_streak": data["longest_streak"],
+                "streak_started_at": StreakCalculationService._as_datetime(data.get("streak_started_at")),
+                "last_both_completed_date": StreakCalculationService._as_datetime(data.get("last_both_completed_date")),
+                "updated_at": data.get("updated_at", datetime.utcnow()),
+            }},
+        )
+        return result.matched_count > 0
+
     @staticmethod
     async def recompute_streak_from_logs(db, habit_id: str, partnership_id: str) -> Dict:
-        """Recompute streak purely from habit_logs (source of truth)."""
+        """
+        Recompute streak purely from habit_logs (source of truth).
+
+        Scans every completed log for the habit, so it's the repair path - check-ins go
+        through update_streak_on_checkin instead.
+        """
         partnership = await db.partnerships.find_one({"_id": ObjectId(partnership_id)})
         if not partnership:
             return {"current_streak": 0, "longest_streak": 0, "streak_started_at": None, "last_both_completed_date": None, "updated_at": datetime.utcnow()}
@@ -286,16 +534,9 @@ class StreakCalculationService:
 
     @staticmethod
     async def upsert_streaks(db, habit_id: str, partnership_id: str, data: Dict) -> None:
-        # Convert date objects to datetime objects for MongoDB compatibility
-        # Note: datetime is a subclass of date, so we need to explicitly exclude datetime objects
-        streak_started_at = data.get("streak_started_at")
-        if isinstance(streak_started_at, date) and not isinstance(streak_started_at, datetime):
-            streak_started_at = datetime.combine(streak_started_at, time.min)
-        
-        last_both_completed_date = data.get("last_both_completed_date")
-        if isinstance(last_both_completed_date, date) and not isinstance(last_both_completed_date, datetime):
-            last_both_completed_date = datetime.combine(last_both_completed_date, time.min)
-        
+        streak_started_at = StreakCalculationService._as_datetime(data.get("streak_started_at"))
+        last_both_completed_date = StreakCalculationService._as_datetime(data.get("last_both_completed_date"))
+
         await db.streaks.update_one(
             {"habit_id": ObjectId(habit_id)},
             {"$set": {
@@ -312,4 +553,5 @@ class StreakCalculationService:
 
     @staticmethod
     def invalidate_mem_cache(habit_id: str) -> None:
-        StreakCalculationService.streak_mem_cache.pop(habit_id, None)
+        """Drop the habit's cached streak in this worker and, if configured, all the others."""
+        StreakCalculationService.streak_mem_cache.invalidate(habit_id)
@@ -3,12 +3,18 @@ WebSocket Connection Manager
 
 - Manages the real-time WebSocket connections for push notifs
 - Handles connection lifecycle and message broadcasting to connected users
+- Sends time out after WEBSOCKET_SEND_TIMEOUT_SECONDS so one slow client can't hold
+  up a fan-out; multi-user sends run concurrently
 """
 
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict
+from typing import Dict, List, Tuple
 from datetime import datetime
 from bson import ObjectId
+import asyncio
+import os
+
+SEND_TIMEOUT_SECONDS = float(os.getenv("WEBSOCKET_SEND_TIMEOUT_SECONDS", 2))
 
 class ConnectionManager:
     """Manages WebSocket connections for real-time notifications"""
@@ -39,24 +45,60 @@ class ConnectionManager:
             del self.active_connections[user_id]
             print(f"❌ User {user_id} disconnected from WebSocket")
     
-    async def send_notification(self, user_id: str, message: dict):
+    async def send_notification(self, user_id: str, message: dict) -> bool:
         """
         Send a notification to a specific user if connected
         
         takes in:
             user_id: Target user's ID
             message: Notif message dictionary
+        
+        Returns True if the message was delivered
         """
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_json(message)
-                print(f"📤 Notification sent to user {user_id}: {message.get('type')}")
-            except Exception as e:
-                print(f"⚠️ Failed to send notification to {user_id}: {e}")
-                # Remove stale connection
-                await self.disconnect(user_id)
+        websocket = self.active_connections.get(user_id)
+        if websocket is None:
+            return False
+        try:
+            await asyncio.wait_for(websocket.send_json(message), timeout=SEND_TIMEOUT_SECONDS)
+            print(f"📤 Notification sent to user {user_id}: {message.get('type')}")
+            return True
+        except asyncio.TimeoutError:
+            print(f"⚠️ Timed out sending notification to {user_id}")
+        except Exception as e:
+            print(f"⚠️ Failed to send notification to {user_id}: {e}")
+        # Remove stale/slow connection (only if it hasn't been replaced meanwhile)
+        if self.active_connections.get(user_id) is websocket:
+            await self.disconnect(user_id)
+        return False
+    
+    async def send_many(self, messages: List[Tuple[str, dict]]) -> int:
+        """
+        Send (user_id, message) pairs, skipping users that aren't connected.
+        Different users are sent to concurrently; one user's messages go in order.
+        
+        Returns how many messages were delivered
+        """
+        per_user: Dict[str, List[dict]] = {}
+        for user_id, message in messages:
+            if user_id in self.active_connections:
+                per_user.setdefault(user_id, []).append(message)
+        if not per_user:
+            return 0
+        
+        async def send_in_order(user_id: str, user_messages: List[dict]) -> int:
+            delivered = 0
+            for message in user_messages:
+                if not await self.send_notification(user_id, message):
+                    break  # connection dropped, the rest would fail too
+                delivered += 1
+            return delivered
+        
+        results = await asyncio.gather(
+            *[send_in_order(user_id, user_messages) for user_id, user_messages in per_user.items()]
+        )
+        return sum(results)
     
-    async def broadcast(self, user_ids: list, message: dict):
+    async def broadcast(self, user_ids: list, message: dict) -> int:
         """
         Broadcast a notif to multiple users
         
@@ -64,8 +106,7 @@ class ConnectionManager:
             user_ids: List of user IDs to send notification to
             message: Notification message dictionary
         """
-        for user_id in user_ids:
-            await self.send_notification(user_id, message)
+        return await self.send_many([(user_id, message) for user_id in user_ids])
 
 # Global connection manager instance
 manager = ConnectionManager()
\ No newline at end of file
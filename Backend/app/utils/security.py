@@ -1,7 +1,9 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -19,6 +21,61 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many hash/verify calls are already waiting for the pool"""
+
+
+class PasswordHashPool:
+    """
+    bcrypt takes ~100-300 ms of CPU per call (and releases the GIL), so hashing runs on a
+    small dedicated thread pool instead of the event loop. At most `max_pending` calls may
+    be queued or running; past that, PasswordHasherBusy is raised so a login burst sheds
+    load instead of piling up.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 64):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._counters: Dict[str, int] = {"completed": 0, "rejected": 0, "max_pending_seen": 0}
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        if self._pending >= self.max_pending:
+            self._counters["rejected"] += 1
+            raise PasswordHasherBusy(f"{self._pending} password hashes already pending")
+        self._pending += 1
+        self._counters["max_pending_seen"] = max(self._counters["max_pending_seen"], self._pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            self._counters["completed"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "in_flight": min(self._pending, self.workers),
+            "queue_depth": max(0, self._pending - self.workers),
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+        }
+
+
+password_hash_pool = PasswordHashPool(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", 2)),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64)),
+)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_hash_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
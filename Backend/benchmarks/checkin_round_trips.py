@@ -0,0 +1,137 @@
+"""
+Check-in round-trip benchmark
+
+Counts the Mongo round trips issued by one POST /api/habits/{habit_id}/log, for both
+the first partner checking in and the partner that completes the day. Run it on two
+revisions to compare the check-in pipeline before and after a change.
+
+Prerequisites:
+1. A reachable MongoDB (defaults to mongodb://localhost:27017; override with BENCH_MONGODB_URL)
+2. JWT_SECRET / JWT_ALGORITHM set in Backend/.env
+
+Run from Backend directory: python3 -m benchmarks.checkin_round_trips [--history-days 365]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from dotenv import load_dotenv
+
+load_dotenv(backend_dir / ".env")
+
+from bson import ObjectId
+from httpx import AsyncClient, ASGITransport
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import config.database as database_module
+from app.utils.security import create_access_token
+from benchmarks.round_trips import CountingDatabase, RoundTripCounter
+from main import app
+
+BENCH_DB_NAME = "pact_bench_checkin"
+
+
+async def seed(db, history_days: int):
+    """Two partners, one habit with a frequency goal and `history_days` of both-completed logs."""
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    users = await db.users.insert_many([
+        {"username": "bench_a", "email": "bench_a@test.com", "password": "x",
+         "notification_preferences": {}, "created_at": now},
+        {"username": "bench_b", "email": "bench_b@test.com", "password": "x",
+         "notification_preferences": {}, "created_at": now},
+    ])
+    user_a, user_b = (str(uid) for uid in users.inserted_ids)
+
+    partnership = await db.partnerships.insert_one({
+        "user_id_1": ObjectId(user_a),
+        "user_id_2": ObjectId(user_b),
+        "status": "active",
+        "created_at": now - timedelta(days=history_days + 1),
+    })
+    habit = await db.habits.insert_one({
+        "habit_name": "Bench Habit",
+        "habit_type": "build",
+        "category": "fitness",
+        "partnership_id": str(partnership.inserted_id),
+        "status": "active",
+        "goals": {
+            uid: {
+                "goal_type": "frequency",
+                "goal_name": "Bench goal",
+                "frequency_count": 1,
+                "duration_count": history_days + 30,
+                "count_checkins": history_days,
+                "goal_status": "active",
+            }
+            for uid in (user_a, user_b)
+        },
+        "created_at": now - timedelta(days=history_days + 1),
+    })
+    habit_id = str(habit.inserted_id)
+
+    logs = [
+        {"habit_id": habit_id, "user_id": uid, "completed": True,
+         "log_date": today - timedelta(days=day), "timestamp": today - timedelta(days=day)}
+        for day in range(1, history_days + 1)
+        for uid in (user_a, user_b)
+    ]
+    if logs:
+        await db.habit_logs.insert_many(logs)
+
+    return habit_id, user_a, user_b
+
+
+async def run(history_days: int) -> dict:
+    mongodb_url = os.getenv("BENCH_MONGODB_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(mongodb_url)
+    raw_db = client[BENCH_DB_NAME]
+    await client.drop_database(BENCH_DB_NAME)
+
+    counter = RoundTripCounter()
+    # Routes resolve the db through get_database() and services through the module
+    # global, so swapping the global instruments both
+    database_module.database = CountingDatabase(raw_db, counter)
+
+    try:
+        habit_id, user_a, user_b = await seed(raw_db, history_days)
+        results = {}
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://bench") as http:
+            for label, uid in (("first_partner", user_a), ("completing_partner", user_b)):
+                token = create_access_token(data={"sub": uid})
+                counter.reset()
+                response = await http.post(
+                    f"/api/habits/{habit_id}/log",
+                    json={"completed": True},
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+                response.raise_for_status()
+                results[label] = {"round_trips": counter.total, "by_operation": counter.snapshot()}
+        return {"history_days": history_days, "results": results}
+    finally:
+        await client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count Mongo round trips per check-in")
+    parser.add_argument("--history-days", type=int, default=365,
+                        help="Days of prior both-completed logs to seed for the habit")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.history_days))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Load test for the core API flows
+
+Seeds a local database (scripts/populate_scale_test_data.py), then runs concurrent
+virtual users through the app in-process (httpx ASGITransport, no network):
+
+    login → dashboard home → check-in → notifications list → streak history
+
+and reports p50/p95/p99 latency and requests/second per endpoint. Results are
+compared against a stored baseline (benchmarks/baselines/load_test.json); the run
+exits non-zero when an endpoint's p95 or throughput regresses past --tolerance.
+
+Prerequisites:
+1. A reachable MongoDB (defaults to mongodb://localhost:27017; override with BENCH_MONGODB_URL).
+   `python3 scripts/local_mongod.py` starts a throwaway one.
+2. JWT_SECRET / JWT_ALGORITHM set in Backend/.env
+
+Run from Backend directory:
+    python3 -m benchmarks.load_test [--users 20] [--iterations 5] [--logs 10000]
+    python3 -m benchmarks.load_test --update-baseline   # record the current numbers
+
+Recording/refreshing the baseline: run with the default flags on a quiet machine with
+--update-baseline and commit benchmarks/baselines/load_test.json alongside the change
+that moved the numbers. Until one is committed the run only reports.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from dotenv import load_dotenv
+
+load_dotenv(backend_dir / ".env")
+
+from httpx import AsyncClient, ASGITransport
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import config.database as database_module
+from app.services.job_queue import job_queue
+from app.utils.security import hash_password
+from config.indexes import ensure_indexes
+from main import app
+from scripts.populate_scale_test_data import populate_scale_data
+
+BENCH_DB_NAME = "pact_bench_load"
+BENCH_PASSWORD = "Bench123!"
+BASELINE_PATH = Path(__file__).parent / "baselines" / "load_test.json"
+
+ENDPOINTS = ["login", "dashboard_home", "checkin", "notifications", "streak_history"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `samples` (milliseconds)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class LatencyRecorder:
+    """Per-endpoint latency samples and error counts."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def timed(self, endpoint: str, request):
+        started = time.perf_counter()
+        response = await request
+        self.samples[endpoint].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+        return response
+
+    def report(self, wall_seconds: float) -> Dict[str, Dict]:
+        return {
+            endpoint: {
+                "requests": len(self.samples[endpoint]),
+                "errors": self.errors[endpoint],
+                "p50_ms": round(percentile(self.samples[endpoint], 50), 2),
+                "p95_ms": round(percentile(self.samples[endpoint], 95), 2),
+                "p99_ms": round(percentile(self.samples[endpoint], 99), 2),
+                "rps": round(len(self.samples[endpoint]) / wall_seconds, 2) if wall_seconds else 0.0,
+            }
+            for endpoint in ENDPOINTS
+        }
+
+
+async def seed(db, total_logs: int) -> List[Dict[str, str]]:
+    """Scale data plus a known password for every user; returns one entry per virtual user."""
+    await populate_scale_data(db, total_logs)
+    await db.users.update_many({}, {"$set": {"password": hash_password(BENCH_PASSWORD)}})
+    await ensure_indexes(db)
+
+    virtual_users = []
+    async for partnership in db.partnerships.find({"status": "active"}):
+        habit = await db.habits.find_one({"partnership_id": str(partnership["_id"])})
+        for uid in (partnership["user_id_1"], partnership["user_id_2"]):
+            user = await db.users.find_one({"_id": uid}, {"email": 1})
+            virtual_users.append({"email": user["email"], "habit_id": str(habit["_id"])})
+    return virtual_users
+
+
+async def run_flow(http: AsyncClient, recorder: LatencyRecorder, user: Dict[str, str], iterations: int):
+    """One virtual user walking the core flow `iterations` times."""
+    for _ in range(iterations):
+        response = await recorder.timed("login", http.post(
+            "/api/auth/login", json={"email": user["email"], "password": BENCH_PASSWORD}
+        ))
+        if response.status_code != 200:
+            continue
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        await recorder.timed("dashboard_home", http.get("/api/dashboard/home", headers=headers))
+        await recorder.timed("checkin", http.post(
+            f"/api/habits/{user['habit_id']}/log", json={"completed": True}, headers=headers
+        ))
+        await recorder.timed("notifications", http.get("/api/notifications/", headers=headers))
+        await recorder.timed("streak_history", http.get(
+            f"/streaks/habit/{user['habit_id']}/history", headers=headers
+        ))
+
+
+async def run(users: int, iterations: int, total_logs: int) -> Dict:
+    mongodb_url = os.getenv("BENCH_MONGODB_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(mongodb_url)
+    await client.drop_database(BENCH_DB_NAME)
+    db = client[BENCH_DB_NAME]
+    # Routes resolve the db through get_database(), which returns the module global
+    database_module.database = db
+
+    try:
+        virtual_users = (await seed(db, total_logs))[:users]
+        # ASGITransport doesn't run the lifespan; start the job queue so side effects
+        # run in the background the way they do in production
+        await job_queue.start()
+
+        recorder = LatencyRecorder()
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+            started = time.perf_counter()
+            await asyncio.gather(*[run_flow(http, recorder, user, iterations) for user in virtual_users])
+            wall_seconds = time.perf_counter() - started
+
+        await job_queue.stop()
+        return {
+            "config": {"users": len(virtual_users), "iterations": iterations, "logs": total_logs},
+            "wall_seconds": round(wall_seconds, 2),
+            "endpoints": recorder.report(wall_seconds),
+        }
+    finally:
+        await client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions of p95 latency or throughput beyond `tolerance` (0.2 = 20%)."""
+    regressions = []
+    for endpoint, now in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        if before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {before['p95_ms']}ms → {now['p95_ms']}ms")
+        if before["rps"] and now["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: rps {before['rps']} → {now['rps']}")
+    return regressions
+
+
+def print_report(report: Dict, baseline: Optional[Dict]):
+    print(f"\n📊 {report['config']['users']} users × {report['config']['iterations']} iterations "
+          f"in {report['wall_seconds']}s\n")
+    print(f"{'endpoint':<16}{'reqs':>6}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>9}  vs baseline p95")
+    for endpoint, stats in report["endpoints"].items():
+        delta = ""
+        before = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if before and before["p95_ms"]:
+            delta = f"{(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+        print(f"{endpoint:<16}{stats['requests']:>6}{stats['errors']:>6}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['rps']:>9}  {delta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the core API flows")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=5, help="Flows per virtual user")
+    parser.add_argument("--logs", type=int, default=10000, help="Habit logs to seed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression vs baseline (0.2 = 20%%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--json", action="store_true", help="Print the raw report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.users, args.iterations, args.logs))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, baseline)
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\nℹ️  No baseline at {args.baseline} (run with --update-baseline to record one)")
+        return
+    if baseline.get("config") != report["config"]:
+        print(f"\n⚠️  Baseline was recorded with {baseline.get('config')}, comparison is approximate")
+
+    regressions = compare(report, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ Regressions vs baseline:")
+        for line in regressions:
+            print(f"  • {line}")
+        sys.exit(1)
+    print("\n✅ No regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Round-trip counting wrapper for a Motor database.
+
+Wraps every collection so each awaited operation (find_one, update_one, a cursor's
+to_list, ...) is counted as one round trip to Mongo. Used by the benchmarks to
+compare how many queries a request issues.
+"""
+
+from collections import Counter
+from typing import Dict
+
+# Collection methods that each cost one awaited round trip
+COUNTED_METHODS = {
+    "find_one",
+    "find_one_and_update",
+    "find_one_and_replace",
+    "find_one_and_delete",
+    "insert_one",
+    "insert_many",
+    "update_one",
+    "update_many",
+    "replace_one",
+    "delete_one",
+    "delete_many",
+    "count_documents",
+    "estimated_document_count",
+    "distinct",
+    "bulk_write",
+}
+
+# Collection methods that return a cursor; the round trip happens when it's consumed
+CURSOR_METHODS = {"find", "aggregate"}
+
+
+class RoundTripCounter:
+    """Counts round trips per `collection.method` across everything it wraps."""
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    def record(self, collection: str, method: str) -> None:
+        self.calls[f"{collection}.{method}"] += 1
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(sorted(self.calls.items()))
+
+
+class CountingCursor:
+    """Cursor wrapper that counts one round trip when the cursor is consumed."""
+
+    def __init__(self, cursor, counter: RoundTripCounter, collection: str, method: str):
+        self._cursor = cursor
+        self._counter = counter
+        self._collection = collection
+        self._method = method
+        self._counted = False
+
+    def _count_once(self):
+        if not self._counted:
+            self._counted = True
+            self._counter.record(self._collection, self._method)
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in ("sort", "limit", "skip", "batch_size", "hint", "max_time_ms"):
+            def chain(*args, **kwargs):
+                attr(*args, **kwargs)
+                return self
+            return chain
+        return attr
+
+    async def to_list(self, *args, **kwargs):
+        self._count_once()
+        return await self._cursor.to_list(*args, **kwargs)
+
+    def __aiter__(self):
+        self._count_once()
+        return self._cursor.__aiter__()
+
+
+class CountingCollection:
+    def __init__(self, collection, counter: RoundTripCounter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in COUNTED_METHODS:
+            async def counted(*args, **kwargs):
+                self._counter.record(self._collection.name, name)
+                return await attr(*args, **kwargs)
+            return counted
+        if name in CURSOR_METHODS:
+            def cursor(*args, **kwargs):
+                return CountingCursor(attr(*args, **kwargs), self._counter, self._collection.name, name)
+            return cursor
+        return attr
+
+
+class CountingDatabase:
+    """Drop-in stand-in for an AsyncIOMotorDatabase that counts round trips."""
+
+    def __init__(self, db, counter: RoundTripCounter):
+        self._db = db
+        self.counter = counter
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self.counter)
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name in ("client", "name", "command", "list_collection_names"):
+            return getattr(self._db, name)
+        return CountingCollection(self._db[name], self.counter)
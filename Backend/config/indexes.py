@@ -0,0 +1,543 @@
+"""
+Mongo index registry
+
+Every index the app relies on is declared here, next to the query shapes that need
+it (HOT_QUERIES). `ensure_indexes` applies the registry on startup; createIndexes is
+a no-op for indexes that already exist, so it is safe to run on every boot.
+
+When you add a route query on a new field, add its shape to HOT_QUERIES — the unit
+test in tests/test_indexes.py fails if a hot query has no index to use (i.e. it
+would be a COLLSCAN).
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Demo mode - disable verbose logging for faster performance
+DEMO_MODE = os.getenv("DEMO_MODE", "true").lower() == "true"
+
+# collection → list of index specs. Names are left to Mongo's default
+# (e.g. "habit_id_1_log_date_1") so indexes created by older init_db runs match.
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        {"keys": [("email", ASCENDING)], "unique": True},
+        {"keys": [("username", ASCENDING)], "unique": True},
+        # Reminder scheduler buckets users by timezone (distinct + per-slot filter)
+        {"keys": [("timezone", ASCENDING)]},
+    ],
+    "partnerships": [
+        # Each branch of the {"$or": [{user_id_1}, {user_id_2}], "status"} lookups
+        {"keys": [("user_id_1", ASCENDING), ("status", ASCENDING)]},
+        {"keys": [("user_id_2", ASCENDING), ("status", ASCENDING)]},
+        # Existing-partnership checks between two users
+        {"keys": [("user_id_1", ASCENDING), ("user_id_2", ASCENDING)]},
+    ],
+    "habits": [
+        {"keys": [("partnership_id", ASCENDING), ("status", ASCENDING)]},
+        {"keys": [("created_by", ASCENDING), ("status", ASCENDING)]},
+        # Reminder sweep over every active habit
+        {"keys": [("status", ASCENDING)]},
+    ],
+    "habit_logs": [
+        # Today's check-ins per habit, streak recompute, log history
+        {"keys": [("habit_id", ASCENDING), ("log_date", ASCENDING)]},
+        # One log per user per day: concurrent check-in upserts can't both insert.
+        # Seed/reconcile goal totals also match on its (habit_id, user_id) prefix
+        {"keys": [("habit_id", ASCENDING), ("user_id", ASCENDING), ("log_date", ASCENDING)], "unique": True},
+        # Partner activity feed and per-user check-in totals
+        {"keys": [("user_id", ASCENDING), ("timestamp", DESCENDING)]},
+    ],
+    "streaks": [
+        {"keys": [("habit_id", ASCENDING)], "unique": True},
+        # Nightly streak-break job (app/services/streak_break_job.py)
+        {"keys": [("last_both_completed_date", ASCENDING), ("current_streak", ASCENDING)]},
+    ],
+    "notifications": [
+        # Unread list, paged by (created_at, _id), and the unread count
+        {"keys": [
+            ("user_id", ASCENDING),
+            ("is_read", ASCENDING),
+            ("archived", ASCENDING),
+            ("created_at", DESCENDING),
+            ("_id", DESCENDING),
+        ]},
+        # Archived list, paged by (created_at, _id) (GET /notifications/?include_read=true)
+        {"keys": [
+            ("user_id", ASCENDING),
+            ("archived", ASCENDING),
+            ("created_at", DESCENDING),
+            ("_id", DESCENDING),
+        ]},
+        # Snapshot refreshes when a user's avatar or a habit's name changes
+        # (app/services/notification_service.py)
+        {"keys": [("related_user_id", ASCENDING)]},
+        {"keys": [("type", ASCENDING), ("related_id", ASCENDING)]},
+    ],
+    "partner_requests": [
+        {"keys": [("receiver_id", ASCENDING), ("status", ASCENDING), ("sent_at", DESCENDING)]},
+        {"keys": [("sender_id", ASCENDING), ("receiver_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    "streak_history": [
+        {"keys": [("habit_id", ASCENDING), ("streak_start_date", DESCENDING)]},
+        {"keys": [("partnership_id", ASCENDING), ("streak_start_date", DESCENDING)]},
+    ],
+    "milestones": [
+        {"keys": [("habit_id", ASCENDING), ("is_achieved", ASCENDING)]},
+    ],
+    "cache_invalidations": [
+        # Broadcast rows only matter for a few seconds (see app/services/cache.py)
+        {"keys": [("created_at", ASCENDING)], "expireAfterSeconds": 3600},
+    ],
+    "scheduler_leases": [
+        # One doc per scheduler slot: a running lease expires after a short timeout so
+        # another worker can retry it, a finished one is kept so the slot never runs twice
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+}
+
+# Indexes created by earlier versions that no route can use
+OBSOLETE_INDEXES: Dict[str, List[str]] = {
+    "habit_logs": ["habit_id_1_user_id_1_date_1"],  # logs are keyed on log_date, not date
+    "partner_requests": ["recipient_email_1"],  # field never existed
+    # Superseded by the same keys plus _id, which pages need for their sort
+    "notifications": ["user_id_1_is_read_1_archived_1_created_at_-1"],
+}
+
+
+def _sample_values() -> Dict[str, Any]:
+    """Placeholder values for building HOT_QUERIES filters without a database."""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        "habit_id": str(ObjectId()),
+        "habit_ids": [str(ObjectId())],
+        "user_id": str(ObjectId()),
+        "partner_id": str(ObjectId()),
+        "partnership_id": str(ObjectId()),
+        "partnership_ids": [str(ObjectId())],
+        "today": today,
+        "since": today,
+    }
+
+
+# Shapes of the queries the routes issue on hot paths. `filter` takes a dict of
+# sample values (see _sample_values) so the same shapes can be explain()ed against
+# seeded data.
+HOT_QUERIES: List[Dict[str, Any]] = [
+    # habit_logs.py
+    {
+        "name": "checkin_upsert",
+        "source": "app/routes/habit_logs.py:log_habit_completion",
+        "collection": "habit_logs",
+        "filter": lambda s: {"habit_id": s["habit_id"], "user_id": s["user_id"], "log_date": s["today"]},
+    },
+    {
+        "name": "checkin_completed_today",
+        "source": "app/routes/habit_logs.py:log_habit_completion",
+        "collection": "habit_logs",
+        "filter": lambda s: {"habit_id": s["habit_id"], "log_date": s["today"], "completed": True},
+    },
+    # checkin_counters.py (check-ins only $inc; these seed and reconcile the counters)
+    {
+        "name": "checkin_user_total_inc",
+        "source": "app/services/checkin_counters.py:record_user_checkin",
+        "collection": "users",
+        "filter": lambda s: {"_id": ObjectId(s["user_id"]), "total_checkins": {"$exists": True}},
+    },
+    {
+        "name": "checkin_goal_seed",
+        "source": "app/services/checkin_counters.py:goal_totals",
+        "collection": "habit_logs",
+        "filter": lambda s: {
+            "habit_id": {"$in": [s["habit_id"], ObjectId(s["habit_id"])]},
+            "user_id": {"$in": [s["user_id"], ObjectId(s["user_id"])]},
+            "completed": True,
+        },
+    },
+    {
+        "name": "checkin_reconcile_goals",
+        "source": "app/services/checkin_counters.py:_reconcile_goals",
+        "collection": "habit_logs",
+        "filter": lambda s: {
+            "habit_id": {"$in": s["habit_ids"] + [ObjectId(h) for h in s["habit_ids"]]},
+            "completed": True,
+        },
+    },
+    {
+        "name": "checkin_reconcile_users",
+        "source": "app/services/checkin_counters.py:_reconcile_users",
+        "collection": "habit_logs",
+        "filter": lambda s: {
+            "user_id": {"$in": [s["user_id"], ObjectId(s["user_id"]), s["partner_id"], ObjectId(s["partner_id"])]},
+            "completed": True,
+        },
+    },
+    {
+        "name": "habit_log_history",
+        "source": "app/routes/habit_logs.py:get_habit_logs",
+        "collection": "habit_logs",
+        "filter": lambda s: {"habit_id": s["habit_id"], "log_date": {"$gte": s["since"]}},
+        "sort": [("log_date", DESCENDING)],
+    },
+    {
+        "name": "partnership_today_logs",
+        "source": "app/routes/habit_logs.py:get_partnership_today_status",
+        "collection": "habit_logs",
+        "filter": lambda s: {"habit_id": {"$in": s["habit_ids"]}, "log_date": s["today"]},
+    },
+    {
+        "name": "streak_recompute_logs",
+        "source": "app/services/streak_service.py:recompute_streak_from_logs",
+        "collection": "habit_logs",
+        "filter": lambda s: {"habit_id": s["habit_id"], "completed": True},
+    },
+    {
+        "name": "streak_by_habit",
+        "source": "app/services/streak_service.py:get_streak_cached",
+        "collection": "streaks",
+        "filter": lambda s: {"habit_id": ObjectId(s["habit_id"])},
+    },
+    {
+        "name": "broken_streaks",
+        "source": "app/services/streak_break_job.py:broken_streaks_pipeline",
+        "collection": "streaks",
+        "filter": lambda s: {"last_both_completed_date": {"$lt": s["today"]}, "current_streak": {"$gt": 0}},
+    },
+    {
+        "name": "habit_partnership_check",
+        "source": "app/routes/habit_logs.py:log_habit_completion",
+        "collection": "partnerships",
+        "filter": lambda s: {
+            "_id": ObjectId(s["partnership_id"]),
+            "$or": [{"user_id_1": ObjectId(s["user_id"])}, {"user_id_2": ObjectId(s["user_id"])}],
+        },
+    },
+    # dashboard_service.py (view rebuilds)
+    {
+        "name": "dashboard_active_partnership",
+        "source": "app/services/dashboard_service.py:build_view",
+        "collection": "partnerships",
+        "filter": lambda s: {
+            "$or": [{"user_id_1": ObjectId(s["user_id"])}, {"user_id_2": ObjectId(s["user_id"])}],
+            "status": "active",
+        },
+    },
+    {
+        "name": "dashboard_active_habits",
+        "source": "app/services/dashboard_service.py:build_view",
+        "collection": "habits",
+        "filter": lambda s: {"partnership_id": s["partnership_id"], "status": "active"},
+    },
+    {
+        "name": "dashboard_todays_logs",
+        "source": "app/services/dashboard_service.py:build_view",
+        "collection": "habit_logs",
+        "filter": lambda s: {"habit_id": {"$in": s["habit_ids"]}, "log_date": s["today"]},
+    },
+    {
+        "name": "dashboard_partner_activity",
+        "source": "app/services/dashboard_service.py:build_view",
+        "collection": "habit_logs",
+        "filter": lambda s: {
+            "user_id": {"$in": [s["partner_id"], ObjectId(s["partner_id"])]},
+            "timestamp": {"$gte": s["since"]},
+            "completed": True,
+        },
+        "sort": [("timestamp", DESCENDING)],
+    },
+    {
+        "name": "dashboard_total_habits",
+        "source": "app/services/dashboard_service.py:build_view",
+        "collection": "habits",
+        "filter": lambda s: {"partnership_id": {"$in": s["partnership_ids"]}, "status": "active"},
+    },
+    {
+        "name": "dashboard_total_checkins",
+        "source": "app/services/checkin_counters.py:seed_user_total",
+        "collection": "habit_logs",
+        "filter": lambda s: {"user_id": {"$in": [s["user_id"], ObjectId(s["user_id"])]}, "completed": True},
+    },
+    # notifications.py
+    {
+        "name": "notifications_unread",
+        "source": "app/routes/notifications.py:get_notifications",
+        "collection": "notifications",
+        "filter": lambda s: {"user_id": ObjectId(s["user_id"]), "is_read": False, "archived": {"$in": [False, None]}},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "name": "notifications_unread_page",
+        "source": "app/routes/notifications.py:get_notifications",
+        "collection": "notifications",
+        "filter": lambda s: {
+            "user_id": ObjectId(s["user_id"]),
+            "is_read": False,
+            "archived": {"$in": [False, None]},
+            "$or": [
+                {"created_at": {"$lt": s["today"]}},
+                {"created_at": s["today"], "_id": {"$lt": ObjectId()}},
+            ],
+        },
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "name": "notifications_archived",
+        "source": "app/routes/notifications.py:get_notifications",
+        "collection": "notifications",
+        "filter": lambda s: {"user_id": ObjectId(s["user_id"]), "archived": True},
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "name": "notifications_archived_page",
+        "source": "app/routes/notifications.py:get_notifications",
+        "collection": "notifications",
+        "filter": lambda s: {
+            "user_id": ObjectId(s["user_id"]),
+            "archived": True,
+            "$or": [
+                {"created_at": {"$lt": s["today"]}},
+                {"created_at": s["today"], "_id": {"$lt": ObjectId()}},
+            ],
+        },
+        "sort": [("created_at", DESCENDING), ("_id", DESCENDING)],
+    },
+    {
+        "name": "notifications_unread_count",
+        "source": "app/routes/notifications.py:get_unread_count",
+        "collection": "notifications",
+        "filter": lambda s: {"user_id": ObjectId(s["user_id"]), "is_read": False, "archived": {"$in": [False, None]}},
+    },
+    {
+        "name": "notifications_user_snapshot_refresh",
+        "source": "app/services/notification_service.py:refresh_user_snapshots",
+        "collection": "notifications",
+        "filter": lambda s: {
+            "related_user_id": {"$in": [s["user_id"], ObjectId(s["user_id"])]},
+            "snapshot": {"$exists": True},
+        },
+    },
+    {
+        "name": "notifications_habit_snapshot_refresh",
+        "source": "app/services/notification_service.py:refresh_habit_snapshots",
+        "collection": "notifications",
+        "filter": lambda s: {
+            "type": {"$in": ["habit_reminder", "missed_habit", "progress_milestone"]},
+            "related_id": {"$in": [s["habit_id"], ObjectId(s["habit_id"])]},
+            "snapshot": {"$exists": True},
+        },
+    },
+    {
+        "name": "notifications_existing_nudge",
+        "source": "app/routes/notifications.py:send_partner_nudge",
+        "collection": "notifications",
+        "filter": lambda s: {
+            "type": "partner_nudge",
+            "related_id": s["habit_id"],
+            "related_user_id": s["user_id"],
+            "user_id": ObjectId(s["partner_id"]),
+        },
+    },
+    # partnership_apis.py
+    {
+        "name": "partnership_pending_invites",
+        "source": "app/routes/partnership_apis.py:list_partnership_invites",
+        "collection": "partner_requests",
+        "filter": lambda s: {"receiver_id": ObjectId(s["user_id"]), "status": "pending"},
+        "sort": [("sent_at", DESCENDING)],
+    },
+    {
+        "name": "partnership_existing_request",
+        "source": "app/routes/partnership_apis.py:send_partnership_invite",
+        "collection": "partner_requests",
+        "filter": lambda s: {
+            "$or": [
+                {"sender_id": ObjectId(s["user_id"]), "receiver_id": ObjectId(s["partner_id"])},
+                {"sender_id": ObjectId(s["partner_id"]), "receiver_id": ObjectId(s["user_id"])},
+            ],
+            "status": "pending",
+        },
+    },
+    {
+        "name": "partnership_existing_pair",
+        "source": "app/routes/partnership_apis.py:send_partnership_invite",
+        "collection": "partnerships",
+        "filter": lambda s: {
+            "$or": [
+                {"user_id_1": ObjectId(s["user_id"]), "user_id_2": ObjectId(s["partner_id"])},
+                {"user_id_1": ObjectId(s["partner_id"]), "user_id_2": ObjectId(s["user_id"])},
+            ],
+        },
+    },
+    {
+        "name": "partnership_habits",
+        "source": "app/routes/partnership_apis.py:get_partnership_stats",
+        "collection": "habits",
+        "filter": lambda s: {"partnership_id": s["partnership_id"]},
+    },
+    {
+        "name": "partnership_habit_counts",
+        "source": "app/services/partnership_service.py:habit_counts",
+        "collection": "habits",
+        "filter": lambda s: {"partnership_id": {"$in": s["partnership_ids"]}, "status": "active"},
+    },
+    {
+        "name": "partnership_habit_checkins",
+        "source": "app/services/partnership_service.py:checkin_counts",
+        "collection": "habit_logs",
+        "filter": lambda s: {"habit_id": {"$in": s["habit_ids"]}, "completed": True},
+    },
+    {
+        "name": "partnership_user_partnerships",
+        "source": "app/routes/partnership_apis.py:get_partnership_history",
+        "collection": "partnerships",
+        "filter": lambda s: {
+            "$or": [{"user_id_1": ObjectId(s["user_id"])}, {"user_id_2": ObjectId(s["user_id"])}],
+        },
+    },
+    {
+        "name": "partnership_streak_history",
+        "source": "app/routes/partnership_apis.py:get_partnership_stats",
+        "collection": "streak_history",
+        "filter": lambda s: {
+            "partnership_id": {"$in": [ObjectId(s["partnership_id"]), s["partnership_id"]]},
+        },
+    },
+    {
+        "name": "partnership_milestones",
+        "source": "app/services/partnership_service.py:milestone_counts",
+        "collection": "milestones",
+        "filter": lambda s: {
+            "habit_id": {"$in": [ObjectId(h) for h in s["habit_ids"]] + s["habit_ids"]},
+            "is_achieved": True,
+        },
+    },
+    # auth.py
+    {
+        "name": "login_by_email",
+        "source": "app/routes/auth.py:login",
+        "collection": "users",
+        "filter": lambda s: {"email": "someone@example.com"},
+    },
+]
+
+
+def _index_specs(collection: str) -> List[List[str]]:
+    """Key field names of every index available on `collection` (including _id)."""
+    specs = [[field for field, _ in spec["keys"]] for spec in INDEX_REGISTRY.get(collection, [])]
+    return specs + [["_id"]]
+
+
+def _branch_uses_index(collection: str, fields: Iterable[str]) -> bool:
+    fields = set(fields)
+    return any(spec[0] in fields for spec in _index_specs(collection))
+
+
+def query_uses_index(collection: str, query_filter: Dict[str, Any]) -> bool:
+    """
+    Whether the planner has an index for `query_filter`: some registered index's
+    leading field must be constrained. For a top-level $or, either the other
+    top-level fields are indexed, or every branch is (each branch is planned
+    separately).
+    """
+    top_level = [field for field in query_filter if not field.startswith("$")]
+    if _branch_uses_index(collection, top_level):
+        return True
+    branches = query_filter.get("$or")
+    if not branches:
+        return False
+    return all(_branch_uses_index(collection, top_level + list(branch)) for branch in branches)
+
+
+def unindexed_hot_queries(sample: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Names of HOT_QUERIES that no registered index can serve."""
+    sample = sample or _sample_values()
+    return [
+        query["name"]
+        for query in HOT_QUERIES
+        if not query_uses_index(query["collection"], query["filter"](sample))
+    ]
+
+
+def _index_model(spec: Dict[str, Any]) -> IndexModel:
+    options = {key: value for key, value in spec.items() if key != "keys"}
+    return IndexModel(spec["keys"], **options)
+
+
+# createIndexes error codes for "an index with this name/key pattern exists with other options"
+INDEX_CONFLICT_CODES = {85, 86}
+
+
+async def _create_index(collection, spec: Dict[str, Any]) -> List[str]:
+    """
+    Create one index. The existing index is never dropped first (a failed rebuild would
+    leave the collection without it): a non-unique index that became unique is
+    converted in place with collMod (MongoDB 6.0+), which fails and leaves it as is when
+    there are duplicates; any other options conflict is raised with the old index kept.
+    """
+    model = _index_model(spec)
+    try:
+        return await collection.create_indexes([model])
+    except OperationFailure as e:
+        if e.code not in INDEX_CONFLICT_CODES or not spec.get("unique"):
+            raise
+        name = model.document["name"]
+        existing = (await collection.index_information()).get(name) or {}
+        if existing.get("unique") or existing.get("key") != list(model.document["key"].items()):
+            raise
+        # prepareUnique rejects new duplicates so the conversion can't race an insert
+        for option in ("prepareUnique", "unique"):
+            await collection.database.command("collMod", collection.name, index={"name": name, option: True})
+        return [name]
+
+
+async def ensure_indexes(db, registry: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+    """
+    Create every index in the registry and drop OBSOLETE_INDEXES.
+
+    Idempotent. An existing index that became unique is converted in place; other
+    option changes need a manual rebuild. A failure on one collection (e.g. a unique
+    index over duplicate data) is logged and skipped, keeping whatever index exists, so
+    startup isn't blocked; the summary lists what failed.
+    """
+    summary: Dict[str, Any] = {"created": [], "dropped": [], "failed": []}
+
+    for collection, specs in (registry or INDEX_REGISTRY).items():
+        try:
+            names = await db[collection].create_indexes([_index_model(spec) for spec in specs])
+            summary["created"].extend(f"{collection}.{name}" for name in names)
+        except OperationFailure:
+            # Retry one by one so a single bad index doesn't skip the whole collection
+            for spec in specs:
+                try:
+                    name = await _create_index(db[collection], spec)
+                    summary["created"].extend(f"{collection}.{n}" for n in name)
+                except OperationFailure as spec_error:
+                    summary["failed"].append({
+                        "collection": collection,
+                        "keys": spec["keys"],
+                        "error": str(spec_error),
+                    })
+                    print(f"⚠️ Could not create index {collection}{spec['keys']}: {spec_error}")
+        except Exception as e:
+            summary["failed"].append({"collection": collection, "error": str(e)})
+            print(f"⚠️ Could not create indexes on {collection}: {e}")
+
+    for collection, names in OBSOLETE_INDEXES.items():
+        for name in names:
+            try:
+                await db[collection].drop_index(name)
+                summary["dropped"].append(f"{collection}.{name}")
+            except OperationFailure:
+                # Already gone (or the collection doesn't exist yet)
+                pass
+            except Exception as e:
+                print(f"⚠️ Could not drop index {collection}.{name}: {e}")
+
+    if not DEMO_MODE:
+        print(f"📇 Indexes ensured: {len(summary['created'])} present, "
+              f"{len(summary['dropped'])} dropped, {len(summary['failed'])} failed")
+    return summary
@@ -1,5 +1,6 @@
 import asyncio
 from config.database import connect_to_mongo, close_mongo_connection
+from config.indexes import ensure_indexes
 
 
 async def init_database():
@@ -15,7 +16,8 @@ async def init_database():
             "notifications",
             "partner_requests",
             "milestones",
-            "streak_history"
+            "streak_history",
+            "streaks"
         ]
 
         existing_collections = await db.list_collection_names()
@@ -27,16 +29,15 @@ async def init_database():
             else:
                 print(f"⏭️  Collection already exists: {collection_name}")
 
-        # Create indexes for performance
+        # Create indexes for performance (same registry the app applies on startup)
         print("\n📇 Creating indexes...")
-        await db.users.create_index("email", unique=True)
-        await db.users.create_index("username", unique=True)
-        await db.partnerships.create_index([("user_id_1", 1), ("user_id_2", 1)])
-        await db.habits.create_index("partnership_id")
-        await db.habit_logs.create_index([("habit_id", 1), ("user_id", 1), ("date", 1)])
-        await db.partner_requests.create_index("recipient_email")
-
-        print("✅ All indexes created!")
+        summary = await ensure_indexes(db)
+        for name in summary["dropped"]:
+            print(f"🗑️  Dropped obsolete index: {name}")
+        for failure in summary["failed"]:
+            print(f"❌ Index failed on {failure['collection']}: {failure['error']}")
+
+        print(f"✅ {len(summary['created'])} indexes in place!")
         print("\n🎉 Database initialization complete!")
 
         await close_mongo_connection()
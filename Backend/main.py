@@ -1,8 +1,10 @@
 from app.routes import partnership_apis, dashboard_apis, upload  # ← Add dashboard import
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from config.database import connect_to_mongo, close_mongo_connection
+from config.database import connect_to_mongo, close_mongo_connection, get_database
+from config.indexes import ensure_indexes
 from app.routes import auth, habits, users, streak_history, habit_logs, notifications
 from app.routes import goals
 import asyncio
@@ -16,7 +18,14 @@ from dotenv import load_dotenv
 
 from fastapi import WebSocket, WebSocketDisconnect
 from app.services.websocket import manager
-from app.utils.security import decode_access_token
+from app.services.job_queue import job_queue
+from app.services.streak_service import StreakCalculationService
+from app.dependencies.auth import user_doc_cache, auth_cache_stats
+from app.services.identity_map import identity_map_stats
+from app.services.notification_service import NotificationService
+from app.services.reminder_scheduler import reminder_scheduler
+from app.services.streak_break_job import streak_break_job
+from app.utils.security import PasswordHasherBusy, password_hash_pool
 
 load_dotenv()
 
@@ -24,6 +33,19 @@ load_dotenv()
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    # Idempotent - existing indexes are left alone, failures are logged not raised
+    if os.getenv("ENSURE_INDEXES_ON_STARTUP", "true").lower() == "true":
+        await ensure_indexes(get_database())
+    await job_queue.start()
+    await StreakCalculationService.streak_mem_cache.start()
+    await user_doc_cache.start()
+    await NotificationService.preference_cache.start()
+    # Hourly, timezone-bucketed check-in reminders (one worker per slot via a Mongo lease)
+    if os.getenv("REMINDER_SCHEDULER_ENABLED", "true").lower() == "true":
+        await reminder_scheduler.start()
+    # Nightly reset of streaks broken by a missed day (one worker per day via a Mongo lease)
+    if os.getenv("STREAK_BREAK_JOB_ENABLED", "true").lower() == "true":
+        await streak_break_job.start()
     try:
         yield
     except (asyncio.CancelledError, KeyboardInterrupt):
@@ -33,6 +55,26 @@ async def lifespan(app: FastAPI):
     finally:
         # Shutdown - handle any cancellation errors gracefully
         try:
+            # Stop scheduling new work, then drain queued background jobs while Mongo is still up
+            try:
+                await reminder_scheduler.stop()
+                await streak_break_job.stop()
+            except (asyncio.CancelledError, KeyboardInterrupt):
+                pass  # Ignore cancellation during cleanup
+
+            try:
+                await job_queue.stop()
+            except (asyncio.CancelledError, KeyboardInterrupt):
+                pass  # Ignore cancellation during cleanup
+
+            # Stop listening for cross-worker cache invalidations
+            try:
+                await StreakCalculationService.streak_mem_cache.stop()
+                await user_doc_cache.stop()
+                await NotificationService.preference_cache.stop()
+            except (asyncio.CancelledError, KeyboardInterrupt):
+                pass  # Ignore cancellation during cleanup
+
             # Close all WebSocket connections
             for user_id in list(manager.active_connections.keys()):
                 try:
@@ -69,8 +111,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor (GET /api/notifications/) and query timings (GET /api/dashboard/home)
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    # Login/signup burst: shed load instead of queueing bcrypt work without bound
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in attempts in progress, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(partnership_apis.router)
@@ -105,7 +160,17 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "job_queue": job_queue.metrics(),
+        "streak_cache": StreakCalculationService.cache_stats(),
+        "password_hashing": password_hash_pool.metrics(),
+        "auth_cache": auth_cache_stats(),
+        "identity_map": identity_map_stats(),
+        "notification_preference_cache": NotificationService.preference_cache.stats(),
+        "reminder_scheduler": reminder_scheduler.metrics(),
+        "streak_break_job": streak_break_job.metrics(),
+    }
 
 # WebSocket endpoint for the real-time notifications
 @app.websocket("/ws/{user_id}")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Add display snapshots (partner_username, partner_avatar, habit_name) to notifications
+stored before NotificationService wrote them at send time.
+
+Until a row has a snapshot, GET /api/notifications/ looks its user/habit up on every
+read; run this once after deploying so the list endpoint needs no joins.
+
+Run from Backend directory:
+    python3 scripts/backfill_notification_snapshots.py [--batch-size 500]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.services.notification_service import notification_service
+
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Backfill notification display snapshots")
+    parser.add_argument("--batch-size", type=int, default=500, help="Notifications per lookup batch")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+    db = client.get_database(os.getenv("DATABASE_NAME", "pact_db"))
+    started = time.perf_counter()
+    try:
+        counts = await notification_service.backfill_snapshots(db, batch_size=args.batch_size)
+    finally:
+        client.close()
+
+    print(
+        f"✅ Added snapshots to {counts['updated']}/{counts['notifications']} notifications "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
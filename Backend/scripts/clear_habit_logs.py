@@ -1,8 +1,15 @@
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.checkin_counters import CheckinCounterService
+
 load_dotenv()
 
 async def clear_logs():
@@ -10,6 +17,9 @@ async def clear_logs():
     db = client[os.getenv('DATABASE_NAME', 'pact_db')]
     result = await db.habit_logs.delete_many({})
     print(f'✅ Deleted {result.deleted_count} habit_logs')
+    # The user and goal check-in counters now have no logs behind them
+    counts = await CheckinCounterService.reconcile_all(db)
+    print(f'✅ Reset check-in counters ({counts["users_fixed"]} users, {counts["goals_fixed"]} goals)')
     client.close()
 
 asyncio.run(clear_logs())
@@ -0,0 +1,107 @@
+"""
+Throwaway local mongod
+
+Starts a mongod on a free port with a temporary data directory, for tests and
+benchmarks that need a real query planner (explain(), index use) but shouldn't touch
+the shared MONGODB_URL database.
+
+Uses `mongod` from PATH, or the binary in MONGOD_BINARY.
+
+Run from Backend directory: python3 scripts/local_mongod.py   (prints the URL, Ctrl+C to stop)
+"""
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from typing import Optional
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+
+def find_mongod() -> Optional[str]:
+    """Path to a mongod binary, or None if there isn't one."""
+    return os.getenv("MONGOD_BINARY") or shutil.which("mongod")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalMongod:
+    """
+    Context manager around a mongod subprocess:
+
+        with LocalMongod() as url:
+            client = AsyncIOMotorClient(url)
+    """
+
+    def __init__(self, binary: Optional[str] = None, startup_timeout: float = 30.0):
+        self.binary = binary or find_mongod()
+        self.startup_timeout = startup_timeout
+        self.port: Optional[int] = None
+        self._dbpath: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}"
+
+    def start(self) -> str:
+        if not self.binary:
+            raise RuntimeError("mongod not found (install MongoDB or set MONGOD_BINARY)")
+        self.port = _free_port()
+        self._dbpath = tempfile.mkdtemp(prefix="pact-mongod-")
+        self._process = subprocess.Popen(
+            [self.binary, "--dbpath", self._dbpath, "--port", str(self.port),
+             "--bind_ip", "127.0.0.1", "--quiet"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                self.stop()
+                raise RuntimeError("mongod exited during startup")
+            try:
+                with MongoClient(self.url, serverSelectionTimeoutMS=500) as client:
+                    client.admin.command("ping")
+                return self.url
+            except PyMongoError:
+                time.sleep(0.2)
+
+        self.stop()
+        raise RuntimeError(f"mongod didn't accept connections within {self.startup_timeout}s")
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._dbpath is not None:
+            shutil.rmtree(self._dbpath, ignore_errors=True)
+            self._dbpath = None
+
+    def __enter__(self) -> str:
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    with LocalMongod() as url:
+        print(f"✅ mongod running at {url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n🔌 Stopping mongod")
@@ -0,0 +1,204 @@
+"""
+Scale test data population script
+Seeds a database with partnerships, habits and check-in history sized by the number
+of habit logs (10k / 100k / 1M), in the same document shapes the routes write, so
+query plans and latencies can be checked at production-like volumes.
+
+Unlike populate_comprehensive_test_data.py this writes with insert_many in batches
+and doesn't check for existing documents — point it at a throwaway database.
+
+Prerequisites:
+1. Install dependencies: pip install -r requirements.txt
+2. A MongoDB to write to (SCALE_MONGODB_URL, defaults to mongodb://localhost:27017)
+
+Run from Backend directory: python3 scripts/populate_scale_test_data.py --logs 100000 [--db pact_scale_test]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add parent directory to path so we can import app modules
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+HABITS_PER_PARTNERSHIP = 3
+HISTORY_DAYS = 90
+COMPLETION_RATE = 0.85
+NOTIFICATIONS_PER_USER = 20
+CATEGORIES = ["fitness", "wellness", "learning", "productivity"]
+
+
+async def _insert_batched(collection, docs: List[Dict], batch_size: int) -> int:
+    for start in range(0, len(docs), batch_size):
+        await collection.insert_many(docs[start:start + batch_size], ordered=False)
+    return len(docs)
+
+
+async def populate_scale_data(db, total_logs: int, batch_size: int = 10000, seed: int = 42) -> Dict[str, Any]:
+    """
+    Seed `db` with roughly `total_logs` habit logs plus the users, partnerships,
+    habits, streaks, notifications and partner requests around them.
+
+    Returns sample ids from the seeded data (one busy user, their partner, habit and
+    partnership) in the shape config.indexes.HOT_QUERIES filters expect.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    logs_per_partnership = HABITS_PER_PARTNERSHIP * 2 * HISTORY_DAYS * COMPLETION_RATE
+    partnership_count = max(1, math.ceil(total_logs / logs_per_partnership))
+
+    users, partnerships, habits, streaks = [], [], [], []
+    logs, notifications, requests = [], [], []
+    log_count = 0
+    started = time.perf_counter()
+
+    for p in range(partnership_count):
+        user_a, user_b = ObjectId(), ObjectId()
+        for uid, suffix in ((user_a, "a"), (user_b, "b")):
+            users.append({
+                "_id": uid,
+                "username": f"scale_{p}_{suffix}",
+                "email": f"scale_{p}_{suffix}@test.com",
+                "password": "x",
+                "notification_preferences": {},
+                "is_active": True,
+                "created_at": now - timedelta(days=HISTORY_DAYS + 10),
+            })
+
+        partnership_id = ObjectId()
+        partnerships.append({
+            "_id": partnership_id,
+            "user_id_1": user_a,
+            "user_id_2": user_b,
+            # A few ended partnerships so status filters have something to skip
+            "status": "ended" if p % 10 == 9 else "active",
+            "created_at": now - timedelta(days=HISTORY_DAYS + 5),
+        })
+
+        for h in range(HABITS_PER_PARTNERSHIP):
+            habit_id = ObjectId()
+            habits.append({
+                "_id": habit_id,
+                "habit_name": f"Scale habit {h}",
+                "habit_type": "build",
+                "category": CATEGORIES[h % len(CATEGORIES)],
+                "partnership_id": str(partnership_id),
+                "created_by": str(user_a),
+                "status": "active",
+                "goals": {},
+                "created_at": now - timedelta(days=HISTORY_DAYS),
+            })
+
+            streak = 0
+            for day in range(HISTORY_DAYS, 0, -1):
+                log_date = today - timedelta(days=day)
+                both = True
+                for uid in (user_a, user_b):
+                    completed = rng.random() < COMPLETION_RATE
+                    both = both and completed
+                    # Shape written by POST /habits/{habit_id}/log
+                    logs.append({
+                        "habit_id": str(habit_id),
+                        "user_id": str(uid),
+                        "completed": completed,
+                        "log_date": log_date,
+                        "timestamp": log_date + timedelta(hours=rng.randint(6, 22)),
+                    })
+                streak = streak + 1 if both else 0
+            # Logs dominate the volume, so they're flushed as they're generated
+            if len(logs) >= batch_size:
+                log_count += await _insert_batched(db.habit_logs, logs, batch_size)
+                logs = []
+            streaks.append({
+                "habit_id": habit_id,
+                "partnership_id": partnership_id,
+                "current_streak": streak,
+                "longest_streak": streak,
+                "last_both_completed_date": today - timedelta(days=1) if streak else None,
+                "updated_at": now,
+            })
+
+        for uid, other in ((user_a, user_b), (user_b, user_a)):
+            for n in range(NOTIFICATIONS_PER_USER):
+                notifications.append({
+                    "user_id": uid,
+                    "type": "partner_checkin",
+                    "title": "Partner checked in",
+                    "message": "Your partner checked in",
+                    "related_id": str(habits[-1]["_id"]),
+                    "related_user_id": str(other),
+                    "is_read": n % 3 == 0,
+                    "archived": n % 7 == 0,
+                    "created_at": now - timedelta(hours=n * 6),
+                })
+
+        if p:
+            requests.append({
+                "sender_id": user_a,
+                "receiver_id": users[0]["_id"] if p % 2 else ObjectId(),
+                "status": "pending",
+                "sent_at": now - timedelta(hours=p),
+            })
+
+    counts = {
+        "users": await _insert_batched(db.users, users, batch_size),
+        "partnerships": await _insert_batched(db.partnerships, partnerships, batch_size),
+        "habits": await _insert_batched(db.habits, habits, batch_size),
+        "streaks": await _insert_batched(db.streaks, streaks, batch_size),
+        "habit_logs": log_count + await _insert_batched(db.habit_logs, logs, batch_size),
+        "notifications": await _insert_batched(db.notifications, notifications, batch_size),
+        "partner_requests": await _insert_batched(db.partner_requests, requests, batch_size),
+    }
+
+    # The first partnership is the "hot" one the sample points at
+    hot_habits = [str(h["_id"]) for h in habits[:HABITS_PER_PARTNERSHIP]]
+    return {
+        "counts": counts,
+        "seconds": round(time.perf_counter() - started, 2),
+        "sample": {
+            "habit_id": hot_habits[0],
+            "habit_ids": hot_habits,
+            "user_id": str(users[0]["_id"]),
+            "partner_id": str(users[1]["_id"]),
+            "partnership_id": str(partnerships[0]["_id"]),
+            "partnership_ids": [str(partnerships[0]["_id"])],
+            "today": today - timedelta(days=1),
+            "since": today - timedelta(days=30),
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Seed a database with scale test data")
+    parser.add_argument("--logs", type=int, default=10000, help="Approximate number of habit logs")
+    parser.add_argument("--db", default="pact_scale_test", help="Database to (re)create")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    mongodb_url = os.getenv("SCALE_MONGODB_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(mongodb_url)
+    try:
+        await client.drop_database(args.db)
+        print(f"🌱 Seeding ~{args.logs:,} habit logs into {args.db}...")
+        result = await populate_scale_data(client[args.db], args.logs, args.batch_size)
+        for collection, count in result["counts"].items():
+            print(f"  • {collection}: {count:,}")
+        print(f"✅ Done in {result['seconds']}s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Rebuild the materialized dashboard views (`dashboard_views`) from the source collections.
+
+Views are kept current by the writes that affect them (see app/services/dashboard_service.py);
+run this to repair drift, e.g. after seeding data directly into Mongo or a restore.
+
+Run from Backend directory:
+    python3 scripts/rebuild_dashboard_views.py            # every user
+    python3 scripts/rebuild_dashboard_views.py --user <user_id> [--user <user_id> ...]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.services.dashboard_service import DashboardService
+
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild dashboard read models")
+    parser.add_argument("--user", action="append", default=[], help="Only rebuild this user's view")
+    parser.add_argument("--batch-size", type=int, default=100, help="Users rebuilt concurrently")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+    db = client.get_database(os.getenv("DATABASE_NAME", "pact_db"))
+    started = time.perf_counter()
+    try:
+        if args.user:
+            counts = {"users": len(args.user), "rebuilt": 0}
+            for user_id in args.user:
+                if await DashboardService.rebuild(db, user_id) is not None:
+                    counts["rebuilt"] += 1
+        else:
+            counts = await DashboardService.rebuild_all(db, batch_size=args.batch_size)
+    finally:
+        client.close()
+
+    print(f"✅ Rebuilt {counts['rebuilt']}/{counts['users']} dashboard views in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Re-derive the running check-in counters (users.total_checkins, goals.{user_id}.count_checkins
+and goal_progress) from habit_logs.
+
+Check-ins keep the counters current with `$inc` (see app/services/checkin_counters.py);
+run this nightly, and after seeding, importing or deleting logs directly in Mongo.
+
+Run from Backend directory:
+    python3 scripts/reconcile_checkin_counters.py [--batch-size 500]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.services.checkin_counters import CheckinCounterService
+
+load_dotenv()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Reconcile check-in counters with habit_logs")
+    parser.add_argument("--batch-size", type=int, default=None, help="Users/habits per aggregation")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+    db = client.get_database(os.getenv("DATABASE_NAME", "pact_db"))
+    started = time.perf_counter()
+    try:
+        counts = await CheckinCounterService.reconcile_all(db, batch_size=args.batch_size)
+    finally:
+        client.close()
+
+    print(
+        f"✅ Reconciled {counts['users']} users ({counts['users_fixed']} fixed) and "
+        f"{counts['goals']} goals ({counts['goals_fixed']} fixed) in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -25,6 +25,23 @@ load_dotenv(backend_dir / ".env")
 # Import FastAPI app and dependencies
 from main import app
 from config.database import get_database
+from scripts.local_mongod import LocalMongod, find_mongod
+
+
+@pytest.fixture(scope="session")
+def mongo_url():
+    """
+    URL of a throwaway mongod for tests that need a real server (query planner,
+    aggregation semantics). QUERY_PLAN_MONGODB_URL, else a LocalMongod; skipped if neither.
+    """
+    url = os.getenv("QUERY_PLAN_MONGODB_URL")
+    if url:
+        yield url
+        return
+    if not find_mongod():
+        pytest.skip("no mongod available (set QUERY_PLAN_MONGODB_URL or put mongod on PATH)")
+    with LocalMongod() as url:
+        yield url
 
 
 @pytest_asyncio.fixture
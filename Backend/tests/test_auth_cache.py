@@ -0,0 +1,129 @@
+"""
+Unit tests for the cached auth dependencies (app/dependencies/auth.py).
+"""
+
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from httpx import ASGITransport, AsyncClient
+
+import app.dependencies.auth as auth_deps
+from app.utils.security import create_access_token
+from main import app
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.calls = 0
+
+    async def find_one(self, query):
+        self.calls += 1
+        return self.docs.get(query["_id"])
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.users = FakeUsers(docs)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    auth_deps.token_claims_cache.clear()
+    auth_deps.user_doc_cache.clear()
+    yield
+    auth_deps.token_claims_cache.clear()
+    auth_deps.user_doc_cache.clear()
+
+
+def _credentials(token):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+async def test_verified_claims_are_served_from_cache(monkeypatch):
+    token = create_access_token({"sub": "user-1"})
+    decodes = 0
+    real_decode = auth_deps.decode_access_token
+
+    def counting_decode(value):
+        nonlocal decodes
+        decodes += 1
+        return real_decode(value)
+
+    monkeypatch.setattr(auth_deps, "decode_access_token", counting_decode)
+
+    assert await auth_deps.get_current_user_id(_credentials(token)) == "user-1"
+    assert await auth_deps.get_current_user_id(_credentials(token)) == "user-1"
+    assert decodes == 1
+    assert token not in auth_deps.token_claims_cache  # keyed by hash, not the raw token
+
+
+async def test_cached_claims_are_not_served_past_exp(monkeypatch):
+    token = create_access_token({"sub": "user-1"}, expires_delta=timedelta(minutes=5))
+    assert auth_deps.decode_token_cached(token)["sub"] == "user-1"
+
+    real_time = auth_deps.time.time
+    monkeypatch.setattr(auth_deps.time, "time", lambda: real_time() + 600)
+    assert auth_deps.decode_token_cached(token) is None
+    assert len(auth_deps.token_claims_cache) == 0
+
+
+async def test_invalid_token_is_rejected_and_not_cached():
+    with pytest.raises(HTTPException) as exc:
+        await auth_deps.get_current_user_id(_credentials("not-a-jwt"))
+    assert exc.value.status_code == 401
+    assert len(auth_deps.token_claims_cache) == 0
+
+
+async def test_user_document_cache_and_invalidation(monkeypatch):
+    user_id = ObjectId()
+    db = FakeDB([{"_id": user_id, "username": "alice", "is_active": True}])
+    monkeypatch.setattr(auth_deps, "get_database", lambda: db)
+    token = create_access_token({"sub": str(user_id)})
+
+    user_id_from_token = await auth_deps.get_current_user_id(_credentials(token))
+    first = await auth_deps.get_current_user(user_id_from_token)
+    second = await auth_deps.get_current_user(user_id_from_token)
+    assert first["username"] == second["username"] == "alice"
+    assert db.users.calls == 1
+
+    db.users.docs[user_id]["is_active"] = False
+    auth_deps.invalidate_cached_user(str(user_id))
+    with pytest.raises(HTTPException) as exc:
+        await auth_deps.get_current_user(user_id_from_token)
+    assert exc.value.status_code == 403
+    assert db.users.calls == 2
+
+
+def _bearer_schemes(dependant):
+    for dependency in dependant.dependencies:
+        if isinstance(dependency.call, HTTPBearer):
+            yield dependency.call
+        yield from _bearer_schemes(dependency)
+
+
+def test_routes_use_the_shared_bearer_scheme():
+    schemes = [
+        scheme
+        for route in app.routes if isinstance(route, APIRoute)
+        for scheme in _bearer_schemes(route.dependant)
+    ]
+    assert schemes
+    assert all(scheme in (auth_deps.security, auth_deps.optional_security) for scheme in schemes)
+
+
+async def test_routes_resolve_the_caller_through_get_current_user_id():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/api/habits/pending-approval")).status_code == 403
+
+        app.dependency_overrides[auth_deps.get_current_user_id] = lambda: str(ObjectId())
+        try:
+            response = await client.get("/api/habits/pending-approval")
+        finally:
+            app.dependency_overrides.pop(auth_deps.get_current_user_id)
+    assert response.status_code == 200 and response.json() == []
@@ -0,0 +1,167 @@
+"""
+Unit tests for the pluggable cache backends (app/services/cache.py).
+"""
+
+import asyncio
+import time
+import pytest
+
+from app.services.cache import (
+    BroadcastInvalidationCache,
+    CacheBackend,
+    InProcessLRUCache,
+    InvalidationBus,
+    UnixSocketInvalidationBus,
+)
+
+
+class LoopbackBus(InvalidationBus):
+    """In-memory bus connecting caches within the test"""
+
+    def __init__(self, peers):
+        super().__init__()
+        self.peers = peers
+        peers.append(self)
+
+    def publish(self, namespace, key):
+        for peer in self.peers:
+            peer._deliver({"origin": self.origin, "namespace": namespace, "key": key})
+
+
+def test_lru_evicts_least_recently_used():
+    cache = InProcessLRUCache(max_entries=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache.get("a") == 1  # touch "a" so "b" is the oldest
+    cache["c"] = 3
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert len(cache) == 2
+
+
+def test_lru_counts_hits_misses_and_evictions():
+    cache = InProcessLRUCache(max_entries=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    cache["c"] = 3  # evicts "a"
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+    assert stats["hit_rate"] == 0.5
+
+
+def test_expired_entries_are_purged_lazily(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(time, "monotonic", lambda: clock["now"])
+    cache = InProcessLRUCache(max_entries=10, default_ttl_seconds=60)
+    cache.set("short", 1, ttl_seconds=5)
+    cache["default"] = 2
+    cache.set("long", 3, ttl_seconds=300)
+
+    clock["now"] += 10
+    assert "short" not in cache
+    assert len(cache) == 3  # not purged until touched
+    assert cache.get("short") is None
+    assert len(cache) == 2
+
+    clock["now"] += 60
+    cache["fresh"] = 4  # the write sweeps the expired "default" off the cold end
+    assert "default" not in cache
+    assert len(cache) == 2
+    assert cache.get("long") == 3
+    assert cache.stats()["expirations"] == 2
+
+
+def test_write_sweeps_at_most_one_purge_batch(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(InProcessLRUCache, "PURGE_BATCH", 2)
+    cache = InProcessLRUCache(max_entries=10)
+    for key in "abcde":
+        cache.set(key, key, ttl_seconds=5)
+
+    clock["now"] += 10
+    cache["fresh"] = 1
+    assert len(cache) == 4  # only the two coldest were looked at
+    assert cache.stats()["expirations"] == 2
+
+
+def test_backend_missing_an_override_fails_at_construction():
+    class NoLen(CacheBackend):
+        def get(self, key, default=None):
+            return default
+
+        def set(self, key, value, ttl_seconds=None):
+            pass
+
+        def delete(self, key):
+            pass
+
+        def clear(self):
+            pass
+
+    with pytest.raises(TypeError):
+        NoLen()
+
+
+def test_invalidation_bus_without_publish_cannot_be_constructed():
+    class NoPublish(InvalidationBus):
+        pass
+
+    with pytest.raises(TypeError):
+        NoPublish()
+
+
+def test_dict_style_surface():
+    cache = InProcessLRUCache()
+    cache["k"] = {"data": 1}
+    assert cache["k"] == {"data": 1}
+    assert cache.pop("k") == {"data": 1}
+    assert cache.pop("k", "gone") == "gone"
+    with pytest.raises(KeyError):
+        cache["k"]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_workers():
+    peers = []
+    worker_a = BroadcastInvalidationCache("streaks", InProcessLRUCache(), LoopbackBus(peers))
+    worker_b = BroadcastInvalidationCache("streaks", InProcessLRUCache(), LoopbackBus(peers))
+    other_ns = BroadcastInvalidationCache("users", InProcessLRUCache(), LoopbackBus(peers))
+    for cache in (worker_a, worker_b, other_ns):
+        await cache.start()
+        cache["h1"] = "stale"
+
+    worker_a.invalidate("h1")
+
+    assert "h1" not in worker_a
+    assert "h1" not in worker_b
+    assert "h1" in other_ns  # different namespace is untouched
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_bus_delivers_between_processes_sharing_a_dir(tmp_path):
+    worker_a = BroadcastInvalidationCache("streaks", InProcessLRUCache(), UnixSocketInvalidationBus(str(tmp_path)))
+    worker_b = BroadcastInvalidationCache("streaks", InProcessLRUCache(), UnixSocketInvalidationBus(str(tmp_path)))
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        worker_a["h1"] = "a"
+        worker_b["h1"] = "b"
+
+        worker_a.invalidate("h1")
+        for _ in range(50):
+            if "h1" not in worker_b:
+                break
+            await asyncio.sleep(0.01)
+
+        assert "h1" not in worker_b
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
+    assert list(tmp_path.glob("*.sock")) == []
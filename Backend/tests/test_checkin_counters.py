@@ -0,0 +1,125 @@
+"""
+Unit tests for the running check-in counters (app/services/checkin_counters.py).
+"""
+
+import pytest
+from bson import ObjectId
+
+from app.services.checkin_counters import CheckinCounterService
+
+FREQUENCY_GOAL = {"goal_type": "frequency", "frequency_count": 3, "duration_count": 4}
+TARGET_GOAL = {"goal_type": "completion", "target_value": 100}
+
+
+@pytest.mark.parametrize("before, after, expected", [
+    (None, {"completed": True}, (1, 0)),                                    # first check-in
+    ({"completed": False}, {"completed": True, "value": 5}, (1, 5)),        # check-in after a miss
+    ({"completed": True, "value": 5}, {"completed": False, "value": 5}, (-1, -5)),  # un-check
+    ({"completed": True, "value": 5}, {"completed": True, "value": 8}, (0, 3)),     # value changed
+    ({"completed": True}, {"completed": True}, (0, 0)),                     # re-log
+    (None, {"completed": False}, (0, 0)),
+])
+def test_log_delta(before, after, expected):
+    assert CheckinCounterService.log_delta(before, after) == expected
+
+
+def test_goal_increments_follow_goal_type():
+    assert CheckinCounterService.goal_increments("u1", FREQUENCY_GOAL, 1, 5) == {
+        "goals.u1.count_checkins": 1,
+        "goals.u1.goal_progress": 1,
+    }
+    assert CheckinCounterService.goal_increments("u1", TARGET_GOAL, -1, -5) == {
+        "goals.u1.count_checkins": -1,
+        "goals.u1.goal_progress": -5,
+    }
+    assert CheckinCounterService.goal_increments("u1", TARGET_GOAL, 0, 3) == {"goals.u1.goal_progress": 3}
+
+
+class FakeFind:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.updates = []
+        self.bulk_calls = []
+
+    def find(self, query, projection=None):
+        return FakeFind(self.docs)
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_calls.append(ops)
+
+
+class FakeLogs:
+    """Serves per-user rows to the user aggregation and per-(habit, user) rows to the goal one"""
+
+    def __init__(self, user_rows=(), goal_rows=()):
+        self.user_rows = list(user_rows)
+        self.goal_rows = list(goal_rows)
+
+    def aggregate(self, pipeline):
+        by_goal = "habit_id" in pipeline[1]["$group"]["_id"]
+        return FakeFind(self.goal_rows if by_goal else self.user_rows)
+
+
+class FakeDB:
+    def __init__(self, users=(), habits=(), user_rows=(), goal_rows=()):
+        self.users = FakeCollection(users)
+        self.habits = FakeCollection(habits)
+        self.habit_logs = FakeLogs(user_rows, goal_rows)
+
+
+async def test_user_counter_is_only_incremented_once_seeded():
+    db = FakeDB()
+    user_id = str(ObjectId())
+
+    await CheckinCounterService.record_user_checkin(db, user_id, -1)
+    await CheckinCounterService.record_user_checkin(db, user_id, 0)
+
+    (query, update), = db.users.updates
+    assert query == {"_id": ObjectId(user_id), "total_checkins": {"$exists": True}}
+    assert update == {"$inc": {"total_checkins": -1}}
+
+
+async def test_reconcile_all_fixes_only_drifted_counters():
+    ana, bo = ObjectId(), ObjectId()
+    habit = {"_id": ObjectId(), "goals": {
+        str(ana): {**TARGET_GOAL, "count_checkins": 2, "goal_progress": 30},   # correct
+        str(bo): {**FREQUENCY_GOAL, "count_checkins": 5, "goal_progress": 5},  # drifted
+    }}
+    db = FakeDB(
+        users=[{"_id": ana, "total_checkins": 2}, {"_id": bo, "total_checkins": 7}],
+        habits=[habit],
+        user_rows=[{"_id": str(ana), "count": 2}],  # bo's logs are gone
+        goal_rows=[
+            {"_id": {"habit_id": str(habit["_id"]), "user_id": str(ana)}, "count": 2, "value": 30},
+            {"_id": {"habit_id": str(habit["_id"]), "user_id": str(bo)}, "count": 3, "value": 0},
+        ],
+    )
+
+    counts = await CheckinCounterService.reconcile_all(db, batch_size=10)
+
+    assert counts == {"users": 2, "users_fixed": 1, "goals": 2, "goals_fixed": 1}
+    (user_fix,), = db.users.bulk_calls
+    assert user_fix._filter == {"_id": bo} and user_fix._doc == {"$set": {"total_checkins": 0}}
+    (goal_fix,), = db.habits.bulk_calls
+    assert goal_fix._doc == {"$set": {
+        f"goals.{bo}.count_checkins": 3,
+        f"goals.{bo}.goal_progress": 3,
+    }}
@@ -0,0 +1,271 @@
+"""
+Unit tests for the materialized dashboard views (app/services/dashboard_service.py).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, Response
+from pymongo.errors import DuplicateKeyError
+
+import app.routes.dashboard_apis as dashboard_apis
+import app.services.dashboard_service as dashboard_module
+from app.services.dashboard_service import DashboardService, server_timing
+
+USER_ID = str(ObjectId())
+
+VIEW_DATA = {
+    "user": {"display_name": "Ana", "username": "ana"},
+    "streaks": [{"habit_id": "h1", "habit_name": "Read", "current_streak": 3, "category": "Mind"}],
+    "todays_goals": [{"habit_id": "h1", "habit_name": "Read", "checked_in_today": True, "category": "Mind"}],
+    "partner_progress": [],
+    "partnership": {"partner_name": "Bo", "partner_username": "bo", "total_active_habits": 1},
+    "activity_summary": {"total_partners": 1, "total_habits": 1, "total_goals": 0, "total_checkins": 9},
+}
+
+
+class FakeViews:
+    """Just enough of a collection for one view doc, honouring the generation guard"""
+
+    def __init__(self, doc=None):
+        self.doc = doc
+
+    async def find_one(self, query, projection=None):
+        return dict(self.doc) if self.doc else None
+
+    async def insert_one(self, doc):
+        if self.doc:
+            raise DuplicateKeyError("duplicate view")
+        self.doc = dict(doc)
+
+    async def replace_one(self, query, doc):
+        if self.doc and self.doc.get("generation") == query["generation"]:
+            self.doc = {"_id": self.doc["_id"], **doc}
+
+    async def update_many(self, query, update):
+        if self.doc and self.doc["_id"] in query["_id"]["$in"]:
+            self.doc.update(update["$set"])
+            self.doc["generation"] += update["$inc"]["generation"]
+
+    async def delete_one(self, query):
+        self.doc = None
+
+
+class FakeDB:
+    def __init__(self, doc=None):
+        self.dashboard_views = FakeViews(doc)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeCollection:
+    """Answers find/count_documents from canned results, recording every query"""
+
+    def __init__(self, docs=(), count=0, by_id=None):
+        self.docs = list(docs)
+        self.count = count
+        self.by_id = by_id or {}
+        self.queries = []
+
+    async def find_one(self, query):
+        self.queries.append(query)
+        return self.by_id.get(query["_id"])
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor(self.docs)
+
+    async def count_documents(self, query):
+        self.queries.append(query)
+        return self.count
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+
+    async def fake_build(db, user_id, timings=None):
+        calls.append(user_id)
+        return dict(VIEW_DATA)
+
+    monkeypatch.setattr(dashboard_module.DashboardService, "build_view", fake_build)
+    monkeypatch.setattr(DashboardService, "_pending", set())
+    return calls
+
+
+def stored_view(**overrides):
+    return {
+        "_id": ObjectId(USER_ID),
+        **VIEW_DATA,
+        "version": DashboardService.VIEW_VERSION,
+        "built_for": DashboardService._today(),
+        "generation": 0,
+        "stale": False,
+        **overrides,
+    }
+
+
+async def test_fresh_view_is_served_without_building(builds):
+    db = FakeDB(stored_view())
+
+    view = await DashboardService.get_view(db, USER_ID)
+
+    assert view["activity_summary"]["total_checkins"] == 9
+    assert builds == []
+
+
+@pytest.mark.parametrize("overrides", [
+    {"stale": True},
+    {"built_for": DashboardService._today() - timedelta(days=1)},
+    {"version": DashboardService.VIEW_VERSION - 1},
+])
+async def test_outdated_view_is_rebuilt_on_read(builds, overrides):
+    db = FakeDB(stored_view(**overrides))
+
+    await DashboardService.get_view(db, USER_ID)
+
+    assert builds == [USER_ID]
+    assert DashboardService.is_fresh(db.dashboard_views.doc)
+
+
+async def test_rebuild_does_not_overwrite_a_newer_change(builds, monkeypatch):
+    db = FakeDB(stored_view())
+
+    async def build_while_marked_stale(_db, user_id, timings=None):
+        db.dashboard_views.doc.update({"stale": True, "generation": 1})
+        return dict(VIEW_DATA)
+
+    monkeypatch.setattr(dashboard_module.DashboardService, "build_view", build_while_marked_stale)
+    await DashboardService.rebuild(db, USER_ID)
+
+    assert db.dashboard_views.doc["stale"] is True
+
+
+async def test_first_build_does_not_overwrite_a_change_made_while_building(builds, monkeypatch):
+    db = FakeDB()
+
+    async def build_while_marked_stale(_db, user_id, timings=None):
+        await DashboardService.mark_stale(db, [user_id])
+        return dict(VIEW_DATA)
+
+    async def fake_enqueue(func, *args, job_name=None, **kwargs):
+        return True
+
+    monkeypatch.setattr(dashboard_module.job_queue, "enqueue", fake_enqueue)
+    monkeypatch.setattr(dashboard_module.DashboardService, "build_view", build_while_marked_stale)
+    await DashboardService.rebuild(db, USER_ID)
+
+    assert db.dashboard_views.doc["stale"] is True and db.dashboard_views.doc["generation"] == 1
+
+
+async def test_dashboard_recovers_once_the_user_gets_a_partner(builds, monkeypatch):
+    db = FakeDB()
+    partnered = False
+
+    async def build(_db, user_id, timings=None):
+        return dict(VIEW_DATA) if partnered else {"not_found": "No active partnership found"}
+
+    async def fake_enqueue(func, *args, job_name=None, **kwargs):
+        return True
+
+    monkeypatch.setattr(dashboard_module.job_queue, "enqueue", fake_enqueue)
+    monkeypatch.setattr(dashboard_module.DashboardService, "build_view", build)
+
+    with pytest.raises(HTTPException) as error:
+        await dashboard_apis.get_dashboard_home(Response(), user_id=USER_ID, db=db)
+    assert error.value.status_code == 404
+
+    partnered = True
+    await DashboardService.mark_stale(db, [USER_ID])  # partnership accepted
+    home = await dashboard_apis.get_dashboard_home(Response(), user_id=USER_ID, db=db)
+
+    assert home.partnership.partner_username == "bo"
+    assert "not_found" not in db.dashboard_views.doc
+
+
+async def test_mark_stale_flags_view_and_queues_one_rebuild(builds, monkeypatch):
+    jobs = []
+
+    async def fake_enqueue(func, *args, job_name=None, **kwargs):
+        jobs.append(args)
+        return True
+
+    monkeypatch.setattr(dashboard_module.job_queue, "enqueue", fake_enqueue)
+    db = FakeDB(stored_view())
+
+    await DashboardService.mark_stale(db, [USER_ID])
+    await DashboardService.mark_stale(db, [ObjectId(USER_ID)])  # still queued
+
+    assert db.dashboard_views.doc["stale"] is True
+    assert jobs == [(db, [USER_ID])]
+
+    await DashboardService._rebuild_queued(*jobs[0])
+    assert builds == [USER_ID] and not db.dashboard_views.doc["stale"]
+
+
+def test_to_response_ages_partner_activity():
+    now = datetime(2025, 1, 15, 12)
+    view = {**VIEW_DATA, "partner_progress": [
+        {"partner_name": "Bo", "habit_name": "Read", "checked_in_at": now - timedelta(hours=5)},
+        {"partner_name": "Bo", "habit_name": "Run", "checked_in_at": now - timedelta(hours=50)},
+    ]}
+
+    response = DashboardService.to_response(view, now)
+
+    assert [(item.habit_name, item.hours_ago) for item in response.partner_progress] == [("Read", 5)]
+
+
+async def test_build_view_reads_partnerships_once_and_times_each_query(monkeypatch):
+    me, partner = ObjectId(USER_ID), ObjectId()
+    partnerships = [
+        {"_id": ObjectId(), "user_id_1": me, "user_id_2": partner},
+        {"_id": ObjectId(), "user_id_1": ObjectId(), "user_id_2": me},
+    ]
+    habit = {"_id": ObjectId(), "habit_name": "Read", "category": "Mind",
+             "goals": {USER_ID: {"goal_status": "active"}}}
+
+    async def fake_streaks(db, habit_ids, partnership_ids):
+        return {habit_ids[0]: {"current_streak": 3}}
+
+    monkeypatch.setattr(dashboard_module.StreakCalculationService, "get_streaks_cached_many", fake_streaks)
+    db = FakeDB()
+    db.users = FakeCollection(by_id={
+        me: {"_id": me, "username": "ana", "total_checkins": 9},
+        partner: {"_id": partner, "username": "bo", "display_name": "Bo"},
+    })
+    db.partnerships = FakeCollection(partnerships)
+    db.habits = FakeCollection([habit], count=4)
+    db.habit_logs = FakeCollection([])
+
+    timings = {}
+    view = await DashboardService.build_view(db, USER_ID, timings)
+
+    assert len(db.partnerships.queries) == 1
+    assert view["partnership"]["partner_name"] == "Bo"
+    assert view["streaks"][0]["current_streak"] == 3
+    assert view["activity_summary"] == {"total_partners": 2, "total_habits": 4, "total_goals": 1, "total_checkins": 9}
+    # The counts span every active partnership from the same query; the check-in total is
+    # the counter on the user doc, so habit_logs is never counted
+    all_ids = {"$in": [str(p["_id"]) for p in partnerships]}
+    assert sum(q.get("partnership_id") == all_ids for q in db.habits.queries) == 2  # total habits, goals
+    assert set(timings) == {
+        "user", "partnerships", "partner", "habits",
+        "todays_logs", "streaks", "partner_logs", "total_habits", "goals",
+    }
+    assert server_timing({"view": 1.24, "user": 0.5}) == "view;dur=1.2, user;dur=0.5"
@@ -0,0 +1,98 @@
+"""
+Unit tests for the request-scoped identity map (app/services/identity_map.py).
+"""
+
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+import app.services.identity_map as identity_map_module
+from app.services.identity_map import IdentityMapDatabase, identity_map_stats
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = list(docs)
+        self.find_one_calls = 0
+
+    async def find_one(self, query, projection=None):
+        self.find_one_calls += 1
+        await asyncio.sleep(0)
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                if projection:
+                    return {k: v for k, v in doc.items() if k == "_id" or k in projection}
+                return doc
+        return None
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                doc.update(update["$set"])
+
+
+class FakeDB:
+    def __init__(self, users):
+        self.users = FakeCollection(users)
+        self.name = "pact_db"
+
+
+@pytest.fixture(autouse=True)
+def fake_collections_are_mapped(monkeypatch):
+    monkeypatch.setattr(
+        identity_map_module, "COLLECTION_TYPES", identity_map_module.COLLECTION_TYPES + (FakeCollection,)
+    )
+
+
+def test_only_collections_are_wrapped():
+    db = IdentityMapDatabase(FakeDB([]))
+    assert isinstance(db.users, identity_map_module.IdentityMapCollection)
+    assert db.name == "pact_db"
+
+
+async def test_repeated_lookup_by_id_is_served_from_the_map():
+    uid = ObjectId()
+    db = IdentityMapDatabase(FakeDB([{"_id": uid, "username": "alice"}]))
+
+    first = await db.users.find_one({"_id": uid})
+    second = await db.users.find_one({"_id": uid})
+    assert first is second
+    assert db.unwrapped.users.find_one_calls == 1
+    assert db.stats() == {"lookups": 2, "saved_round_trips": 1}
+
+
+async def test_concurrent_lookups_share_one_round_trip():
+    uid = ObjectId()
+    db = IdentityMapDatabase(FakeDB([{"_id": uid, "username": "alice"}]))
+
+    docs = await asyncio.gather(*[db.users.find_one({"_id": uid}) for _ in range(3)])
+    assert all(doc["username"] == "alice" for doc in docs)
+    assert db.unwrapped.users.find_one_calls == 1
+
+
+async def test_full_documents_from_other_filters_are_registered():
+    uid = ObjectId()
+    db = IdentityMapDatabase(FakeDB([{"_id": uid, "username": "alice"}]))
+
+    await db.users.find_one({"username": "alice"}, {"username": 1})  # projected: not registered
+    await db.users.find_one({"username": "alice"})
+    await db.users.find_one({"_id": uid})
+    assert db.unwrapped.users.find_one_calls == 2
+
+
+async def test_writes_evict_and_close_folds_into_totals():
+    uid = ObjectId()
+    db = IdentityMapDatabase(FakeDB([{"_id": uid, "username": "alice"}]))
+    before = identity_map_stats()
+
+    await db.users.find_one({"_id": uid})
+    await db.users.find_one({"_id": uid})
+    await db.users.update_one({"_id": uid}, {"$set": {"username": "alicia"}})
+    assert (await db.users.find_one({"_id": uid}))["username"] == "alicia"
+    assert db.unwrapped.users.find_one_calls == 2
+
+    db.close()
+    after = identity_map_stats()
+    assert after["requests"] == before["requests"] + 1
+    assert after["saved_round_trips"] == before["saved_round_trips"] + 1
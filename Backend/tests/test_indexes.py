@@ -0,0 +1,146 @@
+"""
+Unit tests for the index registry (config/indexes.py). No Mongo required.
+"""
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from config.indexes import (
+    HOT_QUERIES,
+    INDEX_REGISTRY,
+    OBSOLETE_INDEXES,
+    ensure_indexes,
+    query_uses_index,
+    unindexed_hot_queries,
+)
+
+
+class FakeDatabase:
+    def __init__(self, fail_on=None):
+        self.commands = []
+        self.fail_on = fail_on
+
+    async def command(self, name, collection, **kwargs):
+        option = next(key for key in kwargs["index"] if key != "name")
+        if option == self.fail_on:
+            raise OperationFailure("Cannot convert the index to unique", code=359)
+        self.commands.append((name, collection, kwargs))
+
+
+class FakeCollection:
+    def __init__(self, name="c", fail_on=None, conflicts=None, collmod_fails_on=None):
+        self.name = name
+        self.database = FakeDatabase(collmod_fails_on)
+        self.created = []
+        self.dropped = []
+        self.fail_on = fail_on
+        self.conflicts = dict(conflicts or {})  # existing indexes built with other options
+
+    async def create_indexes(self, models):
+        for model in models:
+            if self.fail_on and model.document["name"] == self.fail_on:
+                raise OperationFailure("E11000 duplicate key error")
+            if model.document["name"] in self.conflicts:
+                raise OperationFailure("Index already exists with different options", code=86)
+        names = [model.document["name"] for model in models]
+        self.created.extend(names)
+        return names
+
+    async def index_information(self):
+        return self.conflicts
+
+    async def drop_index(self, name):
+        if name in self.conflicts:
+            raise AssertionError("conflicting index dropped before its replacement exists")
+        raise OperationFailure("index not found with name [%s]" % name)
+
+
+class FakeDB(dict):
+    def __getitem__(self, name):
+        return self.setdefault(name, FakeCollection(name))
+
+
+def test_every_hot_query_has_an_index():
+    # A failure here means a route query would be a COLLSCAN: add an index to
+    # INDEX_REGISTRY (or fix the query) before shipping it
+    assert unindexed_hot_queries() == []
+
+
+def test_query_on_unindexed_field_is_reported():
+    assert not query_uses_index("habit_logs", {"completed": True})
+    assert not query_uses_index("notifications", {"related_id": "x"})
+
+
+def test_or_needs_every_branch_indexed():
+    assert query_uses_index("partnerships", {"$or": [{"user_id_1": 1}, {"user_id_2": 1}]})
+    assert not query_uses_index("partnerships", {"$or": [{"user_id_1": 1}, {"status": "active"}]})
+    # ... unless a top-level field is indexed on its own
+    assert query_uses_index("partnerships", {"_id": 1, "$or": [{"user_id_1": 1}, {"status": "active"}]})
+
+
+def test_hot_queries_name_collections_in_the_registry():
+    assert {q["collection"] for q in HOT_QUERIES} <= set(INDEX_REGISTRY)
+    assert len({q["name"] for q in HOT_QUERIES}) == len(HOT_QUERIES)
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_is_idempotent_and_tolerates_failures():
+    db = FakeDB()
+    db["streaks"] = FakeCollection(fail_on="habit_id_1")
+
+    first = await ensure_indexes(db)
+    second = await ensure_indexes(db)
+
+    assert "habit_logs.habit_id_1_log_date_1" in first["created"]
+    assert first["created"] == second["created"]
+    # The unique streaks index failed but every other collection still got its indexes
+    assert [f["collection"] for f in first["failed"]] == ["streaks"]
+    assert "notifications.user_id_1_is_read_1_archived_1_created_at_-1__id_-1" in first["created"]
+    # Obsolete indexes that are already gone are skipped quietly
+    assert first["dropped"] == []
+    assert set(OBSOLETE_INDEXES) <= set(db)
+
+
+DAY_INDEX = "habit_id_1_user_id_1_log_date_1"
+DAY_KEY = [("habit_id", 1), ("user_id", 1), ("log_date", 1)]
+
+
+@pytest.mark.asyncio
+async def test_index_that_became_unique_is_converted_in_place():
+    # habit_logs' per-day index used to be non-unique
+    db = FakeDB()
+    db["habit_logs"] = FakeCollection("habit_logs", conflicts={DAY_INDEX: {"key": DAY_KEY}})
+
+    summary = await ensure_indexes(db)
+
+    assert db["habit_logs"].database.commands == [
+        ("collMod", "habit_logs", {"index": {"name": DAY_INDEX, "prepareUnique": True}}),
+        ("collMod", "habit_logs", {"index": {"name": DAY_INDEX, "unique": True}}),
+    ]
+    assert "habit_logs." + DAY_INDEX in summary["created"]
+    assert summary["failed"] == []
+
+
+@pytest.mark.asyncio
+async def test_failed_unique_conversion_keeps_the_existing_index():
+    # Duplicate check-ins: the conversion fails and the old index stays (never dropped)
+    db = FakeDB()
+    db["habit_logs"] = FakeCollection(
+        "habit_logs", conflicts={DAY_INDEX: {"key": DAY_KEY}}, collmod_fails_on="unique"
+    )
+
+    summary = await ensure_indexes(db)
+
+    assert [f["keys"] for f in summary["failed"]] == [DAY_KEY]
+    assert "habit_logs." + DAY_INDEX not in summary["created"]
+
+
+@pytest.mark.asyncio
+async def test_other_option_conflicts_are_reported_not_rebuilt():
+    db = FakeDB()
+    db["habit_logs"] = FakeCollection("habit_logs", conflicts={"habit_id_1_log_date_1": {"key": []}})
+
+    summary = await ensure_indexes(db)
+
+    assert db["habit_logs"].database.commands == []
+    assert [f["collection"] for f in summary["failed"]] == ["habit_logs"]
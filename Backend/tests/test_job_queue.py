@@ -0,0 +1,114 @@
+"""
+Unit tests for the in-process background job queue (app/services/job_queue.py).
+"""
+
+import asyncio
+import pytest
+
+from app.services.job_queue import BackgroundJobQueue
+
+
+@pytest.mark.asyncio
+async def test_queued_jobs_run_in_background_and_drain_on_stop():
+    queue = BackgroundJobQueue(max_size=10, concurrency=2)
+    await queue.start()
+    done = []
+
+    async def job(n):
+        await asyncio.sleep(0.01)
+        done.append(n)
+
+    for n in range(5):
+        assert await queue.enqueue(job, n) is True
+
+    # Nothing has had a chance to run yet - enqueue returns immediately
+    assert done == []
+
+    await queue.stop()
+    assert sorted(done) == [0, 1, 2, 3, 4]
+    metrics = queue.metrics()
+    assert metrics["enqueued"] == 5
+    assert metrics["completed"] == 5
+    assert metrics["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_counted():
+    queue = BackgroundJobQueue(max_size=10, concurrency=1, max_retries=2, retry_backoff_seconds=0)
+    await queue.start()
+    attempts = {"flaky": 0, "broken": 0}
+
+    async def flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 2:
+            raise RuntimeError("transient")
+
+    async def broken():
+        attempts["broken"] += 1
+        raise RuntimeError("permanent")
+
+    await queue.enqueue(flaky)
+    await queue.enqueue(broken)
+    await queue.stop()
+
+    assert attempts == {"flaky": 2, "broken": 3}
+    metrics = queue.metrics()
+    assert metrics["completed"] == 1
+    assert metrics["failed"] == 1
+    assert metrics["retried"] == 3
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure_by_running_inline():
+    queue = BackgroundJobQueue(max_size=1, concurrency=1)
+    await queue.start()
+    release = asyncio.Event()
+    ran = []
+
+    async def blocker():
+        await release.wait()
+
+    async def job(n):
+        ran.append(n)
+
+    await queue.enqueue(blocker)
+    await asyncio.sleep(0)  # let the worker pick up the blocker
+    assert await queue.enqueue(job, 1) is True  # fills the single slot
+    assert await queue.enqueue(job, 2) is False  # full → runs inline
+    assert ran == [2]
+
+    release.set()
+    await queue.stop()
+    assert sorted(ran) == [1, 2]
+    assert queue.metrics()["rejected_full"] == 1
+    assert queue.metrics()["ran_inline"] == 1
+
+
+@pytest.mark.asyncio
+async def test_enqueue_runs_inline_when_not_started():
+    queue = BackgroundJobQueue()
+    ran = []
+
+    async def job():
+        ran.append(True)
+
+    assert await queue.enqueue(job) is False
+    assert ran == [True]
+
+
+@pytest.mark.asyncio
+async def test_inline_fallback_is_not_retried():
+    queue = BackgroundJobQueue(max_retries=3, retry_backoff_seconds=10)
+    attempts = []
+
+    async def broken():
+        attempts.append(True)
+        raise RuntimeError("permanent")
+
+    # A backoff sleep here would hold the caller for 10s+
+    assert await asyncio.wait_for(queue.enqueue(broken), timeout=1) is False
+    assert attempts == [True]
+    metrics = queue.metrics()
+    assert metrics["ran_inline"] == 1
+    assert metrics["failed"] == 1
+    assert metrics["retried"] == 0
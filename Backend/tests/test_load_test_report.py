@@ -0,0 +1,49 @@
+"""
+Unit tests for the load test's reporting helpers (benchmarks/load_test.py).
+"""
+
+from benchmarks.load_test import LatencyRecorder, compare, percentile
+
+
+def test_percentile_nearest_rank():
+    samples = [float(n) for n in range(1, 101)]
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 95) == 95
+    assert percentile(samples, 99) == 99
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_compare_flags_only_regressions_past_tolerance():
+    baseline = {"endpoints": {
+        "checkin": {"p95_ms": 100.0, "rps": 50.0},
+        "login": {"p95_ms": 200.0, "rps": 10.0},
+    }}
+    current = {"endpoints": {
+        "checkin": {"p95_ms": 115.0, "rps": 45.0},  # within 20%
+        "login": {"p95_ms": 300.0, "rps": 7.0},  # slower and fewer rps
+        "notifications": {"p95_ms": 10.0, "rps": 5.0},  # not in the baseline yet
+    }}
+
+    regressions = compare(current, baseline, tolerance=0.2)
+
+    assert regressions == ["login: p95 200.0ms → 300.0ms", "login: rps 10.0 → 7.0"]
+
+
+
+def test_recorded_report_is_compared_against_a_stored_baseline():
+    recorder = LatencyRecorder()
+    recorder.samples["checkin"] = [float(ms) for ms in range(10, 30)]
+    recorder.samples["login"] = [50.0] * 20
+    baseline = {"endpoints": recorder.report(wall_seconds=2.0)}
+
+    # Same run is no regression; a slower check-in on a longer run is
+    assert compare({"endpoints": recorder.report(wall_seconds=2.0)}, baseline, tolerance=0.2) == []
+    recorder.samples["checkin"] = [float(ms) for ms in range(20, 40)]
+    regressions = compare({"endpoints": recorder.report(wall_seconds=4.0)}, baseline, tolerance=0.2)
+
+    assert regressions == [
+        "login: rps 10.0 → 5.0",
+        "checkin: p95 28.0ms → 38.0ms",
+        "checkin: rps 10.0 → 5.0",
+    ]
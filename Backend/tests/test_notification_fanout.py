@@ -0,0 +1,140 @@
+"""
+Unit tests for bulk notification fan-out (NotificationService.send_many and
+ConnectionManager.send_many).
+"""
+
+import asyncio
+import time
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import app.services.websocket as websocket_module
+from app.services.notification_service import NotificationService
+from app.services.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def send_json(self, message):
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.find_calls = 0
+
+    def find(self, query, projection=None):
+        self.find_calls += 1
+        return FakeCursor([self.docs[_id] for _id in query["_id"]["$in"] if _id in self.docs])
+
+
+class FakeNotifications:
+    def __init__(self, fail_indexes=()):
+        self.fail_indexes = set(fail_indexes)
+        self.inserted = []
+        self.insert_many_calls = 0
+
+    async def insert_many(self, docs, ordered=True):
+        self.insert_many_calls += 1
+        assert ordered is False
+        for i, doc in enumerate(docs):
+            doc["_id"] = ObjectId()
+            if i not in self.fail_indexes:
+                self.inserted.append(doc)
+        if self.fail_indexes:
+            raise BulkWriteError({"writeErrors": [{"index": i} for i in self.fail_indexes]})
+
+
+class FakeDB:
+    def __init__(self, users, fail_indexes=()):
+        self.users = FakeUsers(users)
+        self.notifications = FakeNotifications(fail_indexes)
+
+
+@pytest.fixture
+def service():
+    NotificationService.preference_cache.clear()
+    yield NotificationService()
+    NotificationService.preference_cache.clear()
+
+
+async def test_slow_socket_does_not_block_the_others(monkeypatch):
+    monkeypatch.setattr(websocket_module, "SEND_TIMEOUT_SECONDS", 0.05)
+    manager = ConnectionManager()
+    fast = [FakeWebSocket() for _ in range(3)]
+    slow = FakeWebSocket(delay=1.0)
+    for i, ws in enumerate(fast):
+        manager.active_connections[f"fast{i}"] = ws
+    manager.active_connections["slow"] = slow
+
+    started = time.monotonic()
+    delivered = await manager.broadcast(["fast0", "fast1", "slow", "fast2", "offline"], {"type": "nudge"})
+
+    assert time.monotonic() - started < 0.5
+    assert delivered == 3
+    assert all(len(ws.sent) == 1 for ws in fast)
+    assert "slow" not in manager.active_connections
+
+
+async def test_send_many_filters_in_bulk_and_inserts_once(service, monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr("app.services.notification_service.manager", manager)
+    opted_in, opted_out = ObjectId(), ObjectId()
+    db = FakeDB([
+        {"_id": opted_in, "notification_preferences": {}},
+        {"_id": opted_out, "notification_preferences": {"habit_reminders": False}},
+    ])
+    socket = FakeWebSocket()
+    manager.active_connections[str(opted_in)] = socket
+
+    reminders = [
+        service.build_habit_reminder(str(uid), "habit-1", "Read")
+        for uid in (opted_in, opted_out, opted_in)
+    ]
+    summary = await service.send_many(reminders, db=db)
+
+    assert summary == {"requested": 3, "blocked": 1, "inserted": 2, "failed": 0, "delivered": 2}
+    assert db.users.find_calls == 1
+    assert db.notifications.insert_many_calls == 1
+    assert [doc["user_id"] for doc in db.notifications.inserted] == [opted_in, opted_in]
+    assert [m["id"] for m in socket.sent] == [str(doc["_id"]) for doc in db.notifications.inserted]
+
+
+async def test_send_many_skips_delivery_for_failed_inserts(service, monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr("app.services.notification_service.manager", manager)
+    first, second = ObjectId(), ObjectId()
+    db = FakeDB([], fail_indexes={0})
+    sockets = {str(first): FakeWebSocket(), str(second): FakeWebSocket()}
+    manager.active_connections.update(sockets)
+
+    summary = await service.send_many(
+        [service.build_habit_reminder(str(uid), "habit-1", "Read") for uid in (first, second)],
+        skip_preference_check=True,
+        db=db
+    )
+
+    assert summary["inserted"] == 1 and summary["failed"] == 1 and summary["delivered"] == 1
+    assert sockets[str(first)].sent == []
+    assert len(sockets[str(second)].sent) == 1
@@ -0,0 +1,147 @@
+"""
+Unit tests for the notification list endpoint (app/routes/notifications.py): display
+fields from stored snapshots, batched lookups for rows without one, and (created_at, _id)
+keyset pagination.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+from app.models.notification import NotificationType
+from app.routes.notifications import decode_cursor, encode_cursor, get_notifications
+
+USER_ID = str(ObjectId())
+
+
+class FakeFind:
+    def __init__(self, docs):
+        self.docs = docs
+        self.limited_to = None
+
+    def sort(self, keys):
+        assert keys == [("created_at", -1), ("_id", -1)]
+        return self
+
+    def limit(self, n):
+        self.limited_to = n
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:self.limited_to] if self.limited_to else self.docs
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.finds = []
+
+    def find(self, query, projection=None):
+        self.finds.append((query, projection))
+        if "_id" in query:
+            wanted = set(query["_id"]["$in"])
+            return FakeFind([doc for doc in self.docs if doc["_id"] in wanted])
+        return FakeFind(self.docs)
+
+
+class FakeDB:
+    def __init__(self, notifications, users=(), habits=()):
+        self.notifications = FakeCollection(notifications)
+        self.users = FakeCollection(users)
+        self.habits = FakeCollection(habits)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def notification(minutes_ago, **fields):
+    return {
+        "_id": ObjectId(),
+        "user_id": ObjectId(USER_ID),
+        "type": NotificationType.PARTNER_CHECKIN.value,
+        "title": "Checked in",
+        "message": "",
+        "is_read": False,
+        "created_at": datetime(2025, 1, 15, 12) - timedelta(minutes=minutes_ago),
+        **fields,
+    }
+
+
+async def list_page(db, **params):
+    response = Response()
+    page = await get_notifications(
+        response, user_id=USER_ID, db=db, include_read=False,
+        before=params.get("before"), limit=params.get("limit", 50)
+    )
+    return page, response.headers.get("X-Next-Cursor")
+
+
+async def test_snapshots_are_served_without_lookups():
+    snapshot = {"partner_username": "bo", "partner_avatar": "bo.png", "habit_name": "Read"}
+    db = FakeDB([notification(1, related_user_id=str(ObjectId()), snapshot=snapshot)])
+
+    page, _ = await list_page(db)
+
+    assert (page[0].partner_username, page[0].partner_avatar, page[0].habit_name) == ("bo", "bo.png", "Read")
+    assert db.users.finds == [] and db.habits.finds == []
+
+
+async def test_rows_without_snapshots_are_looked_up_with_one_query_each():
+    partner, habit = ObjectId(), ObjectId()
+    docs = [
+        notification(1, related_user_id=partner),
+        notification(2, related_user_id=str(partner)),
+        notification(3, type=NotificationType.MISSED_HABIT.value, related_id=str(habit)),
+        notification(4, type=NotificationType.MISSED_HABIT.value, related_id=str(habit), related_user_id=partner),
+    ]
+    db = FakeDB(
+        docs,
+        users=[{"_id": partner, "username": "bo", "profile_picture": "bo.png"}],
+        habits=[{"_id": habit, "habit_name": "Read"}],
+    )
+
+    page, next_cursor = await list_page(db)
+
+    assert [n.partner_username for n in page] == ["bo", "bo", None, "bo"]
+    assert page[0].partner_avatar == "bo.png"
+    assert [n.habit_name for n in page] == [None, None, "Read", "Read"]
+    assert len(db.users.finds) == 1 and len(db.habits.finds) == 1
+    assert db.users.finds[0][0] == {"_id": {"$in": [partner]}}
+    assert "password" not in db.users.finds[0][1]
+    assert next_cursor is None
+
+
+async def test_pages_follow_created_at_and_id_cursor():
+    docs = [notification(i) for i in range(3)]
+    db = FakeDB(docs)
+
+    page, next_cursor = await list_page(db, limit=2)
+
+    assert [n.id for n in page] == [str(docs[0]["_id"]), str(docs[1]["_id"])]
+    assert decode_cursor(next_cursor) == (docs[1]["created_at"], docs[1]["_id"])
+    query, _ = db.notifications.finds[0]
+    assert "$or" not in query
+    assert query["archived"] == {"$in": [False, None]}  # points, so the index gives the sort
+
+    db.notifications.docs = docs[2:]
+    page, next_cursor = await list_page(db, before=next_cursor, limit=2)
+
+    query, _ = db.notifications.finds[1]
+    assert query["$or"] == [
+        {"created_at": {"$lt": docs[1]["created_at"]}},
+        {"created_at": docs[1]["created_at"], "_id": {"$lt": docs[1]["_id"]}},
+    ]
+    assert [n.id for n in page] == [str(docs[2]["_id"])] and next_cursor is None
+
+
+async def test_malformed_cursor_is_a_bad_request():
+    with pytest.raises(HTTPException) as exc:
+        await list_page(FakeDB([]), before="yesterday")
+    assert exc.value.status_code == 400
+
+
+def test_cursor_round_trips():
+    doc = notification(0)
+    assert decode_cursor(encode_cursor(doc)) == (doc["created_at"], doc["_id"])
@@ -0,0 +1,86 @@
+"""
+Unit tests for cached / bulk notification preference lookups
+(app/services/notification_service.py).
+"""
+
+import pytest
+from bson import ObjectId
+
+from app.services.notification_service import NotificationService
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.calls = []
+
+    async def find_one(self, query, projection=None):
+        self.calls.append(("find_one", projection))
+        return self.docs.get(query["_id"])
+
+    def find(self, query, projection=None):
+        self.calls.append(("find", projection))
+        return FakeCursor([self.docs[_id] for _id in query["_id"]["$in"] if _id in self.docs])
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.users = FakeUsers(docs)
+
+
+@pytest.fixture
+def service():
+    NotificationService.preference_cache.clear()
+    yield NotificationService()
+    NotificationService.preference_cache.clear()
+
+
+async def test_preferences_are_projected_and_cached(service):
+    uid = ObjectId()
+    db = FakeDB([{"_id": uid, "password": "x", "notification_preferences": {"nudges": False}}])
+
+    assert await service.check_user_preferences(str(uid), "partner_nudge", db=db) is False
+    assert await service.check_user_preferences(str(uid), "habit_reminder", db=db) is True
+    assert db.users.calls == [("find_one", {"notification_preferences": 1})]
+
+
+async def test_invalidation_reloads_preferences(service):
+    uid = ObjectId()
+    db = FakeDB([{"_id": uid, "notification_preferences": {"nudges": False}}])
+    assert await service.check_user_preferences(str(uid), "partner_nudge", db=db) is False
+
+    db.users.docs[uid]["notification_preferences"] = {"nudges": True}
+    service.invalidate_user_preferences(str(uid))
+    assert await service.check_user_preferences(str(uid), "partner_nudge", db=db) is True
+    assert len(db.users.calls) == 2
+
+
+async def test_bulk_filter_uses_one_query_for_cache_misses(service):
+    opted_in, opted_out, cached, unknown = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    db = FakeDB([
+        {"_id": opted_in},
+        {"_id": opted_out, "notification_preferences": {"habit_reminders": False}},
+        {"_id": cached, "notification_preferences": {}},
+    ])
+    await service.get_user_preferences(str(cached), db=db)
+    db.users.calls.clear()
+
+    user_ids = [str(opted_in), str(opted_out), str(cached), str(unknown)]
+    allowed = await service.filter_by_preferences(user_ids, "habit_reminder", db=db)
+
+    assert allowed == [str(opted_in), str(cached)]
+    assert db.users.calls == [("find", {"notification_preferences": 1})]
@@ -0,0 +1,118 @@
+"""
+Unit tests for notification display snapshots (NotificationService): written at send
+time, refreshed when a user's avatar or a habit's name changes.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+import app.services.notification_service as notification_module
+from app.models.notification import NotificationType
+from app.services.notification_service import NotificationService
+
+
+class FakeFind:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.finds = []
+        self.inserted = []
+        self.update_many_calls = []
+
+    def find(self, query, projection=None):
+        self.finds.append(query)
+        return FakeFind([self.docs[_id] for _id in query["_id"]["$in"] if _id in self.docs])
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    async def insert_one(self, doc):
+        doc["_id"] = ObjectId()
+        self.inserted.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def update_many(self, query, update):
+        self.update_many_calls.append((query, update))
+        return SimpleNamespace(modified_count=2)
+
+
+class FakeDB:
+    def __init__(self, users=(), habits=()):
+        self.users = FakeCollection(users)
+        self.habits = FakeCollection(habits)
+        self.notifications = FakeCollection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    async def fake_send(user_id, message):
+        return True
+
+    monkeypatch.setattr(notification_module.manager, "send_notification", fake_send)
+    return NotificationService()
+
+
+async def test_send_notification_stores_display_snapshot(service):
+    partner, habit = ObjectId(), ObjectId()
+    db = FakeDB(
+        users=[{"_id": partner, "username": "bo", "profile_photo_url": "bo.png"}],
+        habits=[{"_id": habit, "habit_name": "Read"}],
+    )
+
+    await service.send_notification(
+        user_id=str(ObjectId()),
+        notification_type=NotificationType.PROGRESS_MILESTONE,
+        title="50%",
+        related_id=str(habit),
+        related_user_id=str(partner),
+        skip_preference_check=True,
+        db=db,
+    )
+
+    stored, = db.notifications.inserted
+    assert stored["snapshot"] == {"partner_username": "bo", "partner_avatar": "bo.png", "habit_name": "Read"}
+    assert len(db.users.finds) == 1 and len(db.habits.finds) == 1
+
+
+async def test_refresh_user_snapshots_rewrites_name_and_avatar(service):
+    user = ObjectId()
+    db = FakeDB(users=[{"_id": user, "username": "bo", "profile_picture": "new.png"}])
+
+    assert await service.refresh_user_snapshots(str(user), db=db) == 2
+
+    (query, update), = db.notifications.update_many_calls
+    assert query == {"related_user_id": {"$in": [str(user), user]}, "snapshot": {"$exists": True}}
+    assert update == {"$set": {"snapshot.partner_username": "bo", "snapshot.partner_avatar": "new.png"}}
+
+
+async def test_habit_rename_is_refreshed_on_the_job_queue(service, monkeypatch):
+    habit = ObjectId()
+    db = FakeDB(habits=[{"_id": habit, "habit_name": "Read more"}])
+    wrapped = SimpleNamespace(unwrapped=db)
+    jobs = []
+
+    async def fake_enqueue(func, *args, job_name=None, **kwargs):
+        jobs.append(job_name)
+        await func(*args, **kwargs)
+        return True
+
+    monkeypatch.setattr(notification_module.job_queue, "enqueue", fake_enqueue)
+    await service.queue_habit_snapshot_refresh(wrapped, str(habit))
+
+    assert jobs == ["notification_snapshot_refresh"]
+    (query, update), = db.notifications.update_many_calls
+    assert query["related_id"] == {"$in": [str(habit), habit]}
+    assert set(query["type"]["$in"]) == {"habit_reminder", "missed_habit", "progress_milestone"}
+    assert update == {"$set": {"snapshot.habit_name": "Read more"}}
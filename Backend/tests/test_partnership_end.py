@@ -0,0 +1,150 @@
+"""
+Unit tests for ending a partnership in bulk (PartnershipService.end_partnership).
+"""
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services.partnership_service import PartnershipService
+
+
+class FakeFind:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.finds = []
+        self.find_sessions = []
+        self.writes = []
+
+    def find(self, query, projection=None, session=None):
+        self.finds.append(query)
+        self.find_sessions.append(session)
+        return FakeFind(self.docs)
+
+    async def insert_many(self, docs, session=None):
+        self.writes.append(("insert_many", docs, session))
+
+    async def update_many(self, query, update, session=None):
+        self.writes.append(("update_many", query, update, session))
+
+    async def update_one(self, query, update, session=None):
+        self.writes.append(("update_one", query, update, session))
+
+
+class FakeAdmin:
+    def __init__(self, replica_set=False):
+        self.replica_set = replica_set
+
+    async def command(self, name):
+        if self.replica_set:
+            return {"isWritablePrimary": True, "setName": "rs0"}
+        return {"isWritablePrimary": True}  # standalone: no setName
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def start_transaction(self):
+        return FakeTransaction()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeClient:
+    def __init__(self, replica_set=False):
+        self.admin = FakeAdmin(replica_set)
+        self.session = FakeSession()
+
+    async def start_session(self):
+        return self.session
+
+
+class FakeDB:
+    def __init__(self, habits, streaks, replica_set=False):
+        self.client = FakeClient(replica_set)
+        self.habits = FakeCollection(habits)
+        self.streaks = FakeCollection(streaks)
+        self.streak_history = FakeCollection()
+        self.partnerships = FakeCollection()
+
+
+@pytest.fixture(autouse=True)
+def transaction_support(monkeypatch):
+    # Cached per id(client); fake clients from earlier tests may share an id
+    monkeypatch.setattr(PartnershipService, "_transaction_support", {})
+
+
+async def test_end_partnership_uses_fixed_number_of_writes():
+    partnership = {"_id": ObjectId(), "created_at": datetime(2025, 1, 1)}
+    habits = [{"_id": ObjectId(), "habit_name": f"Habit {i}"} for i in range(3)]
+    streaks = [{
+        "habit_id": habits[0]["_id"],
+        "current_streak": 5,
+        "streak_started_at": None,
+        "last_both_completed_date": datetime(2025, 1, 10),
+    }]
+    db = FakeDB(habits, streaks)
+
+    ended = await PartnershipService.end_partnership(db, partnership)
+
+    assert ended["habits_deactivated"] == 3
+    assert ended["saved_streaks"] == [{"habit_name": "Habit 0", "streak_length": 5}]
+    # Habits stored with either id form are ended; live values come from `streaks` in one $in query
+    assert db.habits.finds[0]["partnership_id"] == {"$in": [str(partnership["_id"]), partnership["_id"]]}
+    assert db.streaks.finds[0]["habit_id"] == {"$in": [h["_id"] for h in habits]}
+
+    (_, records, session), = db.streak_history.writes
+    assert session is None
+    assert records[0]["habit_id"] == str(habits[0]["_id"])
+    assert records[0]["partnership_id"] == str(partnership["_id"])
+    assert records[0]["streak_start_date"] == datetime(2025, 1, 6)
+    assert records[0]["streak_length_days"] == 5 and records[0]["ended_reason"] == "partnership_ended"
+
+    (_, habit_query, habit_update, _), = db.habits.writes
+    assert habit_query == {"_id": {"$in": [h["_id"] for h in habits]}}
+    assert habit_update == {"$set": {"is_active": False, "status": "draft"}}
+    assert db.streaks.writes[0][2]["$set"]["current_streak"] == 0
+    assert db.partnerships.writes[0][2]["$set"]["status"] == "broken"
+
+
+async def test_end_partnership_without_habits_only_updates_partnership():
+    db = FakeDB([], [])
+
+    ended = await PartnershipService.end_partnership(db, {"_id": ObjectId()})
+
+    assert ended["saved_streaks"] == [] and ended["habits_deactivated"] == 0
+    assert db.streak_history.writes == [] and db.habits.writes == [] and db.streaks.finds == []
+    assert len(db.partnerships.writes) == 1
+
+
+async def test_end_partnership_reads_inside_the_transaction():
+    partnership = {"_id": ObjectId()}
+    habits = [{"_id": ObjectId(), "habit_name": "Read"}]
+    streaks = [{"habit_id": habits[0]["_id"], "current_streak": 2, "last_both_completed_date": datetime(2025, 1, 10)}]
+    db = FakeDB(habits, streaks, replica_set=True)
+
+    ended = await PartnershipService.end_partnership(db, partnership)
+
+    assert ended["saved_streaks"] == [{"habit_name": "Read", "streak_length": 2}]
+    assert db.habits.find_sessions == [db.client.session]
+    assert db.streaks.find_sessions == [db.client.session]
+    assert all(write[-1] is db.client.session for write in db.streak_history.writes + db.habits.writes)
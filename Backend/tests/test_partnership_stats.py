@@ -0,0 +1,163 @@
+"""
+Tests for the partnership stats counts, cached stats doc and batched partner resolution
+(app/services/partnership_service.py).
+
+The stats doc and resolver tests run against fakes; the aggregation test needs a real mongod
+(see the `mongo_url` fixture) and is skipped otherwise.
+"""
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import app.services.partnership_service as partnership_module
+from app.services.partnership_service import PartnershipService
+
+PARTNERSHIP_ID = str(ObjectId())
+
+
+class FakeStats:
+    def __init__(self, doc=None):
+        self.doc = doc
+        self.updates = []
+
+    async def find_one(self, query):
+        return self.doc
+
+    async def update_one(self, query, update, upsert=False):
+        self.updates.append((query, update, upsert))
+
+
+class FakeDB:
+    def __init__(self, doc=None):
+        self.partnership_stats = FakeStats(doc)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def fake_counts(monkeypatch, counts):
+    calls = []
+
+    async def checkin_counts(db, habit_ids):
+        calls.append(habit_ids)
+        return counts
+
+    monkeypatch.setattr(partnership_module.PartnershipService, "checkin_counts", checkin_counts)
+    return calls
+
+
+async def test_missing_stats_doc_is_rebuilt_from_logs(monkeypatch):
+    calls = fake_counts(monkeypatch, {"h1": 3})
+    db = FakeDB()
+
+    stats = await PartnershipService.get_stats(db, PARTNERSHIP_ID, ["h1", "h2"])
+
+    assert stats["checkins_by_habit"] == {"h1": 3}
+    assert calls == [["h1", "h2"]]
+    query, update, upsert = db.partnership_stats.updates[0]
+    assert query == {"_id": ObjectId(PARTNERSHIP_ID)} and upsert
+    assert update["$set"]["checkins_by_habit"] == {"h1": 3}
+
+
+async def test_fresh_stats_doc_is_served_without_counting(monkeypatch):
+    calls = fake_counts(monkeypatch, {})
+    doc = {"checkins_by_habit": {"h1": 7}, "rebuilt_at": datetime.utcnow()}
+    db = FakeDB(doc)
+
+    assert await PartnershipService.get_stats(db, PARTNERSHIP_ID, ["h1"]) is doc
+    assert calls == []
+
+    db.partnership_stats.doc = {**doc, "rebuilt_at": datetime.utcnow() - timedelta(days=2)}
+    await PartnershipService.get_stats(db, PARTNERSHIP_ID, ["h1"])
+    assert calls == [["h1"]]
+
+
+async def test_record_checkin_increments_without_creating_the_doc():
+    db = FakeDB()
+
+    await PartnershipService.record_checkin(db, PARTNERSHIP_ID, "h1", -1)
+    await PartnershipService.record_checkin(db, PARTNERSHIP_ID, "h1", 0)
+
+    assert len(db.partnership_stats.updates) == 1
+    _, update, upsert = db.partnership_stats.updates[0]
+    assert update["$inc"] == {"checkins_by_habit.h1": -1} and not upsert
+
+
+async def test_counts_group_by_habit_across_id_types(mongo_url):
+    client = AsyncIOMotorClient(mongo_url)
+    db_name = "pact_partnership_stats"
+    await client.drop_database(db_name)
+    db = client[db_name]
+    try:
+        h1, h2, other = ObjectId(), ObjectId(), ObjectId()
+        await db.habit_logs.insert_many([
+            {"habit_id": str(h1), "completed": True},
+            {"habit_id": str(h1), "completed": True},
+            {"habit_id": h1, "completed": True},  # legacy ObjectId id
+            {"habit_id": str(h1), "completed": False},
+            {"habit_id": str(h2), "completed": True},
+            {"habit_id": str(other), "completed": True},
+        ])
+        await db.milestones.insert_many([
+            {"habit_id": h2, "is_achieved": True},
+            {"habit_id": h2, "is_achieved": False},
+        ])
+
+        assert await PartnershipService.checkin_counts(db, [str(h1), str(h2)]) == {str(h1): 3, str(h2): 1}
+        assert await PartnershipService.milestone_counts(db, [str(h1), str(h2)]) == {str(h2): 1}
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+class FakeFind:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs
+
+
+class FakeUsers:
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append((query, projection))
+        wanted = set(query["_id"]["$in"])
+        return FakeFind([u for u in self.users if u["_id"] in wanted])
+
+
+class FakeHabits:
+    def __init__(self, rows):
+        self.rows = rows
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return FakeFind(self.rows)
+
+
+async def test_resolve_partners_batches_users_and_habit_counts():
+    me, alice, bob, gone = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    partnerships = [
+        {"_id": ObjectId(), "user_id_1": me, "user_id_2": alice},
+        {"_id": ObjectId(), "user_id_1": bob, "user_id_2": me},
+        {"_id": ObjectId(), "user_id_1": me, "user_id_2": gone},
+    ]
+    db = FakeDB()
+    db.users = FakeUsers([{"_id": alice, "username": "alice"}, {"_id": bob, "username": "bob"}])
+    db.habits = FakeHabits([{"_id": str(partnerships[0]["_id"]), "count": 2}])
+
+    resolved = await PartnershipService.resolve_partners(db, partnerships, str(me), habit_status="active")
+
+    assert [(p["_id"], partner["username"], count) for p, partner, count in resolved] == [
+        (partnerships[0]["_id"], "alice", 2),
+        (partnerships[1]["_id"], "bob", 0),
+    ]
+    assert len(db.users.queries) == 1 and len(db.habits.pipelines) == 1
+    assert "password" not in db.users.queries[0][1]
+    assert db.habits.pipelines[0][0]["$match"]["status"] == "active"
@@ -0,0 +1,62 @@
+"""
+Unit tests for the bcrypt thread pool (app/utils/security.py).
+"""
+
+import asyncio
+import threading
+import pytest
+
+from app.utils.security import (
+    PasswordHashPool,
+    PasswordHasherBusy,
+    hash_password_async,
+    verify_password_async,
+)
+
+
+async def test_async_hash_round_trip():
+    hashed = await hash_password_async("Test123!")
+    assert await verify_password_async("Test123!", hashed) is True
+    assert await verify_password_async("wrong", hashed) is False
+
+
+async def test_hashing_does_not_block_the_event_loop():
+    pool = PasswordHashPool(workers=1, max_pending=4)
+    release = threading.Event()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while not release.is_set():
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    ticking = asyncio.create_task(ticker())
+    hashing = asyncio.create_task(pool.run(lambda: release.wait(1) or "hashed"))
+    await asyncio.sleep(0.05)
+    release.set()
+
+    assert await hashing is True
+    await ticking
+    assert ticks > 5  # the loop kept serving other work while the "hash" ran
+
+
+async def test_pool_rejects_past_max_pending_and_reports_depth():
+    pool = PasswordHashPool(workers=1, max_pending=2)
+    release = threading.Event()
+    jobs = [asyncio.create_task(pool.run(release.wait, 1)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+
+    metrics = pool.metrics()
+    assert metrics["in_flight"] == 1
+    assert metrics["queue_depth"] == 1
+    with pytest.raises(PasswordHasherBusy):
+        await pool.run(release.wait, 1)
+
+    release.set()
+    await asyncio.gather(*jobs)
+    metrics = pool.metrics()
+    assert metrics["rejected"] == 1
+    assert metrics["completed"] == 2
+    assert metrics["max_pending_seen"] == 2
+    assert metrics["queue_depth"] == 0
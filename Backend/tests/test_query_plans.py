@@ -0,0 +1,76 @@
+"""
+Query-plan regression tests.
+
+Seeds a real mongod with scale data (scripts/populate_scale_test_data.py), applies the
+index registry, and explain()s every query in config.indexes.HOT_QUERIES: none may
+COLLSCAN, a query with a sort must get its order from an index (no blocking SORT stage),
+and each must examine at most MAX_DOCS_EXAMINED_RATIO docs per doc returned.
+
+Needs a mongod (the `mongo_url` fixture in conftest.py): set QUERY_PLAN_MONGODB_URL to a
+throwaway server, or have `mongod` on PATH (or MONGOD_BINARY) and one is started for the
+session. Skipped otherwise.
+Scales come from QUERY_PLAN_SCALES (habit logs, default "10000"; e.g. "10000,100000,1000000").
+"""
+
+import os
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config.indexes import HOT_QUERIES, ensure_indexes
+from scripts.populate_scale_test_data import populate_scale_data
+
+SCALES = [int(n) for n in os.getenv("QUERY_PLAN_SCALES", "10000").split(",") if n.strip()]
+MAX_DOCS_EXAMINED_RATIO = 2.0
+
+
+def _plan_stages(node):
+    """Every `stage` name in an explain plan tree."""
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node["stage"]
+        for value in node.values():
+            yield from _plan_stages(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _plan_stages(item)
+
+
+async def _explain(db, query, sample):
+    command = {"find": query["collection"], "filter": query["filter"](sample)}
+    if query.get("sort"):
+        command["sort"] = dict(query["sort"])
+    return await db.command({"explain": command, "verbosity": "executionStats"})
+
+
+@pytest.mark.parametrize("scale", SCALES)
+async def test_hot_queries_use_indexes_at_scale(mongo_url, scale):
+    client = AsyncIOMotorClient(mongo_url)
+    db_name = f"pact_query_plans_{scale}"
+    await client.drop_database(db_name)
+    db = client[db_name]
+    try:
+        seeded = await populate_scale_data(db, scale)
+        summary = await ensure_indexes(db)
+        assert summary["failed"] == []
+
+        problems = []
+        for query in HOT_QUERIES:
+            explain = await _explain(db, query, seeded["sample"])
+            stages = set(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+            stats = explain["executionStats"]
+            examined, returned = stats["totalDocsExamined"], stats["nReturned"]
+
+            if "COLLSCAN" in stages:
+                problems.append(f"{query['name']} ({query['source']}): COLLSCAN")
+            elif query.get("sort") and "SORT" in stages:
+                problems.append(f"{query['name']} ({query['source']}): blocking SORT")
+            elif examined > MAX_DOCS_EXAMINED_RATIO * max(returned, 1):
+                problems.append(
+                    f"{query['name']} ({query['source']}): examined {examined} docs for {returned} returned"
+                )
+
+        assert problems == [], "\n".join(problems)
+    finally:
+        await client.drop_database(db_name)
+        client.close()
@@ -0,0 +1,140 @@
+"""
+Unit tests for the timezone-bucketed reminder scheduler (app/services/reminder_scheduler.py).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import app.services.reminder_scheduler as scheduler_module
+from app.services.reminder_scheduler import ReminderScheduler, due_timezones
+
+
+class FakeLeases:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate lease")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_update(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc.get("finished_at") or doc["expires_at"] > query["expires_at"]["$lte"]:
+            return None
+        doc.update(update["$set"])
+        doc["attempts"] += update["$inc"]["attempts"]
+        return doc
+
+    async def update_one(self, query, update):
+        doc = self.docs[query["_id"]]
+        if doc["owner"] == query["owner"]:
+            doc.update(update["$set"])
+
+
+class FakeUsers:
+    def __init__(self, timezones):
+        self.timezones = timezones
+
+    async def distinct(self, field):
+        assert field == "timezone"
+        return self.timezones
+
+
+class FakeDB:
+    def __init__(self, timezones):
+        self.users = FakeUsers(timezones)
+        self.scheduler_leases = FakeLeases()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = []
+
+    async def fake_send(db, today=None, timezones=None, **kwargs):
+        calls.append({"today": today, "timezones": sorted(timezones)})
+        return {"pairs": 2, "inserted": 2}
+
+    monkeypatch.setattr(scheduler_module.ReminderService, "send_checkin_reminders", fake_send)
+    return calls
+
+
+def test_due_timezones_buckets_by_local_hour():
+    names = ["America/New_York", "Asia/Tokyo", "Europe/London", "Not/AZone", None]
+    # 14:00 UTC in January: 09:00 in New York, 23:00 in Tokyo, 14:00 in London
+    assert due_timezones(names, datetime(2025, 1, 15, 14), 9) == ["America/New_York"]
+    # 09:00 UTC: London and UTC are due, unknown names fall back to UTC
+    assert sorted(due_timezones(names, datetime(2025, 1, 15, 9), 9)) == ["Europe/London", "Not/AZone", "UTC"]
+
+
+async def test_each_slot_runs_once_across_workers(sent):
+    db = FakeDB(["America/New_York"])
+    first = ReminderScheduler(get_db=lambda: db, reminder_hour=9)
+    second = ReminderScheduler(get_db=lambda: db, reminder_hour=9)
+    now = datetime(2025, 1, 15, 14, 5)
+
+    summary = await first.tick(now)
+    assert summary["inserted"] == 2
+    assert await second.tick(now.replace(minute=6)) is None
+    assert await first.tick(now.replace(minute=30)) is None  # same slot, already handled here
+
+    assert sent == [{"today": datetime(2025, 1, 15), "timezones": ["America/New_York"]}]
+    lease = db.scheduler_leases.docs["checkin_reminders:2025-01-15T14"]
+    assert lease["owner"] == first.owner and lease["summary"]["inserted"] == 2
+    assert second.metrics()["slots_skipped"] == 1
+
+
+async def test_slot_with_no_due_timezone_sends_nothing(sent):
+    db = FakeDB(["Asia/Tokyo"])
+    scheduler = ReminderScheduler(get_db=lambda: db, reminder_hour=9)
+
+    summary = await scheduler.tick(datetime(2025, 1, 15, 14))
+    assert summary["timezones"] == 0
+    assert sent == []
+
+
+async def test_failed_slot_is_retried_by_the_next_tick(sent, monkeypatch):
+    db = FakeDB(["America/New_York"])
+    first = ReminderScheduler(get_db=lambda: db, reminder_hour=9)
+    second = ReminderScheduler(get_db=lambda: db, reminder_hour=9)
+    now = datetime(2025, 1, 15, 14, 5)
+
+    async def failing_send(*args, **kwargs):
+        raise RuntimeError("mongo went away")
+
+    monkeypatch.setattr(scheduler_module.ReminderService, "send_checkin_reminders", failing_send)
+    with pytest.raises(RuntimeError):
+        await first.tick(now)
+    lease = db.scheduler_leases.docs["checkin_reminders:2025-01-15T14"]
+    assert lease["status"] == "failed" and "finished_at" not in lease
+
+    monkeypatch.undo()
+    sent_calls = []
+
+    async def fake_send(db, today=None, timezones=None, **kwargs):
+        sent_calls.append(timezones)
+        return {"inserted": 2}
+
+    monkeypatch.setattr(scheduler_module.ReminderService, "send_checkin_reminders", fake_send)
+    summary = await second.tick(now.replace(minute=6))
+    assert summary["inserted"] == 2 and sent_calls == [["America/New_York"]]
+    assert lease["owner"] == second.owner and lease["status"] == "finished" and lease["attempts"] == 2
+
+
+async def test_abandoned_lease_is_taken_over_once_it_expires(sent):
+    db = FakeDB(["America/New_York"])
+    crashed = ReminderScheduler(get_db=lambda: db, reminder_hour=9)
+    other = ReminderScheduler(get_db=lambda: db, reminder_hour=9)
+    now = datetime(2025, 1, 15, 14, 5)
+    # A worker claimed the slot and died before finishing it
+    assert await scheduler_module.acquire_lease(db, "checkin_reminders:2025-01-15T14", crashed.owner, now)
+
+    assert await other.tick(now + timedelta(minutes=1)) is None  # still within the lease
+    summary = await other.tick(now + scheduler_module.LEASE_TIMEOUT)
+    assert summary["inserted"] == 2
+    assert other.metrics()["slots_skipped"] == 1
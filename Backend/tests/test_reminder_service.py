@@ -0,0 +1,106 @@
+"""
+Tests for the set-based check-in reminder job (app/services/reminder_service.py).
+
+The batching test runs against a fake cursor; the pipeline test needs a real mongod
+(see the `mongo_url` fixture) and is skipped otherwise.
+"""
+
+from datetime import datetime
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import app.services.reminder_service as reminder_module
+from app.services.reminder_service import ReminderService
+from scripts.populate_scale_test_data import populate_scale_data
+
+TODAY = datetime(2025, 1, 15)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeHabits:
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self.aggregate_kwargs = None
+
+    def aggregate(self, pipeline, **kwargs):
+        self.aggregate_kwargs = kwargs
+        return FakeCursor(self.pairs)
+
+
+class FakeDB:
+    def __init__(self, pairs):
+        self.habits = FakeHabits(pairs)
+
+
+async def test_pairs_are_streamed_into_send_many_in_batches(monkeypatch):
+    batches = []
+
+    async def fake_send_many(notifications, skip_preference_check=False, db=None):
+        batches.append([n["user_id"] for n in notifications])
+        return {"requested": len(notifications), "blocked": 1, "inserted": len(notifications) - 1,
+                "failed": 0, "delivered": 0}
+
+    monkeypatch.setattr(reminder_module.notification_service, "send_many", fake_send_many)
+    pairs = [{"user_id": f"u{i}", "habit_id": "h", "habit_name": "Read"} for i in range(5)]
+    db = FakeDB(pairs)
+
+    summary = await ReminderService.send_checkin_reminders(db, today=TODAY, batch_size=2)
+
+    assert batches == [["u0", "u1"], ["u2", "u3"], ["u4"]]
+    assert summary["pairs"] == 5 and summary["batches"] == 3
+    assert summary["requested"] == 5 and summary["blocked"] == 3 and summary["inserted"] == 2
+    assert db.habits.aggregate_kwargs == {"allowDiskUse": True, "batchSize": 2}
+    assert "pairs_per_second" in summary
+
+
+async def test_pipeline_matches_per_habit_checks(mongo_url):
+    client = AsyncIOMotorClient(mongo_url)
+    db_name = "pact_reminder_pipeline"
+    await client.drop_database(db_name)
+    db = client[db_name]
+    try:
+        await populate_scale_data(db, 3000)
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        expected = set()
+        async for habit in db.habits.find({"status": "active"}):
+            partnership = await db.partnerships.find_one(
+                {"_id": ObjectId(habit["partnership_id"]), "status": "active"}
+            )
+            if not partnership:
+                continue
+            for uid in (str(partnership["user_id_1"]), str(partnership["user_id_2"])):
+                log = await db.habit_logs.find_one({
+                    "habit_id": str(habit["_id"]), "user_id": uid, "log_date": today, "completed": True
+                })
+                if not log:
+                    expected.add((uid, str(habit["_id"])))
+
+        found = set()
+        async for pair in db.habits.aggregate(ReminderService.missing_checkin_pipeline(today)):
+            found.add((pair["user_id"], pair["habit_id"]))
+
+        assert expected and found == expected
+
+        # Seeded users have no timezone, so they fall in the UTC bucket only
+        utc_only = ReminderService.missing_checkin_pipeline(today, timezones=["UTC"])
+        assert {(p["user_id"], p["habit_id"]) async for p in db.habits.aggregate(utc_only)} == expected
+        tokyo_only = ReminderService.missing_checkin_pipeline(today, timezones=["Asia/Tokyo"])
+        assert [p async for p in db.habits.aggregate(tokyo_only)] == []
+    finally:
+        await client.drop_database(db_name)
+        client.close()
@@ -0,0 +1,207 @@
+"""
+Unit tests for the nightly streak-break job (app/services/streak_break_job.py).
+"""
+
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+import app.services.streak_break_job as job_module
+from app.services.dashboard_service import DashboardService
+from app.services.notification_service import NotificationType
+from app.services.streak_break_job import StreakBreakJob
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeStreaks:
+    def __init__(self, docs, moved=()):
+        self.docs = docs
+        self.moved = set(moved)  # _ids a concurrent check-in changed after the aggregation
+        self.pipelines = []
+        self.updates = []
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return FakeCursor(self.docs)
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+        return SimpleNamespace(modified_count=0 if query["_id"] in self.moved else 1)
+
+
+class FakeHistory:
+    def __init__(self):
+        self.bulk_calls = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_calls.append(ops)
+        return SimpleNamespace(inserted_count=len(ops))
+
+
+class FakeViews:
+    def __init__(self):
+        self.stale = []
+
+    async def update_many(self, query, update):
+        self.stale.extend(query["_id"]["$in"])
+
+
+class FakeLeases:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate lease")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_update(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc.get("finished_at") or doc["expires_at"] > query["expires_at"]["$lte"]:
+            return None
+        doc.update(update["$set"])
+        return doc
+
+    async def update_one(self, query, update):
+        doc = self.docs[query["_id"]]
+        if doc["owner"] == query["owner"]:
+            doc.update(update["$set"])
+
+
+class FakeDB:
+    def __init__(self, streaks, moved=()):
+        self.streaks = FakeStreaks(streaks, moved)
+        self.streak_history = FakeHistory()
+        self.scheduler_leases = FakeLeases()
+        self.dashboard_views = FakeViews()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def broken_streak(user_1, user_2, checked_in=(), status="active", current=4):
+    return {
+        "_id": ObjectId(),
+        "habit_id": ObjectId(),
+        "partnership_id": ObjectId(),
+        "current_streak": current,
+        "streak_started_at": None,
+        "last_both_completed_date": datetime(2025, 1, 10),
+        "habit": {"habit_name": "Read", "status": status},
+        "partnership": {"user_id_1": user_1, "user_id_2": user_2},
+        "checked_in_yesterday": list(checked_in),
+    }
+
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    jobs = []
+
+    async def fake_enqueue(func, *args, job_name=None, **kwargs):
+        jobs.append({"name": job_name, "func": func, "args": args, "kwargs": kwargs})
+        return True
+
+    monkeypatch.setattr(job_module.job_queue, "enqueue", fake_enqueue)
+    monkeypatch.setattr(DashboardService, "_pending", set())
+    return jobs
+
+
+def test_pipeline_matches_streaks_older_than_yesterday():
+    match = StreakBreakJob.broken_streaks_pipeline(date(2025, 1, 14))[0]["$match"]
+    assert match == {
+        "last_both_completed_date": {"$lt": datetime(2025, 1, 14)},
+        "current_streak": {"$gt": 0},
+    }
+
+
+async def test_run_resets_streaks_and_writes_history_in_batches(enqueued):
+    user_1, user_2 = ObjectId(), ObjectId()
+    streaks = [
+        broken_streak(user_1, user_2, checked_in=[str(user_1)]),
+        broken_streak(user_1, user_2),
+        broken_streak(user_1, user_2, status="completed"),
+    ]
+    db = FakeDB(streaks)
+
+    summary = await StreakBreakJob.run(db, today=date(2025, 1, 15), batch_size=2)
+
+    assert summary["found"] == 3 and summary["reset"] == 3 and summary["history_written"] == 3
+    assert summary["batches"] == 2
+    assert [len(ops) for ops in db.streak_history.bulk_calls] == [2, 1]
+
+    query, reset = db.streaks.updates[0]
+    assert reset["$set"]["current_streak"] == 0
+    assert query["current_streak"] == 4
+
+    record = db.streak_history.bulk_calls[0][0]._doc
+    assert record["habit_id"] == str(streaks[0]["habit_id"])
+    assert record["streak_start_date"] == datetime(2025, 1, 7)
+    assert record["streak_end_date"] == datetime(2025, 1, 10)
+    assert record["streak_length_days"] == 4 and record["ended_reason"] == "missed_day"
+
+    # Only partners who missed, and nothing for habits that aren't active
+    notifications = [n for job in enqueued if job["name"] == "missed_habit_notifications" for n in job["args"][0]]
+    assert summary["notifications"] == len(notifications) == 3
+    assert all(n["notification_type"] == NotificationType.MISSED_HABIT for n in notifications)
+    assert [n["user_id"] for n in notifications] == [str(user_2), str(user_1), str(user_2)]
+    # Both partners' home screens are refreshed
+    assert set(db.dashboard_views.stale) == {user_1, user_2}
+
+
+async def test_streak_changed_by_a_concurrent_checkin_is_left_alone(enqueued):
+    user_1, user_2 = ObjectId(), ObjectId()
+    kept, broken = broken_streak(user_1, user_2), broken_streak(user_2, user_1)
+    db = FakeDB([kept, broken], moved=[kept["_id"]])
+
+    summary = await StreakBreakJob.run(db, today=date(2025, 1, 15))
+
+    assert summary["found"] == 2 and summary["reset"] == 1 and summary["history_written"] == 1
+    (history,) = db.streak_history.bulk_calls
+    assert [op._doc["habit_id"] for op in history] == [str(broken["habit_id"])]
+    notifications = [n for job in enqueued if job["name"] == "missed_habit_notifications" for n in job["args"][0]]
+    assert {n["related_id"] for n in notifications} == {str(broken["habit_id"])}
+
+
+async def test_tick_runs_once_per_day_after_run_hour(enqueued):
+    db = FakeDB([])
+    first = StreakBreakJob(get_db=lambda: db, run_hour=2)
+    second = StreakBreakJob(get_db=lambda: db, run_hour=2)
+
+    assert await first.tick(datetime(2025, 1, 15, 1, 30)) is None  # too early
+    summary = await first.tick(datetime(2025, 1, 15, 2, 5))
+    assert summary["day"] == "2025-01-15" and summary["found"] == 0
+    assert await second.tick(datetime(2025, 1, 15, 2, 10)) is None
+    assert db.scheduler_leases.docs["streak_breaks:2025-01-15"]["owner"] == first.owner
+
+
+async def test_failed_run_is_retried_by_a_later_tick(enqueued, monkeypatch):
+    db = FakeDB([])
+    job = StreakBreakJob(get_db=lambda: db, run_hour=2)
+    real_run = StreakBreakJob.run
+
+    async def failing_run(db, today):
+        raise RuntimeError("mongo went away")
+
+    monkeypatch.setattr(StreakBreakJob, "run", staticmethod(failing_run))
+    with pytest.raises(RuntimeError):
+        await job.tick(datetime(2025, 1, 15, 2, 5))
+    assert db.scheduler_leases.docs["streak_breaks:2025-01-15"]["status"] == "failed"
+
+    monkeypatch.setattr(StreakBreakJob, "run", staticmethod(real_run))
+    summary = await job.tick(datetime(2025, 1, 15, 2, 10))
+    assert summary["day"] == "2025-01-15"
+    assert db.scheduler_leases.docs["streak_breaks:2025-01-15"]["status"] == "finished"
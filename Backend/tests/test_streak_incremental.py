@@ -0,0 +1,243 @@
+"""
+Unit tests for the incremental streak path (StreakCalculationService.apply_checkin_to_streak
+and update_streak_on_checkin). Uses in-memory fakes, no Mongo required.
+"""
+
+from datetime import datetime, timedelta, date
+from bson import ObjectId
+import pytest
+
+from app.services.streak_service import StreakCalculationService
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return list(self._docs)
+
+
+class FakeCollection:
+    def __init__(self):
+        self._find_one_result = None
+        self._find_docs = []
+        self.update_calls = []
+        self.find_calls = 0
+        self.matches = []  # matched_count per update_one call (default 1)
+
+    def set_find_one(self, doc):
+        self._find_one_result = doc
+
+    def set_find_docs(self, docs):
+        self._find_docs = docs
+
+    async def find_one(self, *args, **kwargs):
+        return self._find_one_result
+
+    def find(self, *args, **kwargs):
+        self.find_calls += 1
+        return FakeCursor(self._find_docs)
+
+    async def update_one(self, filter_, update, upsert=False):
+        self.update_calls.append({"filter": filter_, "update": update, "upsert": upsert})
+        matched = self.matches.pop(0) if self.matches else 1
+        return type("Result", (), {"matched_count": matched, "modified_count": matched})
+
+
+class FakeDB:
+    def __init__(self):
+        self.streaks = FakeCollection()
+        self.partnerships = FakeCollection()
+        self.habit_logs = FakeCollection()
+
+
+def _state(current, longest, last, started=None):
+    return {
+        "current_streak": current,
+        "longest_streak": longest,
+        "streak_started_at": started,
+        "last_both_completed_date": last,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def test_checkin_extends_streak_from_yesterday():
+    today = date.today()
+    state = _state(3, 5, today - timedelta(days=1), today - timedelta(days=3))
+    out = StreakCalculationService.apply_checkin_to_streak(state, today, True)
+    assert out["current_streak"] == 4
+    assert out["longest_streak"] == 5
+    assert out["last_both_completed_date"] == today
+    assert out["streak_started_at"] == today - timedelta(days=3)
+
+
+def test_checkin_after_gap_starts_new_streak():
+    today = date.today()
+    state = _state(4, 4, today - timedelta(days=3))
+    out = StreakCalculationService.apply_checkin_to_streak(state, today, True)
+    assert out["current_streak"] == 1
+    assert out["longest_streak"] == 4
+    assert out["streak_started_at"] == today
+
+
+def test_longest_follows_current_past_previous_best():
+    today = date.today()
+    state = _state(5, 5, today - timedelta(days=1))
+    out = StreakCalculationService.apply_checkin_to_streak(state, today, True)
+    assert out["current_streak"] == out["longest_streak"] == 6
+
+
+def test_repeated_checkin_same_day_is_idempotent():
+    today = date.today()
+    state = _state(2, 2, today)
+    out = StreakCalculationService.apply_checkin_to_streak(state, today, True)
+    assert out["current_streak"] == 2
+
+
+def test_stored_datetimes_are_normalized():
+    # upsert_streaks persists dates as midnight datetimes
+    today = date.today()
+    yesterday = datetime.combine(today - timedelta(days=1), datetime.min.time())
+    state = _state(1, 1, yesterday, yesterday)
+    out = StreakCalculationService.apply_checkin_to_streak(state, today, True)
+    assert out["current_streak"] == 2
+
+
+def test_only_one_partner_leaves_state_unchanged():
+    today = date.today()
+    state = _state(2, 3, today - timedelta(days=1))
+    out = StreakCalculationService.apply_checkin_to_streak(state, today, False)
+    assert out["current_streak"] == 2
+    assert out["last_both_completed_date"] == today - timedelta(days=1)
+
+
+def test_cases_needing_repair_return_none():
+    today = date.today()
+    # No persisted state
+    assert StreakCalculationService.apply_checkin_to_streak(None, today, True) is None
+    # Un-checking a day that was already counted
+    assert StreakCalculationService.apply_checkin_to_streak(_state(2, 2, today), today, False) is None
+    # Back-dated log before the last counted day
+    assert StreakCalculationService.apply_checkin_to_streak(
+        _state(2, 2, today), today - timedelta(days=5), True
+    ) is None
+
+
+@pytest.mark.asyncio
+async def test_update_on_checkin_does_not_scan_logs():
+    db = FakeDB()
+    habit_id = str(ObjectId())
+    partnership_id = str(ObjectId())
+    today = date.today()
+    streak_doc = _state(7, 7, today - timedelta(days=1), today - timedelta(days=7))
+
+    out = await StreakCalculationService.update_streak_on_checkin(
+        db, habit_id, partnership_id, today, True, streak_doc
+    )
+    assert out["current_streak"] == 8
+    assert db.habit_logs.find_calls == 0
+    assert db.streaks.update_calls[0]["update"]["$set"]["current_streak"] == 8
+
+
+@pytest.mark.asyncio
+async def test_checkin_that_changes_nothing_is_not_written():
+    db = FakeDB()
+    today = date.today()
+    streak_doc = _state(3, 3, today - timedelta(days=1))
+
+    out = await StreakCalculationService.update_streak_on_checkin(
+        db, str(ObjectId()), str(ObjectId()), today, False, streak_doc
+    )
+    assert out["current_streak"] == 3
+    assert db.streaks.update_calls == []
+
+
+@pytest.mark.asyncio
+async def test_update_is_conditional_and_reapplied_on_a_concurrent_change():
+    db = FakeDB()
+    habit_id = str(ObjectId())
+    today = date.today()
+    yesterday = datetime.combine(today - timedelta(days=1), datetime.min.time())
+    stale = _state(3, 3, yesterday)
+    # The partner's check-in counted today between our read and our write
+    db.streaks.set_find_one(_state(4, 4, datetime.combine(today, datetime.min.time())))
+    db.streaks.matches = [0]
+
+    out = await StreakCalculationService.update_streak_on_checkin(
+        db, habit_id, str(ObjectId()), today, True, stale
+    )
+    (write,) = db.streaks.update_calls
+    assert write["filter"] == {"habit_id": ObjectId(habit_id), "current_streak": 3, "last_both_completed_date": yesterday}
+    assert write["upsert"] is False
+    # Re-applied to the fresh doc: today is already counted, so nothing more to write
+    assert out["current_streak"] == 4
+    assert db.habit_logs.find_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_update_on_checkin_falls_back_to_recompute_without_state():
+    db = FakeDB()
+    habit_id = str(ObjectId())
+    partnership_id = str(ObjectId())
+    today = date.today()
+    db.partnerships.set_find_one({"user_id_1": "u1", "user_id_2": "u2"})
+    db.habit_logs.set_find_docs([
+        {"habit_id": habit_id, "user_id": "u1", "log_date": today, "completed": True},
+        {"habit_id": habit_id, "user_id": "u2", "log_date": today, "completed": True},
+    ])
+
+    out = await StreakCalculationService.update_streak_on_checkin(
+        db, habit_id, partnership_id, today, True, None
+    )
+    assert out["current_streak"] == 1
+    assert db.habit_logs.find_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_recompute_lock_is_released_after_cold_start(monkeypatch):
+    db = FakeDB()
+    habit_id = str(ObjectId())
+    StreakCalculationService.streak_mem_cache.clear()
+
+    async def fake_recompute(db, habit_id, partnership_id):
+        return _state(0, 0, None)
+
+    monkeypatch.setattr(StreakCalculationService, "recompute_streak_from_logs", fake_recompute)
+
+    await StreakCalculationService.get_streak_cached(db, habit_id, str(ObjectId()))
+
+    assert habit_id not in StreakCalculationService._recompute_locks
+    assert habit_id not in StreakCalculationService._recompute_lock_users
+    assert StreakCalculationService.cache_stats()["size"] >= 1
+    StreakCalculationService.streak_mem_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_streaks_cached_many_batches_memory_db_and_recompute(monkeypatch):
+    db = FakeDB()
+    db.habits = FakeCollection()
+    partnership_id = str(ObjectId())
+    in_memory, in_db, cold = (str(ObjectId()) for _ in range(3))
+    StreakCalculationService.streak_mem_cache.clear()
+    StreakCalculationService._cache_streak(in_memory, _state(7, 7, None))
+    db.streaks.set_find_docs([{"habit_id": ObjectId(in_db), "current_streak": 3, "longest_streak": 4}])
+    recomputed = []
+
+    async def fake_recompute(db, habit_id, partnership_id):
+        recomputed.append(habit_id)
+        return _state(0, 0, None)
+
+    monkeypatch.setattr(StreakCalculationService, "recompute_streak_from_logs", fake_recompute)
+
+    out = await StreakCalculationService.get_streaks_cached_many(
+        db, [in_memory, in_db, cold], {habit_id: partnership_id for habit_id in (in_memory, in_db, cold)}
+    )
+
+    assert out[in_memory]["current_streak"] == 7
+    assert out[in_db]["current_streak"] == 3
+    assert out[cold]["current_streak"] == 0
+    assert db.streaks.find_calls == 1  # one $in query for every miss
+    assert db.habits.find_calls == 0  # partnership ids were supplied
+    assert recomputed == [cold]
+    StreakCalculationService.streak_mem_cache.clear()
@@ -29,7 +29,7 @@ def mock_s3_client():
 @pytest.fixture
 def mock_decode_token():
     """Mock JWT decode"""
-    with patch('app.routes.upload.decode_access_token') as mock:
+    with patch('app.dependencies.auth.decode_access_token') as mock:
         mock.return_value = {"sub": "507f1f77bcf86cd799439011"}
         yield mock
 